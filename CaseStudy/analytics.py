@@ -0,0 +1,263 @@
+# analytics.py
+from __future__ import annotations
+
+import threading
+from datetime import date, timedelta
+
+import numpy as np
+
+from indexes import update_key
+from records import AIEvent, Update, created_day
+from storage import MAX_FUTURE_DAYS, file_lock
+from tracing import traced
+
+EPOCH = date(1970, 1, 1)
+_EPOCH_ORD = EPOCH.toordinal()
+DEFAULT_WEEKS = 26
+RECENT_WEEKS = 4        # window for the "per week lately" rate
+GROW_DAYS = 64          # spare day columns allocated when the matrix grows to the right
+
+
+def epoch_day(d: date) -> int:
+    return (d - EPOCH).days
+
+
+def day_date(day: int) -> date:
+    return EPOCH + timedelta(days=int(day))
+
+
+def _update_day(u: dict) -> int:
+    """Epoch day of an update's date; records already hold it as an int (-1 = unusable)."""
+    d = update_key(u)[0]
+    return d - _EPOCH_ORD if d >= 0 else -1
+
+
+def _event_day(a: dict) -> int:
+    d = created_day(a)
+    return d - _EPOCH_ORD if d >= 0 else -1
+
+
+def _horizon() -> int:
+    """Last epoch day counted; entries dated later (typos like 9999-12-31) are left out like undated ones."""
+    return epoch_day(date.today()) + MAX_FUTURE_DAYS
+
+
+def _week_start(day: int) -> int:
+    """Epoch day of the Monday starting the week of `day` (1970-01-01 was a Thursday)."""
+    return day - (day + 3) % 7
+
+
+def _runs(active_idx: np.ndarray) -> tuple:
+    """(starts, ends) of runs of consecutive day indexes."""
+    breaks = np.flatnonzero(np.diff(active_idx) != 1)
+    starts = np.concatenate(([active_idx[0]], active_idx[breaks + 1]))
+    ends = np.concatenate((active_idx[breaks], [active_idx[-1]]))
+    return starts, ends
+
+
+class Analytics:
+    """
+    Daily aggregates for the Statistics page, kept as dense NumPy matrices:
+
+        counts[goal_row, day]  updates per goal per day
+        chars[goal_row, day]   characters written per goal per day
+        ai[day]                ai_events per day
+
+    Days are columns counted from day0 (epoch days), from 1970 up to a year
+    ahead of today (see _horizon), so one bad date can't widen every row by
+    centuries. Goal rows come from
+    `rows` (goal_id -> row). build() fills them from columns extracted in
+    one pass (the records' int days, goal rows, text lengths) with np.bincount;
+    add_update / add_ai_event bump one cell each (apply_op calls them on
+    every write), so every stat is a few vector ops over the matrices.
+    Growing swaps the matrices and day0 together, so writes and queries
+    share _lock.
+    """
+
+    def __init__(self):
+        self.rows: dict[str, int] = {}
+        self.day0: int | None = None
+        self.days = 0                                      # columns in use
+        self.counts = np.zeros((0, 0), dtype=np.int32)
+        self.chars = np.zeros((0, 0), dtype=np.int64)
+        self.ai = np.zeros(0, dtype=np.int32)
+        self._lock = threading.Lock()
+
+    # ---- building ----
+    def _row(self, goal_id: str) -> int:
+        row = self.rows.get(goal_id)
+        if row is None:
+            row = self.rows[goal_id] = len(self.rows)
+        return row
+
+    def _fit(self, n_rows: int, lo: int, hi: int) -> None:
+        """Grow the matrices to cover goal rows < n_rows and epoch days lo..hi."""
+        if self.day0 is None:
+            self.day0 = lo
+        pad_left = max(0, self.day0 - lo)
+        need = max(hi, self.day0 + self.days - 1) - (self.day0 - pad_left) + 1
+        old_rows, cap = self.counts.shape
+        if pad_left == 0 and need <= cap and n_rows <= old_rows:
+            self.days = max(self.days, need)
+            return
+        width = cap + pad_left if need <= cap + pad_left else need + GROW_DAYS
+        rows = max(n_rows, old_rows)
+        counts = np.zeros((rows, width), dtype=np.int32)
+        chars = np.zeros((rows, width), dtype=np.int64)
+        ai = np.zeros(width, dtype=np.int32)
+        counts[:old_rows, pad_left:pad_left + cap] = self.counts
+        chars[:old_rows, pad_left:pad_left + cap] = self.chars
+        ai[pad_left:pad_left + cap] = self.ai
+        self.counts, self.chars, self.ai = counts, chars, ai
+        self.day0 -= pad_left
+        self.days = need
+
+    @classmethod
+    @traced("stats.build")
+    def build(cls, data: dict) -> "Analytics":
+        self = cls()
+        for g in data["goals"]:
+            self._row(g["id"])
+        updates, ai_events = data["updates"], data["ai_events"]
+        # typed records already hold int days: no string parsing, just the attribute
+        u_days = np.fromiter((u.day - _EPOCH_ORD if type(u) is Update and u.day >= 0 else _update_day(u)
+                              for u in updates), dtype=np.int64, count=len(updates))
+        u_rows = np.fromiter((self._row(u.get("goal_id")) for u in updates), dtype=np.int64, count=len(updates))
+        u_lens = np.fromiter((len(u.get("text") or "") for u in updates), dtype=np.int64, count=len(updates))
+        a_days = np.fromiter((a.created // 86400 if type(a) is AIEvent and a.created >= 0 else _event_day(a)
+                              for a in ai_events), dtype=np.int64, count=len(ai_events))
+        horizon = _horizon()
+        ok_u = (u_days >= 0) & (u_days <= horizon)
+        ok_a = (a_days >= 0) & (a_days <= horizon)
+        u_days, u_rows, u_lens, a_days = u_days[ok_u], u_rows[ok_u], u_lens[ok_u], a_days[ok_a]
+        all_days = np.concatenate((u_days, a_days))
+        if not all_days.size:
+            return self
+        self._fit(len(self.rows), int(all_days.min()), int(all_days.max()))
+        width = self.counts.shape[1]
+        flat = u_rows * width + (u_days - self.day0)
+        size = self.counts.size
+        self.counts = np.bincount(flat, minlength=size).astype(np.int32).reshape(self.counts.shape)
+        self.chars = np.bincount(flat, weights=u_lens, minlength=size).astype(np.int64).reshape(self.chars.shape)
+        self.ai = np.bincount(a_days - self.day0, minlength=width).astype(np.int32)
+        return self
+
+    def add_update(self, u: dict) -> None:
+        day = _update_day(u)
+        if not 0 <= day <= _horizon():
+            return
+        with self._lock:
+            row = self._row(u.get("goal_id"))
+            self._fit(len(self.rows), day, day)
+            self.counts[row, day - self.day0] += 1
+            self.chars[row, day - self.day0] += len(u.get("text") or "")
+
+    def add_ai_event(self, a: dict) -> None:
+        day = _event_day(a)
+        if not 0 <= day <= _horizon():
+            return
+        with self._lock:
+            self._fit(len(self.rows), day, day)
+            self.ai[day - self.day0] += 1
+
+    # ---- queries ----
+    def _daily(self, goal_ids) -> np.ndarray:
+        """Entries per day (columns day0..day0+days) summed over the given goals."""
+        rows = [self.rows[g] for g in goal_ids if g in self.rows]
+        if not rows or self.day0 is None:
+            return np.zeros(self.days, dtype=np.int64)
+        return self.counts[rows, :self.days].sum(axis=0, dtype=np.int64)
+
+    def _window(self, per_day: np.ndarray, today: int, weeks: int) -> tuple:
+        """(first epoch day, per-day values) for `weeks` whole Monday-Sunday weeks ending with today's week."""
+        first = _week_start(today) - 7 * (weeks - 1)
+        out = np.zeros(7 * weeks, dtype=np.int64)
+        if self.day0 is not None and per_day.size:
+            lo, hi = max(first, self.day0), min(first + 7 * weeks, self.day0 + per_day.size)
+            if lo < hi:
+                out[lo - first:hi - first] = per_day[lo - self.day0:hi - self.day0]
+        return first, out
+
+    def goal_stats(self, goal_id: str, today: date | None = None) -> dict:
+        """Entries, active days, current/longest streak, longest gap, days since last entry, recent weekly rate."""
+        with self._lock:
+            today_day = epoch_day(today or date.today())
+            stats = {"entries": 0, "active_days": 0, "current_streak": 0, "longest_streak": 0, "longest_gap": 0,
+                     "days_since_last": None, "per_week_recent": 0.0, "avg_chars": 0}
+            row = self.rows.get(goal_id)
+            if row is None or self.day0 is None:
+                return stats
+            per_day = self.counts[row, :self.days]
+            entries = int(per_day.sum())
+            stats.update(entries=entries, avg_chars=int(self.chars[row, :self.days].sum() // max(entries, 1)))
+            active = np.flatnonzero(per_day[:max(0, today_day - self.day0 + 1)])   # streaks ignore future-dated entries
+            if not active.size:
+                return stats
+            starts, ends = _runs(active)
+            last = int(active[-1])
+            since_last = today_day - (self.day0 + last)
+            _, recent = self._window(per_day, today_day, RECENT_WEEKS)
+            stats.update(
+                active_days=int(active.size),
+                # a streak is still current if the last entry was today or yesterday
+                current_streak=int(ends[-1] - starts[-1] + 1) if since_last <= 1 else 0,
+                longest_streak=int((ends - starts).max() + 1),
+                longest_gap=int(np.diff(active).max() - 1) if active.size > 1 else 0,
+                days_since_last=int(since_last),
+                per_week_recent=round(float(recent.sum()) / RECENT_WEEKS, 1),
+            )
+            return stats
+
+    def weekly(self, goal_ids, weeks: int = DEFAULT_WEEKS, today: date | None = None) -> list:
+        """[(week starting Monday, entries), ...] oldest first."""
+        with self._lock:
+            first, per_day = self._window(self._daily(goal_ids), epoch_day(today or date.today()), weeks)
+            totals = per_day.reshape(weeks, 7).sum(axis=1)
+            return [(day_date(first + 7 * w).isoformat(), int(n)) for w, n in enumerate(totals)]
+
+    def heatmap(self, goal_ids, weeks: int = DEFAULT_WEEKS, today: date | None = None) -> list:
+        """Cells {week, weekday (0 = Monday), date, entries} for a weeks x 7 activity grid."""
+        with self._lock:
+            first, per_day = self._window(self._daily(goal_ids), epoch_day(today or date.today()), weeks)
+            return [{"week": day_date(first + 7 * (i // 7)).isoformat(), "weekday": i % 7,
+                     "date": day_date(first + i).isoformat(), "entries": int(n)}
+                    for i, n in enumerate(per_day)]
+
+    def ai_timeline(self, weeks: int = DEFAULT_WEEKS, today: date | None = None) -> list:
+        """[(week starting Monday, ai_events), ...] oldest first."""
+        with self._lock:
+            per_day = self.ai[:self.days].astype(np.int64)
+            first, per_day = self._window(per_day, epoch_day(today or date.today()), weeks)
+            totals = per_day.reshape(weeks, 7).sum(axis=1)
+            return [(day_date(first + 7 * w).isoformat(), int(n)) for w, n in enumerate(totals)]
+
+    def digest(self, goals: list, today: date | None = None) -> str:
+        """A few lines of per-goal activity numbers for prompts (goals: [{id, name}, ...])."""
+        lines = []
+        for g in goals:
+            s = self.goal_stats(g["id"], today)
+            if not s["entries"]:
+                lines.append(f"- {g['name']}: no entries yet")
+                continue
+            lines.append(
+                f"- {g['name']}: {s['entries']} entries on {s['active_days']} days; "
+                f"streak {s['current_streak']} (best {s['longest_streak']}); "
+                f"{s['per_week_recent']}/week over the last {RECENT_WEEKS} weeks; "
+                f"last entry {s['days_since_last']} day(s) ago; longest gap {s['longest_gap']} days"
+            )
+        return "\n".join(lines)
+
+
+def get_analytics(data) -> Analytics:
+    """
+    The Analytics attached to a loaded JournalData, built on first use and then kept current by apply_op.
+    apply_op only sees it once attached, so an entry added mid-build would never
+    be counted; holding the writer lock keeps new entries out until then.
+    """
+    stats = getattr(data, "analytics", None)
+    if stats is None:
+        with file_lock:
+            stats = getattr(data, "analytics", None)
+            if stats is None:
+                stats = data.analytics = Analytics.build(data)
+    return stats
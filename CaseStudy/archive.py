@@ -0,0 +1,304 @@
+# archive.py
+"""
+Streaming import/export of journal archives.
+
+    python archive.py import journal.md --goal "Improve sleep routine"
+    python archive.py import old.csv            # columns: goal, date, text
+    python archive.py export backup.jsonl       # "-" writes to stdout
+
+Formats:
+- jsonl: one record per line; {"type": "goal" | "update" | "ai", ...}
+  ("update" is assumed when type is missing). Round-trips goals, updates
+  and AI events, except created_at: every imported record is stamped with
+  the import time, so the History feed (ordered by append) stays sorted.
+- json (import only): one JSON array of those same records, parsed whole;
+  a .json file that actually holds JSON Lines is read as jsonl.
+- csv: header row with goal, date, text (updates only).
+- md: "# Goal name" headings, then "## YYYY-MM-DD" headings, each followed
+  by that day's entry (updates only).
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+import json
+import sys
+from pathlib import Path
+
+from blobs import event_context, event_prompt, pack_ai_event
+from indexes import update_key
+from storage import ALL_GOALS, Store, deleted_goal_ids, goal_names, live_goals, new_goal_id, normalize_date, now_ts
+
+FORMATS = ("jsonl", "csv", "md")   # export formats; import also reads "json"
+IMPORT_BATCH = 500   # records applied + persisted together
+MAX_ERRORS = 50      # error messages kept in an import report
+
+
+def detect_format(filename: str) -> str:
+    ext = Path(filename).suffix.lower().lstrip(".")
+    if ext in ("md", "markdown", "txt"):
+        return "md"
+    if ext in ("jsonl", "ndjson"):
+        return "jsonl"
+    if ext == "json":
+        return "json"
+    if ext == "csv":
+        return "csv"
+    raise ValueError(f"Can't tell the format of {filename!r}; use one of: {', '.join(READERS)}")
+
+
+# =========================
+# Readers: yield (line_no, raw entry dict)
+# =========================
+def read_jsonl(f):
+    for n, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            obj = json.loads(line)
+        except json.JSONDecodeError:
+            yield n, {"_error": "not valid JSON"}
+            continue
+        yield n, obj if isinstance(obj, dict) else {"_error": "expected a JSON object"}
+
+
+def read_json(f):
+    """Entries of a JSON array, numbered from 1 like lines (the array is parsed whole)."""
+    text = f.read()
+    if not text.lstrip().startswith("["):
+        yield from read_jsonl(io.StringIO(text))   # JSON Lines saved as .json
+        return
+    try:
+        items = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"not a valid JSON array ({e})") from None
+    for n, obj in enumerate(items, 1):
+        yield n, obj if isinstance(obj, dict) else {"_error": "expected a JSON object"}
+
+
+def read_csv(f):
+    reader = csv.DictReader(f)
+    for row in reader:
+        yield reader.line_num, {(k or "").strip().lower(): v for k, v in row.items()}
+
+
+def read_markdown(f):
+    goal, entry_date, body, start = None, None, [], 0
+
+    def entry():
+        return start, {"goal": goal, "date": entry_date, "text": "\n".join(body).strip()}
+
+    for n, line in enumerate(f, 1):
+        line = line.rstrip("\n")
+        if line.startswith("## "):
+            if entry_date is not None:
+                yield entry()
+            entry_date, body, start = line[3:].strip(), [], n
+        elif line.startswith("# "):
+            if entry_date is not None:
+                yield entry()
+            goal, entry_date, body = line[2:].strip().removeprefix("Goal:").strip(), None, []
+        elif entry_date is not None:
+            body.append(line[1:] if line.startswith("\\#") else line)
+    if entry_date is not None:
+        yield entry()
+
+
+READERS = {"jsonl": read_jsonl, "json": read_json, "csv": read_csv, "md": read_markdown}
+
+
+def read_entries(f, fmt: str):
+    return READERS[fmt](f)
+
+
+# =========================
+# Import
+# =========================
+def _text(raw: dict, key: str) -> str:
+    """A string field, stripped ("" when missing); JSONL can hold any type, so check it."""
+    value = raw.get(key)
+    if value is None:
+        return ""
+    if not isinstance(value, str):
+        raise ValueError(f"{key} must be text, got {type(value).__name__}")
+    return value.strip()
+
+
+def parse_entry(raw: dict, default_goal: str | None = None) -> tuple:
+    """Validate one raw entry; returns (op, rec) or raises ValueError."""
+    if raw.get("_error"):
+        raise ValueError(raw["_error"])
+    kind = raw.get("type") or "update"
+    if kind == "goal":
+        name = _text(raw, "name")
+        if not name:
+            raise ValueError("goal without a name")
+        status = _text(raw, "status")
+        return "add_goal", {"name": name, "status": status if status in ("active", "inactive") else "active"}
+    goal = _text(raw, "goal") or (default_goal or "").strip()
+    if not goal:
+        raise ValueError("no goal (add a goal column/heading or pick a default goal)")
+    if kind == "ai":
+        for key in ("event_type", "user_text", "answer", "prompt"):
+            _text(raw, key)
+        context = raw.get("context") or []
+        if not isinstance(context, list) or not all(isinstance(c, dict) for c in context):
+            raise ValueError("context must be a list of objects")
+        # blob refs only mean something in the journal that wrote them
+        event = {k: v for k, v in raw.items() if k not in ("type", "prompt_ref", "context_ref")}
+        event.update(goal=goal, created_at=now_ts())
+        return "add_ai_event", event
+    if kind != "update":
+        raise ValueError(f"unknown record type {kind!r}")
+    text = _text(raw, "text")
+    if not text:
+        raise ValueError("empty text")
+    return "add_update", {"goal": goal, "date": normalize_date(_text(raw, "date")), "text": text,
+                          "created_at": now_ts()}
+
+
+def import_entries(store: Store, entries, default_goal: str | None = None, batch_size: int = IMPORT_BATCH) -> dict:
+    """
+    Stream entries into the store, `batch_size` at a time, each batch applied
+    and persisted with one Store.mutate_many. Goals are matched
+    case-insensitively and created on first use.
+
+    Imported records keep their own date but get the import time as
+    created_at, so the History feed (ordered by append) stays sorted.
+    """
+    known = {g["name"].casefold(): g["id"] for g in store.goals}   # casefolded name -> goal_id
+    report = {"updates": 0, "ai_events": 0, "goals_created": 0, "skipped": 0, "batches": 0, "errors": []}
+    batch = []
+
+    def flush():
+        store.mutate_many(batch)
+        report["batches"] += 1
+        batch.clear()
+
+    for line_no, raw in entries:
+        try:
+            op, rec = parse_entry(raw, default_goal)
+        except ValueError as e:
+            report["skipped"] += 1
+            if len(report["errors"]) < MAX_ERRORS:
+                report["errors"].append(f"line {line_no}: {e}")
+            continue
+        name = rec["name"] if op == "add_goal" else rec.pop("goal")
+        if op == "add_ai_event" and name == ALL_GOALS:
+            rec["goal_id"] = ALL_GOALS   # cross-goal progress summary, not a goal of its own
+        else:
+            if name.casefold() not in known:
+                goal = {"id": new_goal_id(), "name": name,
+                        "status": rec["status"] if op == "add_goal" else "active"}
+                known[name.casefold()] = goal["id"]
+                batch.append(("add_goal", goal))
+                report["goals_created"] += 1
+            if op == "add_goal":
+                continue
+            rec["goal_id"] = known[name.casefold()]
+        if op == "add_update":
+            report["updates"] += 1
+        else:
+            rec = pack_ai_event(rec)
+            report["ai_events"] += 1
+        batch.append((op, rec))
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return report
+
+
+# =========================
+# Export: yield text chunks, one record at a time
+# =========================
+def _updates_by_goal(data: dict, goal_id: str) -> list:
+    index = getattr(data, "update_index", None)
+    if index is not None:
+        return index.items(goal_id)
+    return sorted((u for u in data["updates"] if u["goal_id"] == goal_id), key=update_key)
+
+
+def _named(rec: dict, names: dict) -> dict:
+    # archives name the goal, so they import into any journal
+    out = {"goal": names.get(rec.get("goal_id"), rec.get("goal_id"))}
+    out.update((k, v) for k, v in rec.items() if k != "goal_id")
+    return out
+
+
+def _md_text(text: str) -> str:
+    # a line starting with "#" would read back as a heading
+    return "\n".join("\\" + line if line.startswith("#") else line for line in text.splitlines())
+
+
+def iter_export(data: dict, fmt: str):
+    """Live goals and their records; deleted goals not purged yet are left out."""
+    names = goal_names(data["goals"])
+    gone = deleted_goal_ids(data["goals"])
+    if fmt == "jsonl":
+        for g in live_goals(data["goals"]):
+            yield json.dumps({"type": "goal", "name": g["name"], "status": g.get("status", "active")},
+                             ensure_ascii=False) + "\n"
+        for u in data["updates"]:
+            if u["goal_id"] not in gone:
+                yield json.dumps({"type": "update", **_named(u, names)}, ensure_ascii=False) + "\n"
+        for a in data["ai_events"]:
+            if a.get("goal_id") in gone:
+                continue
+            rec = {k: v for k, v in _named(a, names).items() if k not in ("prompt_ref", "context_ref")}
+            rec.update(prompt=event_prompt(a), context=event_context(a))
+            yield json.dumps({"type": "ai", **rec}, ensure_ascii=False) + "\n"
+    elif fmt == "csv":
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow(["goal", "date", "text", "created_at"])
+        for u in data["updates"]:
+            if u["goal_id"] in gone:
+                continue
+            writer.writerow([names.get(u["goal_id"], u["goal_id"]), u["date"], u["text"], u.get("created_at", "")])
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    elif fmt == "md":
+        for g in live_goals(data["goals"]):
+            items = _updates_by_goal(data, g["id"])
+            if not items:
+                continue
+            yield f"# {g['name']}\n\n"
+            for u in items:
+                yield f"## {u['date']}\n\n{_md_text(u['text'])}\n\n"
+    else:
+        raise ValueError(f"Unknown format: {fmt}")
+
+
+def export(data: dict, fmt: str, f) -> int:
+    """Write an archive to the text stream `f`; returns characters written."""
+    written = 0
+    for chunk in iter_export(data, fmt):
+        f.write(chunk)
+        written += len(chunk)
+    return written
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Import/export Goalbot journal archives")
+    ap.add_argument("command", choices=("import", "export"))
+    ap.add_argument("file", help='archive path ("-" = stdin/stdout)')
+    ap.add_argument("--format", choices=tuple(READERS), help="default: from the file extension")
+    ap.add_argument("--goal", help="goal for imported entries that don't name one")
+    ap.add_argument("--batch", type=int, default=IMPORT_BATCH)
+    args = ap.parse_args()
+
+    fmt = args.format or detect_format(args.file)
+    if args.command == "export" and fmt not in FORMATS:
+        ap.error(f"export writes {', '.join(FORMATS)}; {fmt} is import only")
+    store = Store()
+    if args.command == "import":
+        with (sys.stdin if args.file == "-" else open(args.file, encoding="utf-8", newline="")) as f:
+            print(json.dumps(import_entries(store, read_entries(f, fmt), args.goal, args.batch), indent=2))
+    else:
+        with (sys.stdout if args.file == "-" else open(args.file, "w", encoding="utf-8", newline="")) as f:
+            n = export(store.data, fmt, f)
+        if args.file != "-":
+            print(f"Wrote {n} characters to {args.file}")
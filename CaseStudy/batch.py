@@ -0,0 +1,182 @@
+# batch.py
+"""
+Headless batch generation for cron / CLI use (no Streamlit).
+
+    python batch.py                          # pending feedback, then summaries
+    python batch.py --concurrency 8 --since 2026-01-01
+    python batch.py --no-summaries --limit 200
+    python batch.py --dry-run                # only count what is pending
+
+One run:
+1. daily_feedback for every update that has none yet (matched on goal +
+   update text, which is what the Goals page records),
+2. rolling summaries for goals with new entries (as many per fold as fit the budget),
+3. the all-goal progress report, if any summary changed.
+
+Requests share one pooled client (llm.OllamaClient), at most --concurrency are in flight
+(give the Ollama server a matching OLLAMA_NUM_PARALLEL), and transient
+failures are retried with backoff; whatever still fails is left for the
+next run. All generated events are saved with one Store.mutate_many.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import threading
+import time
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+
+from analytics import get_analytics
+from blobs import pack_ai_event
+from indexes import update_key
+from llm import OLLAMA_BACKOFF_S, OLLAMA_RETRIES, OllamaClient, ollama_generate
+from prompts import DAILY_CONTEXT_BUDGET, SUMMARY_RECENT_BUDGET, daily_feedback_prompt, pack_updates
+from storage import ALL_GOALS, Store, goal_names, live_goals, now_ts, recent_updates
+from summaries import RECENT_RAW, latest_summaries, pending_updates, progress_prompt, refresh_goal_summary
+
+DEFAULT_CONCURRENCY = 4
+FEEDBACK_CONTEXT = 6   # like the Goals page: the update itself + the 5 before it
+
+
+def pending_feedback(data: dict, since: str | None = None) -> list:
+    """Updates of live goals (dated `since` or later) without a daily_feedback event, in append order."""
+    answered = {(a.get("goal_id"), (a.get("user_text") or "").strip())
+                for a in data["ai_events"] if a.get("event_type") == "daily_feedback"}
+    live = {g["id"] for g in live_goals(data["goals"])}
+    return [u for u in data["updates"]
+            if u["goal_id"] in live and (since is None or u["date"] >= since)
+            and (u["goal_id"], u["text"].strip()) not in answered]
+
+
+def feedback_context(data: dict, u: dict) -> list:
+    """The update and the ones before it for the same goal, newest first (what the Goals page sends)."""
+    items = data.update_index.items(u["goal_id"])
+    end = bisect_right(items, update_key(u), key=update_key)
+    return items[max(0, end - FEEDBACK_CONTEXT):end][::-1]
+
+
+def _event(event_type: str, goal_id: str, user_text: str, prompt: str, answer: str, context: list,
+           metrics: dict) -> dict:
+    # same shape as main.log_ai_event
+    return {
+        "event_type": event_type,
+        "goal_id": goal_id,
+        "user_text": user_text,
+        "prompt": prompt,
+        "answer": answer,
+        "context": [{"date": c.get("date"), "text": c.get("text")} for c in context],
+        "created_at": now_ts(),
+        "metrics": metrics,
+    }
+
+
+class BatchRun:
+    """A bounded worker pool over its own pooled client; events are collected, not saved."""
+
+    def __init__(self, concurrency: int = DEFAULT_CONCURRENCY, retries: int = OLLAMA_RETRIES,
+                 backoff: float = OLLAMA_BACKOFF_S):
+        # as many request slots as workers, so batch calls never get "busy"
+        self.client = OllamaClient(max_inflight=concurrency, retries=retries, backoff=backoff)
+        self.pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="goalbot-batch")
+        self._lock = threading.Lock()
+        self.events: list[dict] = []
+        self.counts = {"daily_feedback": 0, "rolling_summary": 0, "progress_summary": 0,
+                       "requests": 0, "cached": 0, "failed": 0, "tokens": 0}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.pool.shutdown(wait=True, cancel_futures=exc[0] is not None)
+        self.client.close()
+
+    def generate(self, prompt: str) -> tuple:
+        """(answer or None on failure, metrics)"""
+        metrics = {}
+        answer = ollama_generate(prompt, metrics=metrics, client=self.client)
+        ok = bool(answer) and not answer.startswith("⚠️")
+        with self._lock:
+            self.counts["requests"] += 1
+            self.counts["cached"] += bool(metrics.get("cached"))
+            self.counts["failed"] += not ok
+            self.counts["tokens"] += metrics.get("eval_count") or 0
+        return (answer if ok else None), metrics
+
+    def keep(self, event: dict) -> None:
+        with self._lock:
+            self.events.append(event)
+            self.counts[event["event_type"]] += 1
+
+    def feedback(self, data: dict, names: dict, u: dict) -> None:
+        context, _ = pack_updates(feedback_context(data, u), DAILY_CONTEXT_BUDGET)
+        prompt = daily_feedback_prompt(names[u["goal_id"]], u["date"], context, u["text"])
+        answer, metrics = self.generate(prompt)
+        if answer is not None:
+            self.keep(_event("daily_feedback", u["goal_id"], u["text"], prompt, answer,
+                             context or [u], metrics))
+
+    def summarize(self, goal: dict, goal_updates: list, previous: dict | None) -> dict | None:
+        return refresh_goal_summary(goal, goal_updates, previous, lambda p: self.generate(p)[0] or "", self.keep)
+
+
+def run_batch(store: Store, concurrency: int = DEFAULT_CONCURRENCY, since: str | None = None,
+              limit: int | None = None, summaries: bool = True, retries: int = OLLAMA_RETRIES,
+              backoff: float = OLLAMA_BACKOFF_S, dry_run: bool = False) -> dict:
+    data = store.data
+    goals = live_goals(data["goals"])
+    names = goal_names(data["goals"])
+    todo = pending_feedback(data, since)[:limit]
+    previous = latest_summaries(data["ai_events"], [g["id"] for g in goals]) if summaries else {}
+    stale = [g for g in goals if summaries and pending_updates(data.update_index.items(g["id"]), previous.get(g["id"]))]
+    report = {"pending_feedback": len(todo), "goals_to_summarize": len(stale)}
+    if dry_run:
+        return report
+
+    start = time.perf_counter()
+    with BatchRun(concurrency, retries, backoff) as run:
+        jobs = [run.pool.submit(run.feedback, data, names, u) for u in todo]
+        folds = {g["id"]: run.pool.submit(run.summarize, g, data.update_index.items(g["id"]), previous.get(g["id"]))
+                 for g in stale}
+        for job in jobs:
+            job.result()
+        latest = dict(previous)
+        for gid, job in folds.items():
+            ev = job.result()
+            if ev:
+                latest[gid] = ev
+        if run.counts["rolling_summary"]:
+            recent_all, _ = pack_updates(recent_updates(data, None, RECENT_RAW), SUMMARY_RECENT_BUDGET)
+            prompt = progress_prompt(latest, recent_all, names, get_analytics(data).digest(goals))
+            answer, metrics = run.generate(prompt)
+            if answer is not None:
+                run.keep(_event("progress_summary", ALL_GOALS, "", prompt, answer, recent_all, metrics))
+    generated = time.perf_counter() - start
+
+    # the one persist: prompts/context go to the blob store, events to the journal in one write
+    store.mutate_many([("add_ai_event", pack_ai_event(ev)) for ev in run.events])
+    elapsed = time.perf_counter() - start
+    report.update(run.counts)
+    report.update(
+        saved=len(run.events),
+        elapsed_s=round(elapsed, 3),
+        persist_s=round(elapsed - generated, 3),
+        records_per_s=round(len(run.events) / elapsed, 2) if elapsed else None,
+        tokens_per_s=round(run.counts["tokens"] / generated, 1) if generated else None,
+    )
+    return report
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Generate pending Goalbot feedback and summaries without the UI")
+    ap.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="requests in flight at once")
+    ap.add_argument("--since", help="only updates dated YYYY-MM-DD or later get feedback")
+    ap.add_argument("--limit", type=int, help="at most this many feedback requests")
+    ap.add_argument("--no-summaries", dest="summaries", action="store_false")
+    ap.add_argument("--retries", type=int, default=OLLAMA_RETRIES)
+    ap.add_argument("--backoff", type=float, default=OLLAMA_BACKOFF_S, help="first retry delay in seconds")
+    ap.add_argument("--dry-run", action="store_true")
+    args = ap.parse_args()
+
+    print(json.dumps(run_batch(Store(), max(1, args.concurrency), args.since, args.limit, args.summaries,
+                               args.retries, args.backoff, args.dry_run), indent=2))
@@ -0,0 +1,327 @@
+# bench.py
+"""
+Synthetic-load benchmarks for Goalbot's hot paths.
+
+    python bench.py                              # 1k, 10k, 100k records, JSON engine
+    python bench.py --sizes 1000,1000000 --engine sqlite --llm --out bench.json
+    python bench.py --compare old.json new.json  # p50 ratios, flags regressions
+
+Each run works in a throwaway data folder (GOALBOT_DATA_DIR) and, with --llm,
+against a local FakeOllama server (OLLAMA_HOST), so real data and models are
+never touched. Results are JSON so runs can be diffed across commits.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from fake_ollama import FakeOllama
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+QUESTIONS = ("what helps me sleep better", "why do I skip workouts", "how is stress at work trending")
+_VOCAB = ("sleep bed early late tired rested coffee screen phone read walk run gym stretch yoga meditate "
+          "breathe journal work meeting deadline stress calm focus email break lunch water friends family "
+          "weekend morning evening night routine habit skipped managed felt better worse energy mood "
+          "practice lesson course chapter notes code guitar spanish minutes hours plan goal progress").split()
+
+
+# =========================
+# Synthetic journals
+# =========================
+def make_journal(records: int, goals: int = 8, years: float = 3.0, ai_share: float = 0.25, seed: int = 0) -> dict:
+    """
+    `records` updates + ai_events spread evenly over `years`, in created_at
+    order like a real journal. ai_events are in the packed (blob ref) form.
+    """
+    rng = random.Random(seed)
+    goal_ids = ["g%010x" % rng.getrandbits(40) for _ in range(goals)]
+    n_ai = int(records * ai_share)
+    n_updates = records - n_ai
+    start = datetime.now() - timedelta(days=365 * years)
+    step = (365 * years * 86400) / max(records, 1)
+    ai_every = records / n_ai if n_ai else float("inf")
+
+    def text(lo: int, hi: int) -> str:
+        return " ".join(rng.choices(_VOCAB, k=rng.randint(lo, hi)))
+
+    def ref() -> str:
+        return "%024x" % rng.getrandbits(96)
+
+    updates, ai_events = [], []
+    next_ai = ai_every
+    for i in range(records):
+        ts = start + timedelta(seconds=i * step)
+        goal = rng.choice(goal_ids)
+        if i + 1 >= next_ai and len(ai_events) < n_ai or len(updates) >= n_updates:
+            next_ai += ai_every
+            ai_events.append({
+                "event_type": "daily_feedback",
+                "goal_id": goal,
+                "user_text": text(8, 30),
+                "answer": text(30, 60),
+                "created_at": ts.isoformat(timespec="seconds"),
+                "prompt_ref": [ref() for _ in range(4)],
+                "context_ref": [ref() for _ in range(rng.randint(1, 6))],
+            })
+        else:
+            updates.append({
+                "goal_id": goal,
+                "date": ts.date().isoformat(),
+                "text": text(8, 40),
+                "created_at": ts.isoformat(timespec="seconds"),
+            })
+    return {
+        "goals": [{"id": g, "name": f"Goal {i + 1}", "status": "active"} for i, g in enumerate(goal_ids)],
+        "updates": updates,
+        "ai_events": ai_events,
+    }
+
+
+# =========================
+# Timing
+# =========================
+def timed(fn, repeat: int = 5) -> dict:
+    samples = []
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    return {
+        "n": len(samples),
+        "min_ms": round(samples[0], 3),
+        "p50_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+        "mean_ms": round(statistics.fmean(samples), 3),
+    }
+
+
+def _repeat(records: int, base: int) -> int:
+    # fewer repeats as journals grow, so 1M-record runs stay in minutes
+    return max(1, min(base, 200_000 // max(records, 1)))
+
+
+def _clear(data_dir: Path) -> None:
+    for p in data_dir.iterdir():
+        shutil.rmtree(p) if p.is_dir() else p.unlink()
+
+
+def _store_bytes(engine) -> int:
+    """On-disk size of what the engine persisted."""
+    import storage
+    if engine.name == "sqlite":
+        # committed pages can still sit in the -wal file: fold them into the database first
+        with engine._lock:
+            engine._connect().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        db = storage.DB_FILE
+        sidecars = (db.with_name(db.name + suffix) for suffix in ("-wal", "-shm"))
+        return db.stat().st_size + sum(p.stat().st_size for p in sidecars if p.exists())
+    if engine.name == "shards":
+        return sum(p.stat().st_size for p in engine.dir.iterdir() if p.is_file())
+    return engine.snapshot_file.stat().st_size
+
+
+def _loaded_mb() -> float:
+    """Python heap held by one fully loaded journal."""
+    import storage
+    tracemalloc.start()
+    data = storage.load_data()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del data
+    return round(size / 2**20, 1)
+
+
+def bench_size(records: int, engine_name: str, data_dir: Path, llm: bool, seed: int) -> dict:
+    from analytics import Analytics
+    import storage
+    from history import feed_page
+    from prompts import build_prompt
+    from retrieval import HashEmbedder, VectorIndex, choose_context
+    from search import SearchIndex
+
+    _clear(data_dir)
+    journal = make_journal(records, seed=seed)
+    storage.DATA_FILE.write_text(json.dumps(journal, ensure_ascii=False), encoding="utf-8")
+    json_bytes = storage.DATA_FILE.stat().st_size
+    engine = storage.set_engine(engine_name)
+    engine.load()   # SQLite / shards: one-time migration from the JSON file happens here, untimed
+    goal = journal["goals"][0]["id"]
+    del journal
+
+    paths = {}
+    paths["load_data"] = timed(storage.load_data, _repeat(records, 10))
+    data = storage.load_data()
+    paths["save_data"] = timed(lambda: storage.save_data(data), _repeat(records, 5))
+    store_bytes = _store_bytes(engine)
+    memory_mb = _loaded_mb()
+
+    def cold_open():
+        # what the first render needs: goals + a few recent updates per goal
+        lazy = storage.Store(engine, lazy=True)
+        for g in lazy.goals:
+            lazy.recent(g["id"], 2)
+
+    paths["cold_open"] = timed(cold_open, 20)
+
+    # before the full load: sharded/SQLite engines read only what matches, JSON loads everything
+    last_month = ((datetime.now() - timedelta(days=30)).date().isoformat(), datetime.now().date().isoformat())
+    paths["range_cold"] = timed(lambda: storage.Store(engine, lazy=True).updates_between(*last_month, goal),
+                                _repeat(records, 10))
+    paths["recent_cold"] = timed(lambda: storage.Store(engine, lazy=True).recent(goal, 20), _repeat(records, 10))
+
+    store = storage.Store(engine)
+    data = store.data
+    counter = iter(range(10**9))
+    paths["save_update"] = timed(lambda: store.mutate("add_update", {
+        "goal_id": goal, "date": datetime.now().date().isoformat(),
+        "text": f"benchmark entry {next(counter)} walk before bed",
+        "created_at": storage.now_ts(),
+    }), 50)
+    paths["recent_for_goal"] = timed(lambda: storage.recent_updates(data, goal, 6), 200)
+
+    index = VectorIndex(HashEmbedder(), dir_=data_dir)
+    q = iter(QUESTIONS * 1000)
+    paths["choose_context_cold"] = timed(lambda: choose_context(data, goal, QUESTIONS[0], index=index), 1)
+    paths["choose_context"] = timed(lambda: choose_context(data, goal, next(q), index=index), 20)
+
+    paths["history_feed"] = timed(lambda: feed_page(data), 20)
+    paths["history_filter"] = timed(lambda: feed_page(data, goal=goal), 20)
+    paths["search_build"] = timed(lambda: SearchIndex.build(data), _repeat(records, 3))
+    search_index = SearchIndex.build(data)
+
+    def search_page():
+        ranked = search_index.search("walk bed")
+        return feed_page(data, hits=set(ranked))
+
+    paths["history_search"] = timed(search_page, 20)
+
+    paths["stats_build"] = timed(lambda: Analytics.build(data), _repeat(records, 3))
+    stats = Analytics.build(data)
+    goal_ids = [g["id"] for g in data["goals"]]
+
+    def stats_page():
+        rows = [stats.goal_stats(gid) for gid in goal_ids]
+        return rows, stats.weekly(goal_ids), stats.heatmap(goal_ids), stats.ai_timeline()
+
+    paths["stats_page"] = timed(stats_page, 20)
+
+    if llm:
+        from llm import ollama_stream
+        metrics_seen = []
+
+        def ask():
+            context, _ = choose_context(data, goal, next(q), index=index)
+            metrics = {}
+            for _ in ollama_stream(build_prompt(goal, "what helps?", context), metrics, regenerate=True):
+                pass
+            metrics_seen.append(metrics)
+
+        paths["ask_end_to_end"] = timed(ask, 5)
+        paths["ask_end_to_end"]["ttft_ms"] = round(
+            statistics.median(m.get("ttft_s") or 0 for m in metrics_seen) * 1000, 3)
+
+    # a delete is a tombstone; its records go in the background compaction it schedules,
+    # which purge_deleted waits for
+    paths["remove_goal"] = timed(lambda: store.mutate("remove_goal", {"id": goal}), 1)
+    paths["purge_deleted"] = timed(engine.compact, 1)
+    return {
+        "records": records,
+        "json_bytes": json_bytes,
+        "store_bytes": store_bytes,
+        "memory_mb": memory_mb,
+        "paths": paths,
+    }
+
+
+def _git_rev() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=Path(__file__).parent,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def run(sizes, engine_name: str = "json", llm: bool = False, seed: int = 0,
+        load_s: float = 0.05, token_s: float = 0.005) -> dict:
+    data_dir = Path(tempfile.mkdtemp(prefix="goalbot-bench-"))
+    fake = FakeOllama(load_s=load_s, token_s=token_s).start() if llm else None
+    # must be set before the app modules are imported: their paths/URLs are read at import time
+    os.environ["GOALBOT_DATA_DIR"] = str(data_dir)
+    os.environ["GOALBOT_EMBEDDER"] = "hash"
+    if fake:
+        os.environ["OLLAMA_HOST"] = fake.url
+    try:
+        results = [bench_size(n, engine_name, data_dir, llm, seed) for n in sizes]
+    finally:
+        if fake:
+            fake.stop()
+        shutil.rmtree(data_dir, ignore_errors=True)
+    return {
+        "meta": {
+            "commit": _git_rev(),
+            "engine": engine_name,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "llm": {"load_s": load_s, "token_s": token_s} if llm else None,
+        },
+        "results": results,
+    }
+
+
+def compare(old: dict, new: dict, threshold: float = 1.2) -> list:
+    """Rows of (records, path, old p50, new p50, ratio, regressed) for paths in both runs."""
+    old_by_size = {r["records"]: r["paths"] for r in old["results"]}
+    rows = []
+    for r in new["results"]:
+        before = old_by_size.get(r["records"], {})
+        for path, stats in r["paths"].items():
+            if path in before and before[path]["p50_ms"] > 0:
+                ratio = stats["p50_ms"] / before[path]["p50_ms"]
+                rows.append((r["records"], path, before[path]["p50_ms"], stats["p50_ms"], round(ratio, 2),
+                             ratio > threshold))
+    return rows
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Goalbot synthetic-load benchmarks")
+    ap.add_argument("--sizes", default=",".join(str(n) for n in DEFAULT_SIZES),
+                    help="comma-separated record counts (updates + ai_events)")
+    ap.add_argument("--engine", default="json", choices=("json", "shards", "sqlite"))
+    ap.add_argument("--llm", action="store_true", help="also time Ask end-to-end against a fake Ollama")
+    ap.add_argument("--load-s", type=float, default=0.05, help="fake Ollama latency before the first token")
+    ap.add_argument("--token-s", type=float, default=0.005, help="fake Ollama delay between tokens")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", help="write results JSON here (default: stdout)")
+    ap.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files")
+    ap.add_argument("--threshold", type=float, default=1.2, help="p50 ratio counted as a regression")
+    args = ap.parse_args()
+
+    if args.compare:
+        old, new = (json.loads(Path(p).read_text(encoding="utf-8")) for p in args.compare)
+        rows = compare(old, new, args.threshold)
+        for records, path, a, b, ratio, bad in rows:
+            print(f"{records:>9} {path:<22} {a:>10.3f} ms -> {b:>10.3f} ms  x{ratio:<5} {'REGRESSION' if bad else ''}")
+        sys.exit(1 if any(r[-1] for r in rows) else 0)
+
+    report = run([int(s) for s in args.sizes.split(",") if s.strip()], args.engine, args.llm, args.seed,
+                 args.load_s, args.token_s)
+    out = json.dumps(report, indent=2)
+    if args.out:
+        Path(args.out).write_text(out + "\n", encoding="utf-8")
+        print(f"Wrote {args.out}")
+    else:
+        print(out)
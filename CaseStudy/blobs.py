@@ -0,0 +1,211 @@
+# blobs.py
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+
+from records import dumps
+from storage import DATA_DIR, file_lock, load_data, save_data
+
+BLOB_FILE = DATA_DIR / "blobs.sqlite3"
+COMPRESS_MIN_BYTES = 200   # smaller payloads don't shrink enough to be worth inflating
+COMPRESS_LEVEL = 6
+MEMO_ENTRIES = 4096        # decoded blobs kept in memory (they are immutable)
+GC_GRACE_S = 3600          # never collect blobs this young: their event may not be logged yet
+
+# prompts are stored as paragraph chunks, so the fixed instruction blocks
+# shared by every prompt of a kind are stored once
+PROMPT_SEP = "\n\n"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    codec TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    data BLOB NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+
+def blob_hash(raw: bytes) -> str:
+    return hashlib.blake2b(raw, digest_size=12).hexdigest()
+
+
+class BlobStore:
+    """
+    Content-addressed store for ai_event payloads (prompt chunks, context
+    entries). Identical payloads are stored once; larger ones are zlib
+    compressed. Blobs are immutable, so reads are memoized in-process.
+    """
+
+    def __init__(self, path: Path | None = None):
+        self.path = path or BLOB_FILE
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self._memo: OrderedDict[str, bytes] = OrderedDict()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _remember(self, h: str, raw: bytes) -> None:
+        self._memo[h] = raw
+        self._memo.move_to_end(h)
+        if len(self._memo) > MEMO_ENTRIES:
+            self._memo.popitem(last=False)
+
+    def put_many(self, payloads: list) -> list:
+        """Store byte payloads; returns their hashes in the same order."""
+        hashes = [blob_hash(p) for p in payloads]
+        now = time.time()
+        rows = []
+        for h, raw in zip(hashes, payloads):
+            if len(raw) >= COMPRESS_MIN_BYTES:
+                rows.append((h, "zlib", len(raw), zlib.compress(raw, COMPRESS_LEVEL), now))
+            else:
+                rows.append((h, "raw", len(raw), raw, now))
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO blobs(hash, codec, size, data, created_at) VALUES (?, ?, ?, ?, ?)", rows
+                )
+            for h, raw in zip(hashes, payloads):
+                self._remember(h, raw)
+        return hashes
+
+    def get_many(self, hashes: list) -> dict:
+        """hash -> bytes for every hash found (missing ones are left out)."""
+        out = {}
+        with self._lock:
+            todo = []
+            for h in hashes:
+                if h in self._memo:
+                    self._memo.move_to_end(h)
+                    out[h] = self._memo[h]
+                else:
+                    todo.append(h)
+            if todo:
+                conn = self._connect()
+                marks = ", ".join("?" * len(todo))
+                for h, codec, data in conn.execute(
+                    f"SELECT hash, codec, data FROM blobs WHERE hash IN ({marks})", todo
+                ):
+                    raw = zlib.decompress(data) if codec == "zlib" else bytes(data)
+                    out[h] = raw
+                    self._remember(h, raw)
+        return out
+
+    def gc(self, live: set) -> int:
+        """Delete blobs no event references (older than GC_GRACE_S); returns how many."""
+        with self._lock:
+            conn = self._connect()
+            cutoff = time.time() - GC_GRACE_S
+            dead = [(h,) for (h,) in conn.execute("SELECT hash FROM blobs WHERE created_at < ?", (cutoff,))
+                    if h not in live]
+            with conn:
+                conn.executemany("DELETE FROM blobs WHERE hash = ?", dead)
+            for (h,) in dead:
+                self._memo.pop(h, None)
+        return len(dead)
+
+    def stats(self) -> dict:
+        with self._lock:
+            blobs, raw, stored = self._connect().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(LENGTH(data)), 0) FROM blobs"
+            ).fetchone()
+        return {"blobs": blobs, "raw_bytes": raw, "stored_bytes": stored}
+
+
+_store: BlobStore | None = None
+
+
+def get_blob_store() -> BlobStore:
+    global _store
+    if _store is None:
+        _store = BlobStore()
+    return _store
+
+
+# =========================
+# ai_event packing
+# =========================
+def _context_blob(entry: dict) -> bytes:
+    return json.dumps(entry, ensure_ascii=False, sort_keys=True).encode("utf-8")
+
+
+def pack_ai_event(event: dict, blobs: BlobStore | None = None) -> dict:
+    """
+    Copy of `event` with the inline `prompt` / `context` swapped for
+    `prompt_ref` / `context_ref` hash lists. Packed events pass through.
+    """
+    blobs = blobs or get_blob_store()
+    out = dict(event)
+    if "prompt" in out and "prompt_ref" not in out:
+        chunks = (out.pop("prompt") or "").split(PROMPT_SEP)
+        out["prompt_ref"] = blobs.put_many([c.encode("utf-8") for c in chunks])
+    if "context" in out and "context_ref" not in out:
+        out["context_ref"] = blobs.put_many([_context_blob(c) for c in out.pop("context") or []])
+    return out
+
+
+def event_prompt(a: dict, blobs: BlobStore | None = None) -> str:
+    refs = a.get("prompt_ref")
+    if refs is None:
+        return a.get("prompt") or ""
+    found = (blobs or get_blob_store()).get_many(refs)
+    return PROMPT_SEP.join(found[h].decode("utf-8") for h in refs if h in found)
+
+
+def event_context(a: dict, blobs: BlobStore | None = None) -> list:
+    refs = a.get("context_ref")
+    if refs is None:
+        return a.get("context") or []
+    found = (blobs or get_blob_store()).get_many(refs)
+    return [json.loads(found[h]) for h in refs if h in found]
+
+
+def live_refs(ai_events: list) -> set:
+    live = set()
+    for a in ai_events:
+        live.update(a.get("prompt_ref") or ())
+        live.update(a.get("context_ref") or ())
+    return live
+
+
+def dedupe_all() -> dict:
+    """
+    One-shot pass over existing data: pack every legacy (inline) ai_event,
+    checkpoint, and drop blobs nothing references any more.
+    """
+    blobs = get_blob_store()
+    with file_lock:
+        data = load_data()
+        before = len(dumps(data["ai_events"]))
+        data["ai_events"][:] = [pack_ai_event(a, blobs) for a in data["ai_events"]]
+        save_data(data)
+        after = len(dumps(data["ai_events"]))
+        removed = blobs.gc(live_refs(data["ai_events"]))
+    return {"events": len(data["ai_events"]), "inline_bytes_before": before, "inline_bytes_after": after,
+            "blobs_removed": removed, **blobs.stats()}
+
+
+if __name__ == "__main__":
+    # python blobs.py dedupe
+    if (sys.argv[1] if len(sys.argv) > 1 else "") == "dedupe":
+        print(json.dumps(dedupe_all(), indent=2))
+    else:
+        print("usage: python blobs.py dedupe")
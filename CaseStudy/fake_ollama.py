@@ -0,0 +1,136 @@
+# fake_ollama.py
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = ("steady progress small wins keep the routine simple try a short walk before bed "
+         "notice what helped today and plan one tiny step for tomorrow").split()
+
+
+class FakeOllama:
+    """
+    Stand-in for the Ollama HTTP API (/api/generate, /api/embed) with
+    configurable latency, for benchmarks and offline runs.
+
+    - load_s: delay before anything is returned (model load / prompt eval)
+    - token_s: delay between streamed tokens
+    - tokens: answer length
+    Final chunks carry eval/prompt_eval counters like the real server.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, load_s: float = 0.05,
+                 token_s: float = 0.005, tokens: int = 60, embed_dim: int = 64):
+        self.load_s = load_s
+        self.token_s = token_s
+        self.tokens = tokens
+        self.embed_dim = embed_dim
+        self.requests = 0
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def answer_tokens(self, prompt: str) -> list:
+        rng = random.Random(prompt)   # same prompt, same answer
+        return [rng.choice(WORDS) for _ in range(self.tokens)]
+
+    def embed(self, text: str) -> list:
+        vec = [0.0] * self.embed_dim
+        for tok in text.lower().split():
+            vec[int(hashlib.md5(tok.encode("utf-8")).hexdigest(), 16) % self.embed_dim] += 1.0
+        return vec
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _json(self, obj: dict) -> None:
+                body = json.dumps(obj).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                fake.requests += 1
+                req = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+                if self.path.endswith("/api/embed"):
+                    texts = req.get("input") or []
+                    texts = [texts] if isinstance(texts, str) else texts
+                    self._json({"model": req.get("model"), "embeddings": [fake.embed(t) for t in texts]})
+                    return
+                if not self.path.endswith("/api/generate"):
+                    self.send_error(404)
+                    return
+                prompt = req.get("prompt") or ""
+                tokens = fake.answer_tokens(prompt)
+                final = {
+                    "done": True,
+                    "eval_count": len(tokens),
+                    "eval_duration": int(len(tokens) * fake.token_s * 1e9),
+                    "prompt_eval_count": len(prompt.split()),
+                    "prompt_eval_duration": int(fake.load_s * 1e9),
+                }
+                time.sleep(fake.load_s)
+                if not req.get("stream", True):
+                    time.sleep(fake.token_s * len(tokens))
+                    self._json({"response": " ".join(tokens), **final})
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.end_headers()
+                for i, tok in enumerate(tokens):
+                    if i:
+                        time.sleep(fake.token_s)
+                    self.wfile.write((json.dumps({"response": (" " if i else "") + tok, "done": False}) + "\n")
+                                     .encode("utf-8"))
+                    self.wfile.flush()
+                self.wfile.write((json.dumps({"response": "", **final}) + "\n").encode("utf-8"))
+
+        return Handler
+
+    def start(self) -> "FakeOllama":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        self._server.serve_forever()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    # python fake_ollama.py --port 11435 --load-s 0.2 --token-s 0.02
+    # then run the app with OLLAMA_HOST=http://127.0.0.1:11435
+    ap = argparse.ArgumentParser(description="Fake Ollama server for benchmarks")
+    ap.add_argument("--port", type=int, default=11435)
+    ap.add_argument("--load-s", type=float, default=0.05)
+    ap.add_argument("--token-s", type=float, default=0.005)
+    ap.add_argument("--tokens", type=int, default=60)
+    args = ap.parse_args()
+    server = FakeOllama(port=args.port, load_s=args.load_s, token_s=args.token_s, tokens=args.tokens)
+    print(f"Fake Ollama listening on {server.url}")
+    server.serve_forever()
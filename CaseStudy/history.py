@@ -0,0 +1,112 @@
+# history.py
+from __future__ import annotations
+
+import heapq
+from itertools import islice
+
+from blobs import event_context
+from storage import deleted_goal_ids, goal_names
+from tracing import traced
+
+PAGE_SIZE = 20
+
+
+def update_item(u: dict, names: dict) -> dict:
+    return {
+        "type": "update",
+        "goal": names.get(u.get("goal_id"), u.get("goal_id")),
+        "date": u.get("date", ""),
+        "text": u.get("text", ""),
+        "created_at": u.get("created_at", ""),
+    }
+
+
+def ai_item(a: dict, names: dict) -> dict:
+    return {
+        "type": "ai",
+        "goal": names.get(a.get("goal_id"), a.get("goal_id")),
+        "event_type": a.get("event_type", "ai"),
+        "user_text": a.get("user_text", ""),
+        "text": a.get("answer", ""),
+        "context": event_context(a),   # resolved from the blob store for packed events
+        "created_at": a.get("created_at", ""),
+    }
+
+
+def _newest_first(records: list, kind: str, start: int):
+    """(created_at, kind, position) walking backwards from position start-1."""
+    for i in range(start - 1, -1, -1):
+        yield records[i].get("created_at", ""), kind, i
+
+
+def iter_feed(data: dict, cursor: dict | None = None, goal: str | None = None, hits: set | None = None):
+    """
+    Lazily yield (kind, position) newest first across updates and ai_events.
+
+    Both lists are appended in created_at order, so reading each backwards
+    gives two sorted streams that heapq.merge interleaves without a full sort.
+    `cursor` ({"update": n, "ai": m}) resumes below those positions (clamped
+    to the lists, in case a reload shrank them since the cursor was made).
+    `goal` (a goal_id) and `hits` (a set of (kind, position) from the search
+    index) filter items as they stream past; nothing is materialized up front.
+    Records of deleted (tombstoned) goals are skipped.
+    """
+    n_updates, n_ai = len(data["updates"]), len(data["ai_events"])
+    cursor = {"update": min(cursor["update"], n_updates), "ai": min(cursor["ai"], n_ai)} if cursor \
+        else {"update": n_updates, "ai": n_ai}
+    gone = deleted_goal_ids(data["goals"])
+    streams = [
+        _newest_first(data["updates"], "update", cursor["update"]),
+        _newest_first(data["ai_events"], "ai", cursor["ai"]),
+    ]
+    for _, kind, i in heapq.merge(*streams, reverse=True):
+        if hits is not None and (kind, i) not in hits:
+            yield kind, i, False
+            continue
+        if goal is not None or gone:
+            gid = (data["updates"][i] if kind == "update" else data["ai_events"][i]).get("goal_id")
+            if gid in gone or (goal is not None and gid != goal):
+                yield kind, i, False
+                continue
+        yield kind, i, True
+
+
+@traced("history.page")
+def feed_page(data: dict, cursor: dict | None = None, page_size: int = PAGE_SIZE,
+              goal: str | None = None, hits: set | None = None):
+    """
+    One page of feed items plus the cursor for the next page (None once the
+    streams are exhausted). Only this page's items are built; filtered-out
+    items just advance the cursor.
+    """
+    pos = dict(cursor) if cursor else {"update": len(data["updates"]), "ai": len(data["ai_events"])}
+    names = goal_names(data["goals"])
+    items = []
+    stream = iter_feed(data, pos, goal, hits)
+    for kind, i, keep in stream:
+        pos[kind] = i   # everything of this kind at >= i has been consumed
+        if keep:
+            rec = data["updates"][i] if kind == "update" else data["ai_events"][i]
+            items.append(update_item(rec, names) if kind == "update" else ai_item(rec, names))
+            if len(items) == page_size:
+                break
+    else:
+        return items, None
+    return items, pos
+
+
+@traced("history.ranked_page")
+def ranked_page(data: dict, ranked: list, offset: int = 0, page_size: int = PAGE_SIZE,
+                goal: str | None = None):
+    """Page through search hits in relevance order; returns (items, next_offset or None)."""
+    names = goal_names(data["goals"])
+    gone = deleted_goal_ids(data["goals"])
+    items = []
+    for i, (kind, pos) in enumerate(islice(ranked, offset, None), start=offset):
+        rec = data["updates"][pos] if kind == "update" else data["ai_events"][pos]
+        if rec.get("goal_id") in gone or (goal is not None and rec.get("goal_id") != goal):
+            continue
+        items.append(update_item(rec, names) if kind == "update" else ai_item(rec, names))
+        if len(items) == page_size:
+            return items, (i + 1 if i + 1 < len(ranked) else None)
+    return items, None
@@ -0,0 +1,198 @@
+# indexes.py
+from __future__ import annotations
+
+import threading
+from bisect import bisect_left
+
+from records import Update, day_str, to_day, to_seconds
+
+
+def update_key(u: dict) -> tuple:
+    """(date, created_at) as ints (day ordinal, seconds); -1 for a missing or malformed field."""
+    if type(u) is Update:
+        return (u.day, u.created)
+    return (to_day(u.get("date")), to_seconds(u.get("created_at")))
+
+
+class UpdateIndex:
+    """
+    goal_id -> updates kept sorted oldest..newest by (date, created_at)
+    (int keys, see update_key).
+
+    Inserts bisect into the goal's list (new entries usually land at the end),
+    and top-N reads slice the tail, so they cost O(n) instead of a full
+    filter + sort of every update. Reads run on session threads while
+    apply_op writes, so both go through _lock and reads hand out copies.
+    """
+
+    def __init__(self, updates=()):
+        self._keys: dict[str, list[tuple]] = {}
+        self._items: dict[str, list[dict]] = {}
+        self._lock = threading.Lock()
+        self.rebuild(updates)
+
+    def rebuild(self, updates) -> None:
+        by_goal: dict[str, list[dict]] = {}
+        for u in updates:
+            by_goal.setdefault(u.goal_id if type(u) is Update else u["goal_id"], []).append(u)
+        for goal, items in by_goal.items():
+            # reverse first so equal keys keep the same order as the old
+            # sort(reverse=True): earlier inserts read back first
+            items.reverse()
+            items.sort(key=update_key)
+        keys = {goal: [update_key(u) for u in items] for goal, items in by_goal.items()}
+        with self._lock:
+            self._items, self._keys = by_goal, keys
+
+    def add(self, u: dict) -> None:
+        k = update_key(u)
+        with self._lock:
+            keys = self._keys.setdefault(u["goal_id"], [])
+            pos = bisect_left(keys, k)
+            keys.insert(pos, k)
+            self._items.setdefault(u["goal_id"], []).insert(pos, u)
+
+    def drop_goal(self, goal: str) -> None:
+        with self._lock:
+            self._keys.pop(goal, None)
+            self._items.pop(goal, None)
+
+    def recent(self, goal: str, n: int = 5) -> list:
+        """Newest n updates for a goal, newest first."""
+        if n <= 0:
+            return []
+        with self._lock:
+            items = self._items.get(goal, [])
+            return items[:-n - 1:-1] if n < len(items) else items[::-1]
+
+    def between(self, goal: str, start: str, end: str) -> list:
+        """A goal's updates dated start..end (inclusive), oldest first."""
+        with self._lock:
+            keys = self._keys.get(goal, [])
+            lo, hi = bisect_left(keys, (to_day(start),)), bisect_left(keys, (to_day(end) + 1,))
+            return self._items.get(goal, [])[lo:hi]
+
+    def goals(self) -> list:
+        with self._lock:
+            return list(self._items)
+
+    def items(self, goal: str) -> list:
+        """A copy of all of a goal's updates, oldest first."""
+        with self._lock:
+            return list(self._items.get(goal, []))
+
+    def count(self, goal: str) -> int:
+        with self._lock:
+            return len(self._items.get(goal, []))
+
+
+class GoalRegistry:
+    """
+    The goals list, indexed: id -> goal, casefolded name -> live goal, status
+    buckets, and per-goal update counters (entries, last entry date).
+
+    Goal dicts are shared with the persisted list; apply_op edits them and then
+    calls refresh() / add_update(), so lookups, duplicate-name checks and status
+    moves are O(1) and listing a status costs only the goals in it. Changes and
+    listings go through _lock (single-key lookups are atomic on their own).
+    """
+
+    def __init__(self, goals=(), updates=()):
+        self._by_id: dict[str, dict] = {}
+        self._pos: dict[str, int] = {}            # goal_id -> position in the goals list
+        self._filed: dict[str, tuple] = {}        # goal_id -> (name key, status) it is filed under
+        self._names: dict[str, dict] = {}
+        self._status: dict[str, dict[str, dict]] = {}
+        self._listing: dict[str | None, list] = {}   # ordered listings, dropped on any change
+        self._entries: dict[str, int] = {}
+        self._last: dict[str, int] = {}           # goal_id -> newest entry's day ordinal
+        self._lock = threading.Lock()
+        self.rebuild(goals, updates)
+
+    def rebuild(self, goals, updates=()) -> None:
+        with self._lock:
+            for d in (self._by_id, self._pos, self._filed, self._names, self._status, self._listing,
+                      self._entries, self._last):
+                d.clear()
+            for g in goals:
+                self._file(g)
+            entries, last = self._entries, self._last
+            for u in updates:
+                gid, day = (u.goal_id, u.day) if type(u) is Update else (u["goal_id"], update_key(u)[0])
+                entries[gid] = entries.get(gid, 0) + 1
+                if day > last.get(gid, -1):
+                    last[gid] = day
+
+    def refresh(self, g: dict) -> None:
+        """File a new goal, or re-file one whose name, status or tombstone changed."""
+        with self._lock:
+            self._file(g)
+
+    def _file(self, g: dict) -> None:
+        gid = g["id"]
+        old = self._filed.pop(gid, None)
+        if old is not None:
+            if self._names.get(old[0]) is self._by_id[gid]:
+                del self._names[old[0]]
+            self._status[old[1]].pop(gid, None)
+        self._by_id[gid] = g
+        self._pos.setdefault(gid, len(self._pos))
+        if not g.get("deleted"):
+            key, status = g["name"].casefold(), g.get("status", "active")
+            self._names[key] = g
+            self._status.setdefault(status, {})[gid] = g
+            self._filed[gid] = (key, status)
+        self._listing.clear()
+
+    def add_update(self, u: dict) -> None:
+        gid, day = u["goal_id"], update_key(u)[0]
+        with self._lock:
+            self._entries[gid] = self._entries.get(gid, 0) + 1
+            if day > self._last.get(gid, -1):
+                self._last[gid] = day
+
+    def set_counts(self, goal_id: str, entries: int, last_date: str | None) -> None:
+        """Counters known from elsewhere (the hot view), without the updates themselves."""
+        with self._lock:
+            self._entries[goal_id] = entries
+            self._last[goal_id] = to_day(last_date)
+
+    def get(self, goal_id: str) -> dict | None:
+        """The goal with this id, tombstoned or not."""
+        return self._by_id.get(goal_id)
+
+    def by_name(self, name: str) -> dict | None:
+        """The live goal with this name, ignoring case."""
+        return self._names.get(name.casefold())
+
+    def name_taken(self, name: str, except_id: str | None = None) -> bool:
+        g = self.by_name(name)
+        return g is not None and g["id"] != except_id
+
+    def live(self) -> list:
+        """Live goals in list order (do not mutate)."""
+        with self._lock:
+            listing = self._listing.get(None)
+            if listing is None:
+                listing = self._listing[None] = sorted(
+                    (g for bucket in self._status.values() for g in bucket.values()), key=self._order)
+            return listing
+
+    def with_status(self, status: str) -> list:
+        """Live goals with this status, in list order (do not mutate)."""
+        with self._lock:
+            listing = self._listing.get(status)
+            if listing is None:
+                listing = self._listing[status] = sorted(self._status.get(status, {}).values(), key=self._order)
+            return listing
+
+    def _order(self, g: dict) -> int:
+        return self._pos[g["id"]]
+
+    def entries(self, goal_id: str) -> int:
+        return self._entries.get(goal_id, 0)
+
+    def last_entry(self, goal_id: str) -> str | None:
+        """Date of the goal's newest update, or None."""
+        day = self._last.get(goal_id, -1)
+        return day_str(day) if day >= 0 else None
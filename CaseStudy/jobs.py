@@ -0,0 +1,94 @@
+# jobs.py
+from __future__ import annotations
+
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+MAX_WORKERS = 2       # Ollama mostly serves one generation at a time anyway
+MAX_PENDING = 16      # queued + running; beyond this submit() raises QueueFull
+KEEP_FINISHED = 200   # finished jobs kept around for the UI to pick up
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Job:
+    """
+    One background generation. Workers fill `partial` as text streams in,
+    then set `answer` and status "done" (or "error" with `error`).
+    """
+
+    def __init__(self, job_id: int, owner: str, kind: str, goal: str):
+        self.id = job_id
+        self.owner = owner
+        self.kind = kind              # daily_feedback | ask_answer | progress_summary
+        self.goal = goal
+        self.status = "queued"        # queued | running | done | error
+        self.partial = ""
+        self.answer = ""
+        self.error = ""
+        self.metrics: dict = {}
+        self.context: list = []
+        self.submitted_at = time.time()
+        self.finished_at: float | None = None
+
+    @property
+    def pending(self) -> bool:
+        return self.status in ("queued", "running")
+
+
+class JobQueue:
+    """
+    Bounded thread pool for model calls, shared by every session of the app
+    (via st.cache_resource). `fn(job)` runs on a worker and returns the answer;
+    it is responsible for persisting results (e.g. through log_ai_event).
+    """
+
+    def __init__(self, max_workers: int = MAX_WORKERS, max_pending: int = MAX_PENDING):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="goalbot-job")
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._jobs: OrderedDict[int, Job] = OrderedDict()
+        self.max_pending = max_pending
+
+    def submit(self, owner: str, kind: str, goal: str, fn, context=None) -> Job:
+        with self._lock:
+            if sum(1 for j in self._jobs.values() if j.pending) >= self.max_pending:
+                raise QueueFull("Goalbot is busy — try again in a moment.")
+            job = Job(next(self._ids), owner, kind, goal)
+            job.context = list(context or [])
+            self._jobs[job.id] = job
+            self._trim()
+        self._pool.submit(self._run, job, fn)
+        return job
+
+    def _run(self, job: Job, fn) -> None:
+        job.status = "running"
+        try:
+            job.answer = fn(job) or job.partial.strip()
+            job.status = "done"
+        except Exception as e:
+            job.error = str(e)
+            job.status = "error"
+        finally:
+            job.finished_at = time.time()
+
+    def _trim(self) -> None:
+        finished = [j.id for j in self._jobs.values() if not j.pending]
+        for job_id in finished[:max(0, len(finished) - KEEP_FINISHED)]:
+            del self._jobs[job_id]
+
+    def latest(self, owner: str, kind: str, goal: str | None = None) -> Job | None:
+        with self._lock:
+            for job in reversed(self._jobs.values()):
+                if job.owner == owner and job.kind == kind and (goal is None or job.goal == goal):
+                    return job
+        return None
+
+    def pending_count(self, owner: str | None = None) -> int:
+        with self._lock:
+            return sum(1 for j in self._jobs.values() if j.pending and (owner is None or j.owner == owner))
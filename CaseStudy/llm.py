@@ -0,0 +1,330 @@
+# llm.py
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+
+from llm_cache import cache_key, get_cache
+from tracing import span, tracer
+
+OLLAMA_MODEL = "llama3.1"
+OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "http://localhost:11434").rstrip("/")
+OLLAMA_URL = f"{OLLAMA_HOST}/api/generate"
+OLLAMA_OPTIONS = {"temperature": 0.6, "num_predict": 220}
+OLLAMA_TIMEOUT = 60
+# transient failures (connection errors, 429 / 5xx) retried by ollama_session()
+OLLAMA_RETRIES = 3
+OLLAMA_BACKOFF_S = 0.5   # waits 0.5 s, 1 s, 2 s, ... between attempts
+# how long Ollama keeps the model loaded after a request ("30m", "2h", seconds, or -1 = forever);
+# without it the server default (5 min) unloads the model between sparse calls
+OLLAMA_KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+# admission control: requests sent at once, callers allowed to wait for a slot, and for how long
+OLLAMA_MAX_INFLIGHT = int(os.environ.get("GOALBOT_OLLAMA_MAX_INFLIGHT", "2"))
+OLLAMA_MAX_WAITING = 8
+OLLAMA_ADMIT_TIMEOUT_S = 5.0
+BUSY_MESSAGE = "Ollama is busy — try again in a moment."
+
+
+def _keep_alive():
+    try:
+        return int(OLLAMA_KEEP_ALIVE)
+    except ValueError:
+        return OLLAMA_KEEP_ALIVE
+
+
+def _payload(prompt: str, stream: bool) -> dict:
+    return {
+        "model": OLLAMA_MODEL,
+        "prompt": prompt,
+        "stream": stream,
+        "options": OLLAMA_OPTIONS,
+        "keep_alive": _keep_alive(),
+    }
+
+
+def _key(prompt: str) -> str:
+    return cache_key(OLLAMA_MODEL, prompt, OLLAMA_OPTIONS)
+
+
+def ollama_session(pool_size: int = 4, retries: int = OLLAMA_RETRIES, backoff: float = OLLAMA_BACKOFF_S):
+    """
+    requests.Session for many calls: keeps up to `pool_size` connections to
+    Ollama open (one per concurrent caller) and retries connection errors and
+    429 / 5xx answers with exponential backoff. Generation has no side
+    effects, so retrying the POST is safe.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=(429, 500, 502, 503, 504),
+                  allowed_methods=frozenset({"POST"}), raise_on_status=False)
+    session = requests.Session()
+    session.mount(OLLAMA_HOST + "/", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry))
+    return session
+
+
+def _final_metrics(metrics: dict, chunk: dict) -> None:
+    """Copy Ollama's counters from the final (done) chunk; durations are in ns."""
+    eval_count = chunk.get("eval_count") or 0
+    eval_ns = chunk.get("eval_duration") or 0
+    metrics["eval_count"] = eval_count
+    metrics["tokens_per_s"] = round(eval_count / (eval_ns / 1e9), 2) if eval_ns else None
+    metrics["prompt_eval_count"] = chunk.get("prompt_eval_count")
+    if chunk.get("prompt_eval_duration"):
+        metrics["prompt_eval_s"] = round(chunk["prompt_eval_duration"] / 1e9, 3)
+    if chunk.get("load_duration"):
+        metrics["load_s"] = round(chunk["load_duration"] / 1e9, 3)
+
+
+# =========================
+# Shared client
+# =========================
+class OllamaBusy(Exception):
+    pass
+
+
+class _Flight:
+    """One request in progress; callers with the same prompt read its pieces instead of sending their own."""
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.pieces: list[str] = []
+        self.done = False
+        self.error: str | None = None
+        self.busy = False
+        self.metrics: dict = {}
+
+
+class OllamaClient:
+    """
+    One per process (get_client()), shared by every session and job:
+
+    - a pooled session (ollama_session), so calls reuse warm connections;
+    - keep_alive on every request plus prewarm(), so the model stays loaded;
+    - coalescing: a prompt identical to one already in flight (model + prompt
+      + options, the response cache key) waits for that request and gets the
+      same pieces, so a double-click costs one generation;
+    - admission: at most max_inflight requests at once and max_waiting callers
+      queued for admit_timeout_s; anyone beyond that gets OllamaBusy (surfaced
+      as a "busy" error piece) instead of piling up behind 60 s timeouts.
+    """
+
+    def __init__(self, max_inflight: int = OLLAMA_MAX_INFLIGHT, max_waiting: int = OLLAMA_MAX_WAITING,
+                 admit_timeout_s: float = OLLAMA_ADMIT_TIMEOUT_S, retries: int = OLLAMA_RETRIES,
+                 backoff: float = OLLAMA_BACKOFF_S):
+        self.max_inflight = max_inflight
+        self.max_waiting = max_waiting
+        self.admit_timeout_s = admit_timeout_s
+        self._retries, self._backoff = retries, backoff
+        self._session = None
+        self._slots = threading.BoundedSemaphore(max_inflight)
+        self._lock = threading.Lock()
+        self._flights: dict[str, _Flight] = {}
+        self.counts = {"requests": 0, "coalesced": 0, "busy": 0, "waiting": 0, "inflight": 0}
+
+    @property
+    def session(self):
+        with self._lock:
+            if self._session is None:
+                # deferred: requests costs ~0.1 s of import time, not needed for the first render
+                self._session = ollama_session(self.max_inflight, self._retries, self._backoff)
+            return self._session
+
+    def close(self) -> None:
+        if self._session is not None:
+            self._session.close()
+
+    def _admit(self) -> None:
+        with self._lock:
+            if self.counts["waiting"] >= self.max_waiting:
+                self.counts["busy"] += 1
+                raise OllamaBusy(BUSY_MESSAGE)
+            self.counts["waiting"] += 1
+        admitted = self._slots.acquire(timeout=self.admit_timeout_s)
+        with self._lock:
+            self.counts["waiting"] -= 1
+            if not admitted:
+                self.counts["busy"] += 1
+                raise OllamaBusy(BUSY_MESSAGE)
+            self.counts["inflight"] += 1
+            self.counts["requests"] += 1
+
+    def _release(self) -> None:
+        with self._lock:
+            self.counts["inflight"] -= 1
+        self._slots.release()
+
+    def prewarm(self) -> None:
+        """Ask Ollama to load the model now (in the background) so the first real request skips the load."""
+        def run():
+            with span("llm.prewarm") as sp:
+                try:
+                    r = self.session.post(OLLAMA_URL, json={"model": OLLAMA_MODEL, "keep_alive": _keep_alive()},
+                                          timeout=OLLAMA_TIMEOUT)
+                    r.raise_for_status()
+                except Exception as e:
+                    sp["error"] = type(e).__name__   # Ollama not up yet: the first request loads it instead
+        threading.Thread(target=run, name="goalbot-prewarm", daemon=True).start()
+
+    def _fetch(self, prompt: str, stream: bool, flight: _Flight, key: str) -> None:
+        """Leader side: send the request and publish pieces / final metrics / error on the flight."""
+        start = time.perf_counter()
+
+        def publish(**fields):
+            if fields.get("done"):
+                with self._lock:
+                    self._flights.pop(key, None)   # later callers hit the cache or start a new request
+            with flight.cond:
+                for k, v in fields.items():
+                    if k == "piece":
+                        flight.pieces.append(v)
+                    else:
+                        setattr(flight, k, v)
+                flight.cond.notify_all()
+
+        try:
+            self._admit()
+        except OllamaBusy as e:
+            publish(error=str(e), busy=True, done=True)
+            return
+        try:
+            with self.session.post(OLLAMA_URL, json=_payload(prompt, stream), stream=stream,
+                                   timeout=OLLAMA_TIMEOUT) as r:
+                r.raise_for_status()
+                if not stream:
+                    body = r.json()
+                    _final_metrics(flight.metrics, body)
+                    publish(piece=(body.get("response") or "").strip())
+                else:
+                    for line in r.iter_lines():
+                        if not line:
+                            continue
+                        chunk = json.loads(line)
+                        if chunk.get("error"):
+                            raise RuntimeError(chunk["error"])
+                        if chunk.get("response"):
+                            publish(piece=chunk["response"])
+                        if chunk.get("done"):
+                            _final_metrics(flight.metrics, chunk)
+                            break
+            get_cache().put(key, "".join(flight.pieces).strip(), OLLAMA_MODEL, time.perf_counter() - start)
+            publish(done=True)
+        except Exception as e:
+            publish(error=str(e), done=True)
+        finally:
+            self._release()
+
+    def pieces(self, prompt: str, metrics: dict | None = None, regenerate: bool = False, stream: bool = True):
+        """
+        Yield the answer as it arrives (one piece when stream=False) from the
+        cache, a coalesced in-flight request, or a new one. Fills `metrics` like
+        ollama_stream; errors (busy included) are yielded as a "⚠️" piece.
+        """
+        metrics = metrics if metrics is not None else {}
+        start = time.perf_counter()
+        key = _key(prompt)
+        if not regenerate:
+            cached = get_cache().get(key)
+            if cached is not None:
+                metrics.update(cached=True, ttft_s=round(time.perf_counter() - start, 3))
+                yield cached
+                return
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.counts["coalesced"] += 1
+                metrics["coalesced"] = True
+        if leader:
+            threading.Thread(target=self._fetch, args=(prompt, stream, flight, key),
+                             name="goalbot-llm", daemon=True).start()
+        seen = 0
+        while True:
+            with flight.cond:
+                while len(flight.pieces) == seen and not flight.done:
+                    flight.cond.wait()
+                new, done = flight.pieces[seen:], flight.done
+            for piece in new:
+                if piece and "ttft_s" not in metrics:
+                    metrics["ttft_s"] = round(time.perf_counter() - start, 3)
+                yield piece
+            seen += len(new)
+            if done:
+                break
+        metrics.update(flight.metrics)
+        if flight.error:
+            metrics["error"] = flight.error
+            if flight.busy:
+                metrics["busy"] = True
+                yield f"⚠️ {flight.error}"
+            else:
+                yield f"⚠️ Ollama error: {flight.error}"
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.counts)
+
+
+_client: OllamaClient | None = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> OllamaClient:
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = OllamaClient()
+        return _client
+
+
+# =========================
+# Generation
+# =========================
+def ollama_generate(prompt: str, regenerate: bool = False, metrics: dict | None = None,
+                    client: OllamaClient | None = None) -> str:
+    """
+    Cached generation. regenerate=True skips the cache lookup
+    (the fresh answer still replaces the cached one).
+    `metrics` is filled like ollama_stream's; `client` defaults to the shared one.
+    """
+    metrics = metrics if metrics is not None else {}
+    start = time.perf_counter()
+    with span("llm.generate", bytes=len(prompt)) as sp:
+        answer = "".join((client or get_client()).pieces(prompt, metrics, regenerate, stream=False)).strip()
+        metrics["total_s"] = round(time.perf_counter() - start, 3)
+        for k in ("cached", "coalesced", "busy", "tokens_per_s"):
+            if metrics.get(k):
+                sp[k] = metrics[k]
+        if metrics.get("error"):
+            sp["error"] = "busy" if metrics.get("busy") else "request"
+        return answer
+
+
+def ollama_stream(prompt: str, metrics: dict | None = None, regenerate: bool = False,
+                  client: OllamaClient | None = None):
+    """
+    Yield response text pieces as Ollama produces them (NDJSON stream).
+
+    If `metrics` is given it is filled in place with:
+    ttft_s (time to first token), total_s, eval_count, tokens_per_s,
+    prompt_eval_count / prompt_eval_s (prompt size and processing time),
+    cached=True when the answer came from the response cache, coalesced=True
+    when it was shared with an identical request already in flight, and
+    busy=True when admission was refused.
+    Errors are yielded as a "⚠️ Ollama error" piece, like ollama_generate.
+    """
+    metrics = metrics if metrics is not None else {}
+    start = time.perf_counter()
+    try:
+        yield from (client or get_client()).pieces(prompt, metrics, regenerate, stream=True)
+    finally:
+        metrics["total_s"] = round(time.perf_counter() - start, 3)
+        tracer.record("llm.stream", metrics["total_s"] * 1000, bytes=len(prompt),
+                      ttft_s=metrics.get("ttft_s"), tokens_per_s=metrics.get("tokens_per_s"),
+                      cached=metrics.get("cached", False), coalesced=metrics.get("coalesced", False),
+                      error=bool(metrics.get("error")))
@@ -0,0 +1,155 @@
+# llm_cache.py
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from storage import DATA_DIR
+
+CACHE_FILE = DATA_DIR / "llm_cache.sqlite3"
+CACHE_MAX_ENTRIES = 500
+CACHE_MAX_BYTES = 20 * 1024 * 1024
+CACHE_TTL_S: float | None = None   # None = entries never expire, only get evicted
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT,
+    answer TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    gen_seconds REAL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses(last_used);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value REAL NOT NULL
+);
+"""
+
+
+def cache_key(model: str, prompt: str, options: dict | None) -> str:
+    raw = json.dumps({"model": model, "prompt": prompt, "options": options or {}}, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    On-disk LRU cache of model answers, keyed on model + prompt + options.
+
+    Bounded by entry count and total answer bytes (least recently used go
+    first), with an optional TTL. Counters (hits, misses, saved_seconds)
+    are persisted so the savings survive restarts.
+    """
+
+    def __init__(self, path: Path | None = None, max_entries: int = CACHE_MAX_ENTRIES,
+                 max_bytes: int = CACHE_MAX_BYTES, ttl_s: float | None = CACHE_TTL_S):
+        self.path = path or CACHE_FILE
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _bump(self, conn, name: str, by: float) -> None:
+        conn.execute(
+            "INSERT INTO counters(name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, by),
+        )
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                row = conn.execute(
+                    "SELECT answer, gen_seconds, created_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row and self.ttl_s is not None and now - row[2] > self.ttl_s:
+                    conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    row = None
+                if row is None:
+                    self._bump(conn, "misses", 1)
+                    return None
+                conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+                self._bump(conn, "hits", 1)
+                self._bump(conn, "saved_seconds", row[1] or 0.0)
+                return row[0]
+
+    def put(self, key: str, answer: str, model: str = "", gen_seconds: float | None = None) -> None:
+        now = time.time()
+        size = len(answer.encode("utf-8"))
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses(key, model, answer, size, gen_seconds, created_at, last_used) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, model, answer, size, gen_seconds, now, now),
+                )
+                self._evict(conn)
+
+    def _evict(self, conn) -> None:
+        if self.ttl_s is not None:
+            conn.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl_s,))
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        # walk oldest-first until both bounds hold
+        drop = []
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_used"):
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            drop.append((key,))
+            count -= 1
+            total -= size
+        conn.executemany("DELETE FROM responses WHERE key = ?", drop)
+        self._bump(conn, "evictions", len(drop))
+
+    def stats(self) -> dict:
+        with self._lock:
+            conn = self._connect()
+            counters = dict(conn.execute("SELECT name, value FROM counters"))
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        hits, misses = int(counters.get("hits", 0)), int(counters.get("misses", 0))
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 3) if hits + misses else 0.0,
+            "saved_seconds": round(counters.get("saved_seconds", 0.0), 1),
+            "evictions": int(counters.get("evictions", 0)),
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM responses")
+                conn.execute("DELETE FROM counters")
+
+
+_cache: ResponseCache | None = None
+
+
+def get_cache() -> ResponseCache:
+    global _cache
+    if _cache is None:
+        _cache = ResponseCache()
+    return _cache
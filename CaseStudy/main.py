@@ -1,72 +1,88 @@
-import streamlit as st
-from datetime import date, datetime
-import re
-import requests
+import time
+_rerun_start = time.perf_counter()   # time-to-first-render is measured from here
 
-from storage import load_data, save_data, now_ts
+import streamlit as st
+from datetime import date
+from functools import partial
+import io
+import uuid
+
+from storage import (Store, recent_updates, now_ts, normalize_date, goal_names, new_goal_id, ALL_GOALS,
+                     METRICS_FILE)
+from llm import BUSY_MESSAGE, get_client, ollama_stream, ollama_generate
+from llm_cache import get_cache
+from search import get_search_index
+from history import feed_page, ranked_page
+from prompts import (build_prompt, daily_feedback_prompt, estimate_tokens, pack_updates,
+                     DAILY_CONTEXT_BUDGET, SUMMARY_RECENT_BUDGET)
+from summaries import latest_summaries, refresh_goal_summary, progress_prompt, RECENT_RAW
+from jobs import JobQueue, QueueFull
+from blobs import pack_ai_event
+from tracing import tracer, RerunProfiler
+from archive import FORMATS, detect_format, export, import_entries, read_entries
+
+
+def finish_profile():
+    """Stop the running cProfile capture, if any, and keep its report for the Performance panel."""
+    profiler = st.session_state.pop("_rerun_profiler", None)
+    if profiler is not None:
+        st.session_state.last_profile = profiler.stop()
+
+
+finish_profile()   # a run cut short by st.stop(), st.rerun() or an error left its profiler running
+if st.session_state.get("profile_rerun"):
+    st.session_state._rerun_profiler = RerunProfiler().start()
 
 
 # =========================
 # LOAD JSON DATA ON STARTUP
 # =========================
-if "data" not in st.session_state:
-    st.session_state.data = load_data()
+@st.cache_resource
+def get_store() -> Store:
+    # one parsed copy for every session; writes are locked and version-checked.
+    # lazy: the first render only needs goals + recent updates (the hot view);
+    # store.data (updates, ai_events) loads on first use or after the first render
+    return Store(lazy=True)
+
 
-data = st.session_state.data
-goals = data["goals"]            # list[dict] {name,status}
-updates = data["updates"]        # list[dict] {goal,date,text,created_at}
-ai_events = data["ai_events"]    # list[dict] {event_type,goal,user_text,prompt,answer,context,created_at}
+store = get_store()
+store.sync()
+goals = store.goals              # list[dict] {id,name,status}, live goals only
+# store.data["updates"]:   list[dict] {goal_id,date,text,created_at}
+# store.data["ai_events"]: list[dict] {event_type,goal_id,user_text,answer,prompt_ref,context_ref,created_at}
 
 
 # =========================
-# OLLAMA
+# BACKGROUND JOBS (shared by all sessions)
 # =========================
-OLLAMA_MODEL = "llama3.1"
-OLLAMA_URL = "http://localhost:11434/api/generate"
-
-
-def ollama_generate(prompt: str) -> str:
-    payload = {
-        "model": OLLAMA_MODEL,
-        "prompt": prompt,
-        "stream": False,
-        "options": {"temperature": 0.6, "num_predict": 220},
-    }
-    try:
-        r = requests.post(OLLAMA_URL, json=payload, timeout=60)
-        r.raise_for_status()
-        return (r.json().get("response") or "").strip()
-    except Exception as e:
-        return f"⚠️ Ollama error: {e}"
+@st.cache_resource
+def get_job_queue() -> JobQueue:
+    return JobQueue()
 
 
-def choose_context(all_updates, goal: str, question: str, n: int = 6):
-    items = [u for u in all_updates if u["goal"] == goal]
-    items.sort(key=lambda x: (x.get("date", ""), x.get("created_at", "")), reverse=True)
-    return items[:n]
+job_queue = get_job_queue()
 
 
-def build_prompt(goal: str, question: str, context_updates):
-    context_text = "\n".join([f"- {u['date']}: {u['text']}" for u in context_updates])
-    return f"""
-You are Goalbot, a private, empathetic journaling companion.
-You help the user reflect without judgment and suggest small actionable steps.
-Do NOT provide medical advice. If the user mentions self-harm, encourage them to seek immediate professional help.
+@st.cache_resource
+def get_llm_client():
+    # one pooled client for every session; loading the model now saves the first request its load time
+    client = get_client()
+    client.prewarm()
+    return client
 
-GOAL:
-{goal}
 
-RECENT JOURNAL UPDATES:
-{context_text}
+llm_client = get_llm_client()
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+session_id = st.session_state.session_id
 
-USER QUESTION:
-{question}
 
-Respond with:
-1) A warm reflection (2-4 sentences)
-2) 2 reflection questions (bulleted)
-3) 1 small next step for tomorrow (specific and low effort)
-""".strip()
+# =========================
+# CONTEXT + PROMPTS
+# =========================
+def choose_context(goal_id: str, question: str, n: int = 6):
+    from retrieval import choose_context as select_context   # numpy: imported on first use
+    return select_context(store.data, goal_id, question, n)
 
 
 # =========================
@@ -142,84 +158,244 @@ textarea::placeholder, input::placeholder { color: rgba(249,250,251,0.55) !impor
 # =========================
 # Helpers (JSON-backed)
 # =========================
-def normalize_date(s: str) -> str:
-    s = (s or "").strip()
-    if re.match(r"^\d{4}/\d{2}/\d{2}$", s):
-        s = s.replace("/", "-")
-    if not re.match(r"^\d{4}-\d{2}-\d{2}$", s):
-        raise ValueError("Use YYYY-MM-DD (example: 2026-01-30)")
-    datetime.strptime(s, "%Y-%m-%d")
-    return s
+def active_goals():
+    return store.registry.with_status("active")
 
 
-def active_goals():
-    return [g["name"] for g in goals if g.get("status") == "active"]
+def find_goal(goal_id: str) -> dict | None:
+    g = store.registry.get(goal_id)
+    return None if g is None or g.get("deleted") else g
 
 
 def inactive_goals():
-    return [g["name"] for g in goals if g.get("status") == "inactive"]
+    return store.registry.with_status("inactive")
+
+
+def goal_name_taken(name: str, except_id: str | None = None) -> bool:
+    return store.registry.name_taken(name, except_id)
 
 
 def add_goal(name: str) -> bool:
     name = (name or "").strip()
-    if not name:
+    if not name or goal_name_taken(name):
         return False
-    if any(g["name"].lower() == name.lower() for g in goals):
+    store.mutate("add_goal", {"id": new_goal_id(), "name": name, "status": "active"})
+    return True
+
+
+def rename_goal(goal_id: str, name: str) -> bool:
+    name = (name or "").strip()
+    if not name or goal_name_taken(name, except_id=goal_id):
         return False
-    goals.append({"name": name, "status": "active"})
-    save_data(data)
+    store.mutate("rename_goal", {"id": goal_id, "name": name})
     return True
 
 
-def remove_goal(name: str) -> None:
-    data["goals"] = [g for g in goals if g["name"] != name]
-    data["updates"] = [u for u in updates if u["goal"] != name]
-    data["ai_events"] = [a for a in ai_events if a.get("goal") != name]
-    save_data(data)
+def remove_goal(goal_id: str) -> None:
+    store.mutate("remove_goal", {"id": goal_id})
 
 
-def set_goal_status(name: str, status: str) -> None:
-    for g in goals:
-        if g["name"] == name:
-            g["status"] = status
-            save_data(data)
-            return
+def set_goal_status(goal_id: str, status: str) -> None:
+    store.mutate("set_goal_status", {"id": goal_id, "status": status})
 
 
-def save_update(goal: str, date_str: str, text: str) -> bool:
+def save_update(goal_id: str, date_str: str, text: str) -> bool:
     text = (text or "").strip()
     if not text:
         return False
-    updates.append({"goal": goal, "date": date_str, "text": text, "created_at": now_ts()})
-    save_data(data)
+    rec = {"goal_id": goal_id, "date": date_str, "text": text, "created_at": now_ts()}
+    store.mutate("add_update", rec)
+    from retrieval import embed_async
+    embed_async([rec])
     return True
 
 
-def recent_for_goal(goal: str, n: int = 5):
-    items = [u for u in updates if u["goal"] == goal]
-    items.sort(key=lambda x: (x.get("date", ""), x.get("created_at", "")), reverse=True)
-    return items[:n]
+def recent_for_goal(goal_id: str, n: int = 5):
+    return recent_view(goal_id, n, store.revision("updates"))
 
 
-def log_ai_event(event_type: str, goal: str, user_text: str, prompt: str, answer: str, context_updates=None):
+def log_ai_event(event_type: str, goal_id: str, user_text: str, prompt: str, answer: str, context_updates=None,
+                 metrics=None):
     context_updates = context_updates or []
-    ai_events.append({
+    event = {
         "event_type": event_type,   # daily_feedback | ask_answer | progress_summary
-        "goal": goal,
+        "goal_id": goal_id,
         "user_text": user_text,
         "prompt": prompt,
         "answer": answer,
         "context": [{"date": u.get("date"), "text": u.get("text")} for u in context_updates],
         "created_at": now_ts(),
-    })
-    save_data(data)
+    }
+    if metrics:
+        event["metrics"] = metrics   # ttft_s, total_s, eval_count, tokens_per_s, prompt_* sizes
+    store_ai_event(event)
+
+
+def store_ai_event(event: dict) -> None:
+    # prompt + context go to the blob store; the event keeps only their hashes
+    store.mutate("add_ai_event", pack_ai_event(event))
+
+
+# =========================
+# DERIVED VIEWS (shared by all sessions)
+# =========================
+# Keyed on store.revision(...), which every write bumps: an entry is reused
+# until the data it was built from changes, then never hit again. Results are
+# shared, so callers only read them.
+@st.cache_resource(max_entries=256, show_spinner=False)
+def recent_view(goal_id: str, n: int, revision: int) -> list:
+    return store.recent(goal_id, n)
+
+
+@st.cache_resource(max_entries=64, show_spinner=False)
+def search_view(query: str, revision: int) -> list:
+    return get_search_index(store.data).search(query)
+
+
+@st.cache_resource(max_entries=64, show_spinner=False)
+def history_view(cursor, goal: str | None, query: str, order: str, revision: int) -> tuple:
+    """One History page: (items, next cursor)."""
+    data = store.data
+    if query and order == "Best match":
+        return ranked_page(data, search_view(query, revision), cursor or 0, goal=goal)
+    hits = set(search_view(query, revision)) if query else None
+    return feed_page(data, cursor, goal=goal, hits=hits)
+
+
+@st.cache_resource(max_entries=32, show_spinner=False)
+def stats_view(goal_ids: tuple, weeks: int, revision: int, today: date) -> dict:
+    """Everything the Statistics page draws for these goals (streaks depend on the day too)."""
+    from analytics import get_analytics   # numpy: imported on first use
+    stats = get_analytics(store.data)
+    names = goal_names(store.goals)
+    return {
+        "rows": [{"goal": names[gid], **stats.goal_stats(gid, today)} for gid in goal_ids],
+        "weekly": stats.weekly(list(goal_ids), weeks, today),
+        "heatmap": stats.heatmap(list(goal_ids), weeks, today),
+        "timeline": stats.ai_timeline(weeks, today),
+    }
+
+
+def card_html(title: str, body: str) -> str:
+    return f"""
+<div class="goalbot-card">
+  <h3>{title}</h3>
+  <div class="goalbot-muted">{body}</div>
+</div>
+"""
+
+
+def generate_job(job, prompt: str, event_type: str, goal_id: str, user_text: str, context_updates,
+                 regenerate: bool = False, prompt_stats=None) -> str:
+    """Worker body: stream the answer into job.partial, then persist it through log_ai_event."""
+    job.metrics["prompt_tokens_est"] = estimate_tokens(prompt)
+    job.metrics.update(prompt_stats or {})
+    for piece in ollama_stream(prompt, job.metrics, regenerate=regenerate):
+        job.partial += piece
+    if job.metrics.get("busy"):
+        raise RuntimeError(BUSY_MESSAGE)   # nothing generated, nothing to log
+    answer = job.partial.strip()
+    if job.metrics.get("coalesced"):
+        return answer                      # same prompt already in flight: its caller logs the answer
+    log_ai_event(event_type, goal_id, user_text, prompt, answer, context_updates, metrics=job.metrics)
+    return answer
+
+
+def summary_job(job, goal_list: list, regenerate: bool = False) -> str:
+    """Worker body for the progress report: fold new entries into rolling summaries, then report."""
+    data = store.data
+    summaries = latest_summaries(data["ai_events"], [g["id"] for g in goal_list])
+    for g in goal_list:
+        job.partial = f"Updating rolling summary: {g['name']}…"
+        ev = refresh_goal_summary(
+            g,
+            data.update_index.items(g["id"]),
+            summaries.get(g["id"]),
+            ollama_generate,
+            store_ai_event,
+        )
+        if ev:
+            summaries[g["id"]] = ev
+    job.partial = ""
+    recent_all, ctx_stats = pack_updates(recent_updates(data, None, RECENT_RAW), SUMMARY_RECENT_BUDGET)
+    job.context = recent_all
+    from analytics import get_analytics   # numpy: imported on first use
+    digest = get_analytics(data).digest(goal_list)
+    prompt = progress_prompt(summaries, recent_all, goal_names(data["goals"]), digest)
+    return generate_job(job, prompt, "progress_summary", ALL_GOALS, "", recent_all, regenerate=regenerate,
+                        prompt_stats=ctx_stats)
+
+
+def ask_job(job, goal: dict, question: str, regenerate: bool = False) -> str:
+    """Worker body for Ask: pick the context (embedding any new candidates), then answer."""
+    job.partial = "Choosing context…"
+    context, ctx_stats = choose_context(goal["id"], question, n=6)
+    job.context = context
+    job.partial = ""
+    prompt = build_prompt(goal["name"], question, context)
+    return generate_job(job, prompt, "ask_answer", goal["id"], question, context, regenerate=regenerate,
+                        prompt_stats=ctx_stats)
+
+
+def queue_job(kind: str, goal: str, fn, context=None) -> bool:
+    try:
+        job_queue.submit(session_id, kind, goal, fn, context)
+        return True
+    except QueueFull as e:
+        st.warning(str(e))
+        return False
+
+
+def render_job(job, title: str) -> None:
+    if job.status == "error":
+        body = f"⚠️ {job.error}"
+    elif job.pending:
+        body = (job.partial or "Goalbot is thinking…") + " ▌"
+    else:
+        body = job.answer
+    st.markdown(card_html(title, body), unsafe_allow_html=True)
+    metrics = job.metrics
+    if job.pending:
+        return
+    if metrics.get("cached"):
+        st.caption("⚡ From cache (same prompt as before) — use **Regenerate** for a fresh answer.")
+    elif metrics.get("ttft_s") is not None:
+        tps = metrics.get("tokens_per_s")
+        st.caption(f"First token {metrics['ttft_s']}s · total {metrics['total_s']}s"
+                   + (f" · {tps} tok/s" if tps else "")
+                   + f" · prompt {metrics.get('prompt_eval_count') or metrics.get('prompt_tokens_est')} tok"
+                   + (f" in {metrics['prompt_eval_s']}s" if metrics.get("prompt_eval_s") is not None else ""))
+
+
+def show_job(kind: str, goal: str | None, title: str):
+    """Latest job of this kind for this session; polls in a fragment while it is still running."""
+    job = job_queue.latest(session_id, kind, goal)
+    if job is None:
+        return None
+    if not job.pending:
+        render_job(job, title)
+        return job
+
+    def poll():
+        if not job.pending:
+            st.rerun()   # finished: one full rerun renders it statically and stops polling
+        render_job(job, title)
+
+    st.fragment(poll, run_every=1.0)()
+    return job
 
 
 # =========================
 # Sidebar navigation
 # =========================
 st.sidebar.title("🎯 Goalbot")
-page = st.sidebar.radio("Navigate", ["Goals", "History", "Ask Goalbot"], index=0)
+page = st.sidebar.radio("Navigate", ["Goals", "History", "Ask Goalbot", "Statistics", "Import / Export"], index=0)
+
+cache_stats = get_cache().stats()
+st.sidebar.caption(
+    f"Response cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses · "
+    f"~{cache_stats['saved_seconds']}s of generation saved"
+)
 
 st.title("🎯 Goalbot")
 st.caption("Log daily progress for each goal, review history, and ask Goalbot using your saved updates (JSON).")
@@ -239,122 +415,108 @@ if page == "Goals":
         st.caption(f"Using date: {entry_date}")
     except Exception as e:
         st.error(f"Date format error: {e}")
+        finish_profile()
         st.stop()
 
     st.write("Write a quick update under each goal. Click **Save** and Goalbot will respond.")
 
+    def on_set_status(goal_id: str) -> None:
+        set_goal_status(goal_id, st.session_state[f"status_{goal_id}"])
+
+    def on_rename(goal_id: str) -> None:
+        if not rename_goal(goal_id, st.session_state[f"rename_{goal_id}"]):
+            st.session_state[f"rename_failed_{goal_id}"] = True
+
+    @st.fragment
+    def goal_card(gid: str, entry_date: str) -> None:
+        """
+        One goal's card. Its widgets rerun only this card; status, rename and
+        delete apply in on_click callbacks, so that one card run already shows
+        the change (card order and columns catch up on the next full rerun).
+        """
+        g = find_goal(gid)   # re-read: the card may have been renamed or deleted since the full run
+        if g is None:
+            return
+        goal = g["name"]   # widget keys use the id, so they survive a rename
+
+        with st.container(border=True):
+            st.markdown(f"### {goal}")
+            entries = store.registry.entries(gid)
+            if entries:
+                st.caption(f"{entries} entr{'y' if entries == 1 else 'ies'} · last {store.registry.last_entry(gid)}")
+
+            # status selector + rename + delete
+            cur_status = g.get("status", "active")
+
+            c1, c2, c3, c4 = st.columns([2, 2, 1, 1])
+            with c1:
+                st.selectbox(
+                    "Status",
+                    ["active", "inactive"],
+                    index=0 if cur_status == "active" else 1,
+                    key=f"status_{gid}",
+                    label_visibility="collapsed",
+                )
+            with c2:
+                st.button("Update status", key=f"set_{gid}", on_click=on_set_status, args=(gid,))
+            with c3:
+                with st.popover("✏️"):
+                    st.text_input("New name", value=goal, key=f"rename_{gid}")
+                    st.button("Rename", key=f"rename_btn_{gid}", on_click=on_rename, args=(gid,))
+                    if st.session_state.pop(f"rename_failed_{gid}", False):
+                        st.warning("Enter a new goal name (or it may already exist).")
+            with c4:
+                st.button("🗑️", key=f"del_{gid}", on_click=remove_goal, args=(gid,))
+
+            txt = st.text_area(
+                "Daily update",
+                placeholder="What did you do today? What helped or got in the way?",
+                height=120,
+                key=f"update_{gid}",
+                label_visibility="collapsed",
+            )
+
+            if st.button("Save", type="primary", key=f"save_{gid}"):
+                ok = save_update(gid, entry_date, txt)
+                if ok:
+                    st.success("Saved ✅ — Goalbot is replying in the background.")
+
+                    recent_ctx = recent_for_goal(gid, n=6)  # keep last 6 max
+
+                    recent_ctx, ctx_stats = pack_updates(recent_ctx, DAILY_CONTEXT_BUDGET)
+                    prompt = daily_feedback_prompt(goal, entry_date, recent_ctx, txt)
+
+                    # generate + save AI daily feedback in the background (same context we give the model)
+                    ctx = recent_ctx if recent_ctx else [{"date": entry_date, "text": txt}]
+                    queue_job(
+                        "daily_feedback",
+                        gid,
+                        partial(generate_job, prompt=prompt, event_type="daily_feedback", goal_id=gid,
+                                user_text=txt, context_updates=ctx, prompt_stats=ctx_stats),
+                        ctx,
+                    )
+                else:
+                    st.warning("Please write an update first.")
+
+            show_job("daily_feedback", gid, "🤖 Goalbot Response")
+
+            recent = recent_for_goal(gid, n=2)
+            if recent:
+                st.caption("Recent:")
+                for u in recent:
+                    preview = u["text"][:80] + ("..." if len(u["text"]) > 80 else "")
+                    st.write(f"• {u['date']}: {preview}")
+
     # show active first then inactive
-    active_list = active_goals()
-    inactive_list = inactive_goals()
-    goal_list = active_list + inactive_list
+    goal_list = active_goals() + inactive_goals()
 
     if not goal_list:
         st.info("No goals yet. Add one below.")
     else:
         colA, colB = st.columns(2, gap="large")
-        for idx, goal in enumerate(goal_list, start=1):
-            target = colA if idx % 2 == 1 else colB
-
-            with target:
-                with st.container(border=True):
-                    st.markdown(f"### {goal}")
-
-                    # status selector + delete
-                    cur_status = "active"
-                    for g in goals:
-                        if g["name"] == goal:
-                            cur_status = g.get("status", "active")
-                            break
-
-                    c1, c2, c3 = st.columns([2, 2, 1])
-                    with c1:
-                        new_status = st.selectbox(
-                            "Status",
-                            ["active", "inactive"],
-                            index=0 if cur_status == "active" else 1,
-                            key=f"status_{goal}",
-                            label_visibility="collapsed",
-                        )
-                    with c2:
-                        if st.button("Update status", key=f"set_{goal}"):
-                            set_goal_status(goal, new_status)
-                            st.rerun()
-                    with c3:
-                        if st.button("🗑️", key=f"del_{goal}"):
-                            remove_goal(goal)
-                            st.rerun()
-
-                    txt = st.text_area(
-                        "Daily update",
-                        placeholder="What did you do today? What helped or got in the way?",
-                        height=120,
-                        key=f"update_{goal}",
-                        label_visibility="collapsed",
-                    )
-
-                    if st.button("Save", type="primary", key=f"save_{goal}"):
-                        ok = save_update(goal, entry_date, txt)
-                        if ok:
-                            st.success("Saved ✅")
-
-                            recent_ctx = [u for u in updates if u.get("goal") == goal]
-                            recent_ctx.sort(key=lambda x: (x.get("date", ""), x.get("created_at", "")), reverse=True)
-                            recent_ctx = recent_ctx[:6]  # keep last 6 max
-
-                            recent_text = "\n".join([f"- {u.get('date')}: {u.get('text')}" for u in recent_ctx])
-
-                            prompt = f"""
-                            You are Goalbot: upbeat, supportive, and practical.
-
-                            User goal: {goal}
-                            Date: {entry_date}
-
-                            Recent updates (most recent first):
-                            {recent_text if recent_text else "- (no past updates yet)"}
-
-                            Today’s update: {txt}
-
-                            Write ONE short response (2–3 sentences max):
-                            - 1 sentence acknowledging effort (be specific to the update)
-                            - 1 sentence reflecting a helpful insight (mention a pattern if you see one from recent updates)
-                            - 1 tiny next step for tomorrow (very concrete: time OR place OR first action)
-
-                            Rules:
-                            - Keep it motivational, not cheesy.
-                            - No medical advice.
-                            - Avoid generic phrases like "keep going" unless you attach a specific reason from the update.
-                            """.strip()
-
-                            answer = ollama_generate(prompt)
-
-                            # save AI daily feedback + context (store the same context you gave the model)
-                            log_ai_event(
-                                event_type="daily_feedback",
-                                goal=goal,
-                                user_text=txt,
-                                prompt=prompt,
-                                answer=answer,
-                                context_updates=recent_ctx if recent_ctx else [{"date": entry_date, "text": txt}],
-                            )
-
-                            st.markdown(
-                                f"""
-                            <div class="goalbot-card">
-                            <h3>🤖 Goalbot Response</h3>
-                            <div class="goalbot-muted">{answer}</div>
-                            </div>
-                            """,
-                                unsafe_allow_html=True,
-                            )
-                        else:
-                            st.warning("Please write an update first.")
-
-                    recent = recent_for_goal(goal, n=2)
-                    if recent:
-                        st.caption("Recent:")
-                        for u in recent:
-                            preview = u["text"][:80] + ("..." if len(u["text"]) > 80 else "")
-                            st.write(f"• {u['date']}: {preview}")
+        for idx, g in enumerate(goal_list, start=1):
+            with colA if idx % 2 == 1 else colB:
+                goal_card(g["id"], entry_date)
 
     st.divider()
     st.markdown("### Add another goal")
@@ -372,6 +534,7 @@ if page == "Goals":
         if submitted:
             if add_goal(bottom_goal):
                 st.success("Goal added ✅")
+                finish_profile()
                 st.rerun()
             else:
                 st.warning("Enter a new goal name (or it may already exist).")
@@ -384,47 +547,30 @@ elif page == "History":
     st.subheader("History")
     st.write("All saved updates + AI responses (persisted in JSON).")
 
-    if not updates and not ai_events:
-        st.info("No updates saved yet. Go to **Goals** and add one.")
-    else:
-        goal_names = [g["name"] for g in goals]
-        goal_filter = st.selectbox("Filter by goal", ["All"] + goal_names + ["ALL_GOALS"])
-        query = st.text_input("Search", placeholder="Search updates + AI responses...")
-
-        feed = []
-
-        for u in updates:
-            feed.append({
-                "type": "update",
-                "goal": u.get("goal"),
-                "date": u.get("date", ""),
-                "text": u.get("text", ""),
-                "created_at": u.get("created_at", ""),
-            })
-
-        for a in ai_events:
-            feed.append({
-                "type": "ai",
-                "goal": a.get("goal"),
-                "event_type": a.get("event_type", "ai"),
-                "user_text": a.get("user_text", ""),
-                "text": a.get("answer", ""),
-                "context": a.get("context", []),
-                "created_at": a.get("created_at", ""),
-            })
-
-        feed.sort(key=lambda x: x.get("created_at", ""), reverse=True)
-
-        if goal_filter != "All":
-            feed = [item for item in feed if item.get("goal") == goal_filter]
-
-        if query.strip():
-            q = query.strip().lower()
-            def blob(item):
-                return (item.get("text","") + " " + item.get("user_text","") + " " + item.get("event_type","")).lower()
-            feed = [item for item in feed if q in blob(item)]
-
-        st.caption(f"Showing **{len(feed)}** item(s).")
+    @st.fragment
+    def history_feed() -> None:
+        """Filters, search, the feed and paging; any of them reruns only this block."""
+        live = store.goals
+        names = goal_names(live)
+        goal_filter = st.selectbox("Filter by goal", [None] + [g["id"] for g in live] + [ALL_GOALS],
+                                   format_func=lambda gid: "All" if gid is None else names.get(gid, gid))
+        query = st.text_input("Search", placeholder="Search updates + AI responses...").strip()
+
+        order = "Newest"
+        if query:
+            order = st.radio("Order", ["Best match", "Newest"], horizontal=True)
+
+        # cursor stack: one entry per page visited (list positions); reset whenever the
+        # view changes or a reload may have moved the records they point at
+        view = (goal_filter, query, order, store.reloads)
+        if st.session_state.get("history_view") != view:
+            st.session_state.history_view = view
+            st.session_state.history_cursors = [None]
+        cursors = st.session_state.history_cursors
+
+        feed, next_cursor = history_view(cursors[-1], goal_filter, query, order, store.revision())
+
+        st.caption(f"Page {len(cursors)} · showing **{len(feed)}** item(s).")
 
         for item in feed:
             with st.container(border=True):
@@ -447,6 +593,20 @@ elif page == "History":
                             for c in ctx:
                                 st.write(f"• {c.get('date')}: {c.get('text')}")
 
+        # paging happens in the callbacks, before the rerun that draws the new page
+        nav_newer, nav_older = st.columns(2)
+        with nav_newer:
+            st.button("← Newer", disabled=len(cursors) == 1, key="history_newer", on_click=cursors.pop)
+        with nav_older:
+            st.button("Older →", disabled=next_cursor is None, key="history_older", on_click=cursors.append,
+                      args=(next_cursor,))
+
+    data = store.data   # full history: loads here if the background prefetch hasn't finished
+    if not data["updates"] and not data["ai_events"]:
+        st.info("No updates saved yet. Go to **Goals** and add one.")
+    else:
+        history_feed()
+
 
 # ============================================================
 # PAGE 3: ASK GOALBOT
@@ -458,104 +618,184 @@ elif page == "Ask Goalbot":
     goal_options = active_goals() + inactive_goals()
     if not goal_options:
         st.info("Add a goal first on the **Goals** page.")
+        finish_profile()
         st.stop()
 
-    goal = st.selectbox("Choose a goal", goal_options)
+    @st.fragment
+    def ask_panel() -> None:
+        """Goal, question, Ask and the streamed answer; rerun on their own."""
+        goal = st.selectbox("Choose a goal", active_goals() + inactive_goals(), format_func=lambda g: g["name"])
 
-    question = st.text_input(
-        "Your question",
-        placeholder="e.g., Why am I stuck? What should I do tomorrow? How can I be consistent?",
-    )
+        question = st.text_input(
+            "Your question",
+            placeholder="e.g., Why am I stuck? What should I do tomorrow? How can I be consistent?",
+        )
 
-    st.divider()
-    st.markdown("### 📊 Progress summary (all goals)")
+        col1, col2, col3 = st.columns([1, 1, 2])
+        with col1:
+            ask = st.button("Ask", type="primary")
+        with col2:
+            regen_ask = st.button("🔄 Regenerate", key="ask_regen")
+        with col3:
+            show_context = st.checkbox("Show context used", value=True)
+
+        if ask or regen_ask:
+            if not question.strip():
+                st.warning("Type a question first.")
+            else:
+                queue_job("ask_answer", goal["id"],
+                          partial(ask_job, goal=goal, question=question, regenerate=regen_ask))
+
+        answer_job = show_job("ask_answer", None, "🤖 Goalbot Response")
+        if answer_job and show_context and not answer_job.pending:
+            st.divider()
+            st.caption("Context used:")
+            if not answer_job.context:
+                st.write("No saved updates yet for this goal.")
+            else:
+                for u in answer_job.context:
+                    st.write(f"• {u['date']}: {u['text']}")
 
-    make_summary = st.button("Generate progress summary", type="primary", key="progress_summary_btn")
+    @st.fragment
+    def summary_panel() -> None:
+        """The all-goal progress report and its buttons."""
+        st.markdown("### 📊 Progress summary (all goals)")
 
-    if make_summary:
-        # newest 30 updates max
-        sorted_updates = updates[:]
-        sorted_updates.sort(key=lambda x: x.get("created_at", ""), reverse=True)
-        recent_all = sorted_updates[:30]
+        s1, s2 = st.columns([2, 1])
+        with s1:
+            make_summary = st.button("Generate progress summary", type="primary", key="progress_summary_btn")
+        with s2:
+            regen_summary = st.button("🔄 Regenerate", key="progress_summary_regen")
 
-        history_text = "\n".join([f"- [{u['goal']}] {u['date']}: {u['text']}" for u in recent_all])
+        if make_summary or regen_summary:
+            queue_job("progress_summary", ALL_GOALS,
+                      partial(summary_job, goal_list=list(store.goals), regenerate=regen_summary))
 
-        prompt = f"""
-You are Goalbot, a private and encouraging journaling companion.
+        show_job("progress_summary", ALL_GOALS, "📊 Progress Summary")
 
-Here are the user's recent updates across ALL goals:
-{history_text}
+    ask_panel()
+    st.divider()
+    summary_panel()
 
-Write a short progress report with:
-1) Overall check-in (2–4 sentences)
-2) Wins you notice (bulleted, max 4)
-3) Patterns / blockers (bulleted, max 4)
-4) One tiny next step for the next day (1 sentence)
 
-Keep it kind, practical, and non-judgmental. No medical advice.
-""".strip()
+# ============================================================
+# PAGE 4: STATISTICS
+# ============================================================
+elif page == "Statistics":
+    st.subheader("Statistics")
+    st.write("Streaks, gaps and activity per goal, computed from your saved updates.")
 
-        answer = ollama_generate(prompt)
+    if not goals:
+        st.info("No goals yet. Add one on the **Goals** page.")
+    else:
+        names = goal_names(goals)
+        stats_goal = st.selectbox("Goal", [None] + [g["id"] for g in goals],
+                                  format_func=lambda gid: "All goals" if gid is None else names[gid])
+        from analytics import DEFAULT_WEEKS   # numpy: imported on first use
+        weeks = st.select_slider("Weeks shown", [12, 26, 52, 104], value=DEFAULT_WEEKS)
+        goal_ids = (stats_goal,) if stats_goal else tuple(g["id"] for g in goals)
+        view = stats_view(goal_ids, weeks, store.revision(), date.today())
+
+        st.dataframe(view["rows"], hide_index=True)
+
+        st.markdown("**Entries per week**")
+        per_week = view["weekly"]
+        st.bar_chart({"week": [w for w, _ in per_week], "entries": [n for _, n in per_week]}, x="week", y="entries")
+
+        st.markdown("**Daily activity**")
+        st.vega_lite_chart({
+            "data": {"values": view["heatmap"]},
+            "mark": "rect",
+            "encoding": {
+                "x": {"field": "week", "type": "ordinal", "axis": {"labels": False, "title": None}},
+                "y": {"field": "weekday", "type": "ordinal", "title": None,
+                      "axis": {"labelExpr": "['Mon','Tue','Wed','Thu','Fri','Sat','Sun'][datum.value]"}},
+                "color": {"field": "entries", "type": "quantitative", "scale": {"scheme": "greens"}},
+                "tooltip": [{"field": "date"}, {"field": "entries"}],
+            },
+        }, width="stretch")
+
+        st.markdown("**Goalbot responses per week**")
+        timeline = view["timeline"]
+        st.line_chart({"week": [w for w, _ in timeline], "responses": [n for _, n in timeline]},
+                      x="week", y="responses")
 
-        st.markdown(
-            f"""
-<div class="goalbot-card">
-  <h3>📊 Progress Summary</h3>
-  <div class="goalbot-muted">{answer}</div>
-</div>
-""",
-            unsafe_allow_html=True,
-        )
 
-        log_ai_event(
-            event_type="progress_summary",
-            goal="ALL_GOALS",
-            user_text="",
-            prompt=prompt,
-            answer=answer,
-            context_updates=recent_all,
-        )
+# ============================================================
+# PAGE 5: IMPORT / EXPORT
+# ============================================================
+elif page == "Import / Export":
+    st.subheader("Import")
+    st.caption("JSONL (one record per line) or a JSON array of the same records, CSV (goal, date, "
+               "text columns) or dated Markdown (`# Goal` headings, then `## YYYY-MM-DD` headings "
+               "followed by the entry). "
+               "Missing goals are created; entries are saved in batches.")
+    upload = st.file_uploader("Journal archive", type=["jsonl", "ndjson", "json", "csv", "md", "markdown", "txt"])
+    import_goal = st.selectbox("Goal for entries that don't name one", ["(none)"] + [g["name"] for g in goals])
+
+    if upload is not None and st.button("Import", type="primary"):
+        try:
+            fmt = detect_format(upload.name)
+            with io.TextIOWrapper(upload, encoding="utf-8", newline="") as f:
+                report = import_entries(store, read_entries(f, fmt),
+                                        None if import_goal == "(none)" else import_goal)
+        except (ValueError, UnicodeDecodeError) as e:
+            st.error(f"Import failed: {e}")
+        else:
+            st.success(f"Imported {report['updates']} update(s) and {report['ai_events']} AI event(s) "
+                       f"in {report['batches']} batch(es); {report['goals_created']} goal(s) created.")
+            if report["skipped"]:
+                st.warning(f"Skipped {report['skipped']} invalid entries:\n\n" + "\n".join(
+                    f"- {msg}" for msg in report["errors"]))
 
     st.divider()
+    st.subheader("Export")
+    export_fmt = st.radio("Format", FORMATS, horizontal=True,
+                          format_func={"jsonl": "JSONL (everything)", "csv": "CSV (updates)",
+                                       "md": "Markdown (updates)"}.get)
 
-    col1, col2 = st.columns([1, 2])
-    with col1:
-        ask = st.button("Ask", type="primary")
-    with col2:
-        show_context = st.checkbox("Show context used", value=True)
+    def export_archive(fmt: str = export_fmt) -> str:
+        """Built when Download is clicked (on Streamlit's thread), not kept in session state."""
+        buf = io.StringIO()
+        export(store.data, fmt, buf)
+        return buf.getvalue()
 
-    if ask:
-        if not question.strip():
-            st.warning("Type a question first.")
-        else:
-            context = choose_context(updates, goal, question, n=6)
-            prompt = build_prompt(goal, question, context)
-            answer = ollama_generate(prompt)
-
-            log_ai_event(
-                event_type="ask_answer",
-                goal=goal,
-                user_text=question,
-                prompt=prompt,
-                answer=answer,
-                context_updates=context,
-            )
+    st.download_button("⬇️ Download", export_archive, file_name=f"goalbot-{date.today()}.{export_fmt}",
+                       mime="text/markdown" if export_fmt == "md" else "text/plain", on_click="ignore")
 
-            st.markdown(
-                f"""
-<div class="goalbot-card">
-  <h3>🤖 Goalbot Response</h3>
-  <div class="goalbot-muted">{answer}</div>
-</div>
-""",
-                unsafe_allow_html=True,
-            )
 
-            if show_context:
-                st.divider()
-                st.caption("Context used:")
-                if not context:
-                    st.write("No saved updates yet for this goal.")
-                else:
-                    for u in context:
-                        st.write(f"• {u['date']}: {u['text']}")
+# ============================================================
+# SIDEBAR: PERFORMANCE
+# ============================================================
+rerun_ms = (time.perf_counter() - _rerun_start) * 1000
+tracer.record("rerun", rerun_ms, page=page)
+if "first_render_ms" not in st.session_state:
+    # time-to-first-render for this session; should stay flat as history grows
+    st.session_state.first_render_ms = round(rerun_ms, 1)
+    tracer.record("first_render", rerun_ms, page=page, loaded=store.loaded)
+finish_profile()
+
+with st.sidebar.expander("⏱ Performance"):
+    st.caption(f"First render this session: {st.session_state.first_render_ms} ms")
+    llm_stats = llm_client.stats()
+    st.caption(f"Ollama: {llm_stats['inflight']} in flight · {llm_stats['waiting']} waiting · "
+               f"{llm_stats['requests']} sent · {llm_stats['coalesced']} coalesced · {llm_stats['busy']} busy")
+    perf_rows = tracer.summary()
+    if perf_rows:
+        st.dataframe(perf_rows, hide_index=True)
+    else:
+        st.caption("No spans recorded yet.")
+    st.checkbox("Profile each rerun (cProfile)", key="profile_rerun")
+    if st.session_state.get("last_profile"):
+        st.caption("Last profiled rerun (top functions by cumulative time):")
+        st.code(st.session_state.last_profile, language="text")
+    perf_export, perf_reset = st.columns(2)
+    with perf_export:
+        if st.button("Export JSONL", key="perf_export"):
+            st.caption(f"Wrote {tracer.export_jsonl(METRICS_FILE)} span(s) to {METRICS_FILE.name}")
+    with perf_reset:
+        if st.button("Reset", key="perf_reset"):
+            tracer.reset()
+
+# older history loads in the background once the page is on screen
+store.prefetch()
@@ -0,0 +1,126 @@
+# prompts.py
+from __future__ import annotations
+
+import math
+import re
+
+# Token budgets for the journal context packed into each prompt
+ASK_CONTEXT_BUDGET = 600
+DAILY_CONTEXT_BUDGET = 400
+SUMMARY_RECENT_BUDGET = 500
+SUMMARY_FOLD_BUDGET = 1500   # new entries folded into a rolling summary per call
+MIN_TRUNCATED_TOKENS = 24   # don't bother keeping a stub shorter than this
+
+_WORD = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+
+def heuristic_tokens(text: str) -> int:
+    """
+    Fast estimate for Llama-style BPE: roughly 4 chars per token, but never
+    fewer than the count of words + punctuation marks.
+    """
+    text = text or ""
+    return max(math.ceil(len(text) / 4), len(_WORD.findall(text)))
+
+
+_tokenizer = heuristic_tokens
+
+
+def set_tokenizer(fn) -> None:
+    """Plug in an exact tokenizer: fn(text) -> token count (None restores the heuristic)."""
+    global _tokenizer
+    _tokenizer = fn or heuristic_tokens
+
+
+def estimate_tokens(text: str) -> int:
+    return _tokenizer(text)
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    est = estimate_tokens(text)
+    if est <= max_tokens:
+        return text
+    cut = text[:max(1, int(len(text) * max_tokens / est))]
+    cut = cut.rsplit(" ", 1)[0] if " " in cut else cut
+    return cut.rstrip(" ,.;:") + " …"
+
+
+def pack_updates(updates: list, budget: int, line=lambda u: f"- {u.get('date')}: {u.get('text')}"):
+    """
+    Greedily fill `budget` tokens with updates given in priority order.
+    An entry that no longer fits is truncated if a useful stub still fits,
+    otherwise it is dropped. Returns (packed_updates, stats); truncated
+    entries are copies with shortened text.
+    """
+    packed = []
+    used = 0
+    truncated = 0
+    for u in updates:
+        cost = estimate_tokens(line(u)) + 1   # + newline
+        if used + cost <= budget:
+            packed.append(u)
+            used += cost
+            continue
+        room = budget - used - (cost - estimate_tokens(u.get("text", "")))
+        if room >= MIN_TRUNCATED_TOKENS:
+            short = dict(u, text=_truncate(u.get("text", ""), room))
+            packed.append(short)
+            used += estimate_tokens(line(short)) + 1
+            truncated += 1
+        break
+    stats = {
+        "context_tokens": used,
+        "context_budget": budget,
+        "context_items": len(packed),
+        "context_truncated": truncated,
+        "context_dropped": len(updates) - len(packed),
+    }
+    return packed, stats
+
+
+def build_prompt(goal: str, question: str, context_updates):
+    context_text = "\n".join([f"- {u['date']}: {u['text']}" for u in context_updates])
+    return f"""
+You are Goalbot, a private, empathetic journaling companion.
+You help the user reflect without judgment and suggest small actionable steps.
+Do NOT provide medical advice. If the user mentions self-harm, encourage them to seek immediate professional help.
+
+GOAL:
+{goal}
+
+RECENT JOURNAL UPDATES:
+{context_text}
+
+USER QUESTION:
+{question}
+
+Respond with:
+1) A warm reflection (2-4 sentences)
+2) 2 reflection questions (bulleted)
+3) 1 small next step for tomorrow (specific and low effort)
+""".strip()
+
+
+def daily_feedback_prompt(goal: str, entry_date: str, recent_ctx, txt: str) -> str:
+    recent_text = "\n".join([f"- {u.get('date')}: {u.get('text')}" for u in recent_ctx])
+    return f"""
+You are Goalbot: upbeat, supportive, and practical.
+
+User goal: {goal}
+Date: {entry_date}
+
+Recent updates (most recent first):
+{recent_text if recent_text else "- (no past updates yet)"}
+
+Today’s update: {txt}
+
+Write ONE short response (2–3 sentences max):
+- 1 sentence acknowledging effort (be specific to the update)
+- 1 sentence reflecting a helpful insight (mention a pattern if you see one from recent updates)
+- 1 tiny next step for tomorrow (very concrete: time OR place OR first action)
+
+Rules:
+- Keep it motivational, not cheesy.
+- No medical advice.
+- Avoid generic phrases like "keep going" unless you attach a specific reason from the update.
+""".strip()
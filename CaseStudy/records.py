@@ -0,0 +1,441 @@
+# records.py
+"""
+Typed in-memory records for the journal.
+
+Goals, updates and ai_events load as slotted objects instead of dicts:
+
+- dates are int day ordinals and created_at is int seconds (wall clock, no
+  timezone, like now_ts()), so sorting compares ints, not ISO strings;
+- goal ids, names, statuses and event types are interned (one string
+  object per distinct value);
+- keys that have no slot of their own (metrics, checkpoint, legacy fields,
+  dates that are not canonical ISO strings) go to a small `extra` dict.
+
+Records keep the read/write surface of the dicts they replace (r["date"],
+r.get("text"), "deleted" in g, dict(r), ...), so the rest of the app reads
+them unchanged; r["date"] / r["created_at"] give back the ISO strings.
+
+dumps() / loads() are the on-disk codec: orjson when it is installed
+(GOALBOT_JSON=json forces the standard library), records serialized via
+to_dict(), compact output unless GOALBOT_JSON_COMPACT=0 asks for indentation.
+"""
+from __future__ import annotations
+
+import json
+import os
+import sys
+from collections.abc import MutableMapping
+from datetime import date, datetime
+
+try:
+    import orjson
+except ImportError:  # optional: the standard library does the same, slower
+    orjson = None
+
+JSON_LIB = "orjson" if orjson is not None and os.environ.get("GOALBOT_JSON", "orjson") == "orjson" else "json"
+JSON_COMPACT = os.environ.get("GOALBOT_JSON_COMPACT", "1") != "0"
+
+_EPOCH = date(1970, 1, 1).toordinal()
+_EPOCH_DT = datetime(1970, 1, 1)
+_NONE = -1   # day / seconds slot value when the field is missing or not canonical
+
+
+# =========================
+# Dates and timestamps
+# =========================
+_day_of_str: dict[str, int] = {}   # grows by distinct days only (a few thousand)
+_str_of_day: dict[int, str] = {}
+
+
+def to_day(s) -> int:
+    """'YYYY-MM-DD' -> day ordinal, or -1 if s is not a canonical ISO date."""
+    d = _day_of_str.get(s)
+    if d is not None:
+        return d
+    if type(s) is not str or len(s) != 10:
+        return _NONE
+    try:
+        d = date.fromisoformat(s).toordinal()
+    except ValueError:
+        return _NONE
+    if date.fromordinal(d).isoformat() != s:   # e.g. ISO week dates parse too
+        return _NONE
+    _day_of_str[s] = d
+    _str_of_day[d] = s
+    return d
+
+
+def day_str(d: int) -> str:
+    s = _str_of_day.get(d)
+    if s is None:
+        s = date.fromordinal(d).isoformat()
+        _day_of_str[s] = d
+        _str_of_day[d] = s
+    return s
+
+
+def to_seconds(s) -> int:
+    """'YYYY-MM-DDTHH:MM:SS' -> seconds since 1970-01-01T00:00:00, or -1 if not canonical."""
+    if type(s) is not str or len(s) != 19 or s[10] != "T" or s[7] != "-" or s[16] != ":":
+        return _NONE
+    try:
+        td = datetime.fromisoformat(s) - _EPOCH_DT
+    except (TypeError, ValueError):   # TypeError: a "+01" offset parsed as an aware datetime
+        return _NONE
+    return td.days * 86400 + td.seconds
+
+
+def seconds_str(t: int) -> str:
+    d, rest = divmod(t, 86400)
+    h, rest = divmod(rest, 3600)
+    m, s = divmod(rest, 60)
+    return f"{day_str(d + _EPOCH)}T{h:02d}:{m:02d}:{s:02d}"
+
+
+def created_seconds(r) -> int:
+    """created_at of a record or plain dict as int seconds (-1 if missing)."""
+    try:
+        return r.created
+    except AttributeError:
+        return to_seconds(r.get("created_at"))
+
+
+def created_day(r) -> int:
+    """Day ordinal of created_at (-1 if it has no date)."""
+    t = created_seconds(r)
+    return t // 86400 + _EPOCH if t >= 0 else to_day((r.get("created_at") or "")[:10])
+
+
+# =========================
+# Records
+# =========================
+# field kinds: how a JSON value is stored in its slot and read back
+_STR, _INTERN, _ANY, _DAY, _TS = range(5)
+_MISSING = object()   # slot value of an absent key (-1 for _DAY / _TS slots)
+
+
+class Record(MutableMapping):
+    """
+    Base for the slotted records. Subclasses list FIELDS as (json key, slot,
+    kind); every other key lives in `extra`, and so does a date that is not
+    canonical (its slot stays -1). Every slot is always set, so reads never
+    raise AttributeError.
+    """
+    __slots__ = ("extra",)
+    FIELDS: tuple = ()
+    _BY_KEY: dict = {}
+    _KEYS: frozenset = frozenset()
+
+    def __init_subclass__(cls, **kw):
+        super().__init_subclass__(**kw)
+        cls._BY_KEY = {key: (slot, kind) for key, slot, kind in cls.FIELDS}
+        cls._KEYS = frozenset(cls._BY_KEY)
+
+    def __init__(self, src=()):
+        self._blank()
+        for key, value in (src.items() if hasattr(src, "items") else src):
+            self[key] = value
+
+    def _blank(self) -> None:
+        self.extra = None
+        for _, slot, kind in self.FIELDS:
+            setattr(self, slot, _NONE if kind >= _DAY else _MISSING)
+
+    @classmethod
+    def of(cls, rec):
+        """`rec` as this record type (records of the type pass through)."""
+        if type(rec) is cls:
+            return rec
+        self = cls.__new__(cls)
+        self._blank()
+        for key, value in rec.items():
+            self[key] = value
+        return self
+
+    # ---- mapping surface (get and __getitem__ are the hot paths, hence the duplication) ----
+    def get(self, key, default=None):
+        spec = self._BY_KEY.get(key)
+        if spec is not None:
+            slot, kind = spec
+            v = getattr(self, slot)
+            if kind < _DAY:
+                return default if v is _MISSING else v
+            if v >= 0:
+                return day_str(v) if kind == _DAY else seconds_str(v)
+        extra = self.extra
+        return default if extra is None else extra.get(key, default)
+
+    def __getitem__(self, key):
+        spec = self._BY_KEY.get(key)
+        if spec is not None:
+            slot, kind = spec
+            v = getattr(self, slot)
+            if kind < _DAY:
+                if v is not _MISSING:
+                    return v
+                raise KeyError(key)
+            if v >= 0:
+                return day_str(v) if kind == _DAY else seconds_str(v)
+        extra = self.extra
+        if extra is not None and key in extra:
+            return extra[key]
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        if key not in self._BY_KEY:
+            extra = self.extra
+            return extra is not None and key in extra
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __setitem__(self, key, value):
+        spec = self._BY_KEY.get(key)
+        if spec is not None:
+            slot, kind = spec
+            if kind < _DAY:
+                setattr(self, slot, sys.intern(value) if kind == _INTERN and type(value) is str else value)
+                return
+            v = to_day(value) if kind == _DAY else to_seconds(value)
+            setattr(self, slot, v)
+            if v >= 0:
+                if self.extra is not None:
+                    self.extra.pop(key, None)
+                return
+        if self.extra is None:
+            self.extra = {}
+        self.extra[key] = value
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        if self.extra is not None and key in self.extra:
+            del self.extra[key]
+        spec = self._BY_KEY.get(key)
+        if spec is not None:
+            setattr(self, spec[0], _NONE if spec[1] >= _DAY else _MISSING)
+
+    def __iter__(self):
+        for key, slot, kind in self.FIELDS:
+            v = getattr(self, slot)
+            if (v >= 0) if kind >= _DAY else (v is not _MISSING):
+                yield key
+        if self.extra:
+            yield from self.extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __eq__(self, other):
+        if isinstance(other, (Record, dict)):
+            return self.to_dict() == dict(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+    def to_dict(self) -> dict:
+        return {key: self[key] for key in self}
+
+    # ---- compact table rows ----
+    def to_row(self) -> list | None:
+        """
+        Values in FIELDS order for a compact table (dates as epoch days /
+        seconds, null for an absent field), or None when the record needs its
+        keys: extra keys, or a None value that null would turn into "absent".
+        """
+        if self.extra is not None:
+            return None
+        row = []
+        for _, slot, kind in self.FIELDS:
+            v = getattr(self, slot)
+            if kind >= _DAY:
+                row.append(None if v < 0 else v - _EPOCH if kind == _DAY else v)
+            elif v is None:
+                return None
+            else:
+                row.append(None if v is _MISSING else v)
+        return row
+
+    @classmethod
+    def from_row(cls, row: list):
+        self = cls.__new__(cls)
+        self.extra = None
+        for (_, slot, kind), v in zip(cls.FIELDS, row):
+            if kind >= _DAY:
+                v = _NONE if v is None else v + _EPOCH if kind == _DAY else v
+            elif v is None:
+                v = _MISSING
+            elif kind == _INTERN and type(v) is str:
+                v = sys.intern(v)
+            setattr(self, slot, v)
+        return self
+
+    def copy(self) -> dict:
+        return self.to_dict()
+
+
+class Goal(Record):
+    __slots__ = ("id", "name", "status")
+    FIELDS = (("id", "id", _INTERN), ("name", "name", _INTERN), ("status", "status", _INTERN))
+
+
+class Update(Record):
+    __slots__ = ("goal_id", "day", "text", "created")
+    FIELDS = (("goal_id", "goal_id", _INTERN), ("date", "day", _DAY), ("text", "text", _STR),
+              ("created_at", "created", _TS))
+
+    @classmethod
+    def of(cls, rec):
+        if type(rec) is not cls and len(rec) == 4:
+            # the usual shape, without the generic per-key loop
+            try:
+                goal_id, day, text, created = rec["goal_id"], rec["date"], rec["text"], rec["created_at"]
+            except KeyError:
+                return super().of(rec)
+            day, created = to_day(day), to_seconds(created)
+            if day >= 0 and created >= 0 and type(goal_id) is str:
+                self = cls.__new__(cls)
+                self.extra = None
+                self.goal_id, self.day, self.text, self.created = sys.intern(goal_id), day, text, created
+                return self
+        return super().of(rec)
+
+    def to_row(self) -> list | None:
+        goal_id, day, text, created = self.goal_id, self.day, self.text, self.created
+        if self.extra is None and type(goal_id) is str and type(text) is str and day >= 0 and created >= 0:
+            return [goal_id, day - _EPOCH, text, created]
+        return super().to_row()
+
+    @classmethod
+    def from_row(cls, row: list):
+        goal_id, day, text, created = row
+        if type(goal_id) is str and type(text) is str and day is not None and created is not None:
+            self = cls.__new__(cls)
+            self.extra = None
+            self.goal_id, self.day, self.text, self.created = sys.intern(goal_id), day + _EPOCH, text, created
+            return self
+        return super().from_row(row)
+
+
+class AIEvent(Record):
+    __slots__ = ("event_type", "goal_id", "user_text", "answer", "prompt_ref", "context_ref", "metrics",
+                 "created")
+    FIELDS = (("event_type", "event_type", _INTERN), ("goal_id", "goal_id", _INTERN),
+              ("user_text", "user_text", _STR), ("answer", "answer", _STR), ("prompt_ref", "prompt_ref", _ANY),
+              ("context_ref", "context_ref", _ANY), ("metrics", "metrics", _ANY), ("created_at", "created", _TS))
+
+    @classmethod
+    def of(cls, rec):
+        if type(rec) is not cls and rec.keys() <= cls._KEYS:
+            # no extra keys (packed events): fill the slots directly
+            get = rec.get
+            created = get("created_at", _MISSING)
+            t = _NONE if created is _MISSING else to_seconds(created)
+            if t >= 0 or created is _MISSING:
+                self = cls.__new__(cls)
+                self.extra = None
+                event_type, goal_id = get("event_type", _MISSING), get("goal_id", _MISSING)
+                self.event_type = sys.intern(event_type) if type(event_type) is str else event_type
+                self.goal_id = sys.intern(goal_id) if type(goal_id) is str else goal_id
+                self.user_text, self.answer = get("user_text", _MISSING), get("answer", _MISSING)
+                self.prompt_ref, self.context_ref = get("prompt_ref", _MISSING), get("context_ref", _MISSING)
+                self.metrics, self.created = get("metrics", _MISSING), t
+                return self
+        return super().of(rec)
+
+    @classmethod
+    def from_row(cls, row: list):
+        event_type, goal_id, user_text, answer, prompt_ref, context_ref, metrics, created = row
+        self = cls.__new__(cls)
+        self.extra = None
+        self.event_type = sys.intern(event_type) if type(event_type) is str else _MISSING
+        self.goal_id = sys.intern(goal_id) if type(goal_id) is str else _MISSING
+        self.user_text = _MISSING if user_text is None else user_text
+        self.answer = _MISSING if answer is None else answer
+        self.prompt_ref = _MISSING if prompt_ref is None else prompt_ref
+        self.context_ref = _MISSING if context_ref is None else context_ref
+        self.metrics = _MISSING if metrics is None else metrics
+        self.created = _NONE if created is None else created
+        return self
+
+
+_KINDS = {"goals": Goal, "updates": Update, "ai_events": AIEvent}
+_OP_KINDS = {"add_goal": Goal, "add_update": Update, "add_ai_event": AIEvent}
+
+
+def typed_op(op: str, rec):
+    """The record an op appends, typed (other ops carry only a key and pass through)."""
+    cls = _OP_KINDS.get(op)
+    return cls.of(rec) if cls is not None else rec
+
+
+def typed_doc(doc: dict) -> dict:
+    """
+    Swap the goals / updates / ai_events of `doc` for typed records, in place.
+    Takes lists of dicts (indented snapshots, logs, SQLite rows) or compact tables.
+    """
+    for key, cls in _KINDS.items():
+        items = doc.get(key)
+        if type(items) is dict:   # compact table, see dump_doc
+            from_row, of = cls.from_row, cls.of
+            doc[key] = [from_row(r) if type(r) is list else of(r) for r in items["rows"]]
+        elif items and not all(type(r) is cls for r in items):
+            items[:] = map(cls.of, items)
+    return doc
+
+
+# =========================
+# JSON codec
+# =========================
+def _plain(obj):
+    if isinstance(obj, Record):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps_bytes(obj, indent: bool = False) -> bytes:
+    """UTF-8 JSON; compact unless indent=True."""
+    if JSON_LIB == "orjson":
+        return orjson.dumps(obj, default=_plain, option=orjson.OPT_INDENT_2 if indent else 0)
+    if indent:
+        return json.dumps(obj, default=_plain, ensure_ascii=False, indent=2).encode("utf-8")
+    return json.dumps(obj, default=_plain, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def dumps(obj, indent: bool = False) -> str:
+    return dumps_bytes(obj, indent).decode("utf-8")
+
+
+def loads(raw):
+    """Parse str or bytes; errors are json.JSONDecodeError (orjson's subclasses it)."""
+    return orjson.loads(raw) if JSON_LIB == "orjson" else json.loads(raw)
+
+
+def _table(cls, items: list) -> dict:
+    of = cls.of
+    rows = []
+    for r in items:
+        r = of(r)
+        row = r.to_row()
+        rows.append(row if row is not None else r)
+    return {"fields": [key for key, _, _ in cls.FIELDS], "rows": rows}
+
+
+def dump_doc(doc: dict, compact: bool | None = None) -> bytes:
+    """
+    A whole document (snapshot or shard). Compact (the default, see
+    JSON_COMPACT): no whitespace, and each record list written as a table,
+    {"fields": [...], "rows": [[...], ...]}, so key names are stored once and
+    dates as ints. Otherwise indented, one JSON object per record.
+    """
+    if not (JSON_COMPACT if compact is None else compact):
+        return dumps_bytes(doc, indent=True)
+    out = {key: _table(_KINDS[key], value) if key in _KINDS and key != "goals" else value
+           for key, value in doc.items()}
+    return dumps_bytes(out)
+
+
+def load_doc(raw) -> dict:
+    """Parse a document written by dump_doc (either mode) into typed records."""
+    return typed_doc(loads(raw))
@@ -0,0 +1,254 @@
+# retrieval.py
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import requests
+
+from indexes import update_key as order_key
+from llm import OLLAMA_HOST
+from prompts import ASK_CONTEXT_BUDGET, pack_updates
+from storage import DATA_DIR, recent_updates
+from tracing import traced, tracer
+
+OLLAMA_EMBED_URL = f"{OLLAMA_HOST}/api/embed"
+EMBED_MODEL = os.environ.get("GOALBOT_EMBED_MODEL", "nomic-embed-text")
+EMBEDDER = os.environ.get("GOALBOT_EMBEDDER", "ollama")   # "ollama" | "hash"
+
+VECTORS_FILE = DATA_DIR / "embeddings.f32"
+KEYS_FILE = DATA_DIR / "embeddings.keys.jsonl"
+META_FILE = DATA_DIR / "embeddings.meta.json"
+
+# hybrid scorer: weight on similarity vs recency, and recency half-life in days
+SIMILARITY_WEIGHT = 0.7
+RECENCY_HALF_LIFE_DAYS = 14.0
+CONTEXT_POOL = 200   # newest updates considered by the similarity + recency scorer
+
+
+def update_key(u: dict) -> str:
+    """Content key for an update (stable across list reshuffles like remove_goal)."""
+    h = hashlib.sha1((u.get("text") or "").encode("utf-8")).hexdigest()[:12]
+    return f"{u.get('created_at', '')}|{u.get('goal_id', '')}|{h}"
+
+
+# =========================
+# Embedders
+# =========================
+class OllamaEmbedder:
+    """Batched embeddings from Ollama's /api/embed endpoint."""
+
+    def __init__(self, model: str = EMBED_MODEL, url: str = OLLAMA_EMBED_URL, timeout: float = 30):
+        self.model = model
+        self.url = url
+        self.timeout = timeout
+        self.name = f"ollama:{model}"
+
+    def embed(self, texts: list) -> np.ndarray:
+        r = requests.post(self.url, json={"model": self.model, "input": texts}, timeout=self.timeout)
+        r.raise_for_status()
+        return np.asarray(r.json()["embeddings"], dtype=np.float32)
+
+
+class HashEmbedder:
+    """
+    Dependency-free local embedder: hashed bag of words (+ bigrams).
+    Deterministic, so it also serves tests and offline use.
+    """
+
+    def __init__(self, dim: int = 1024):
+        self.dim = dim
+        self.name = f"hash:{dim}"
+
+    def embed(self, texts: list) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            toks = re.findall(r"\w+", (text or "").lower())
+            for tok in toks + [a + " " + b for a, b in zip(toks, toks[1:])]:
+                h = int.from_bytes(hashlib.blake2b(tok.encode("utf-8"), digest_size=8).digest(), "little")
+                out[row, h % self.dim] += 1.0
+        return out
+
+
+def default_embedder():
+    return HashEmbedder() if EMBEDDER == "hash" else OllamaEmbedder()
+
+
+# =========================
+# Vector index
+# =========================
+class VectorIndex:
+    """
+    Unit-normalized embeddings for updates, searched with one matrix product.
+
+    Rows already on disk are memory-mapped (VECTORS_FILE is raw float32,
+    one row per line of KEYS_FILE); rows added this session live in a small
+    in-memory tail and are appended to both files as they are computed.
+    """
+
+    def __init__(self, embedder=None, dir_: Path | None = None):
+        self.embedder = embedder or default_embedder()
+        d = dir_ or DATA_DIR
+        self.vectors_file = d / VECTORS_FILE.name
+        self.keys_file = d / KEYS_FILE.name
+        self.meta_file = d / META_FILE.name
+        self._lock = threading.Lock()
+        self.dim: int | None = None
+        self._base = np.zeros((0, 0), dtype=np.float32)   # memmap of persisted rows
+        self._tail: list[np.ndarray] = []
+        self.keys: list[str] = []
+        self.row_of: dict[str, int] = {}
+        self._load()
+
+    def _load(self) -> None:
+        if not self.meta_file.exists():
+            return
+        meta = json.loads(self.meta_file.read_text(encoding="utf-8"))
+        if meta.get("embedder") != self.embedder.name:
+            # different model => vectors are not comparable; start over
+            self._reset_files()
+            return
+        self.dim = meta["dim"]
+        keys = [line.strip() for line in self.keys_file.read_text(encoding="utf-8").splitlines() if line.strip()] \
+            if self.keys_file.exists() else []
+        rows = self.vectors_file.stat().st_size // (4 * self.dim) if self.vectors_file.exists() else 0
+        n = min(len(keys), rows)   # a crash between the two appends leaves one side longer
+        if n:
+            self._base = np.memmap(self.vectors_file, dtype=np.float32, mode="r", shape=(n, self.dim))
+        self.keys = keys[:n]
+        self.row_of = {k: i for i, k in enumerate(self.keys)}
+
+    def _reset_files(self) -> None:
+        for f in (self.vectors_file, self.keys_file, self.meta_file):
+            f.unlink(missing_ok=True)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _matrix(self, rows: list) -> np.ndarray:
+        base_n = self._base.shape[0]
+        out = np.empty((len(rows), self.dim), dtype=np.float32)
+        for j, r in enumerate(rows):
+            out[j] = self._base[r] if r < base_n else self._tail[r - base_n]
+        return out
+
+    @traced("embed.add")
+    def add(self, updates: list, batch_size: int = 32) -> int:
+        """Embed (in batches) any updates not indexed yet; returns how many were added."""
+        with self._lock:
+            todo = [u for u in updates if update_key(u) not in self.row_of]
+            for start in range(0, len(todo), batch_size):
+                batch = todo[start:start + batch_size]
+                vecs = self.embedder.embed([u.get("text", "") for u in batch]).astype(np.float32)
+                norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+                vecs = vecs / np.where(norms == 0, 1, norms)
+                if self.dim is None:
+                    self.dim = int(vecs.shape[1])
+                    self.meta_file.parent.mkdir(parents=True, exist_ok=True)
+                    self.meta_file.write_text(json.dumps({"embedder": self.embedder.name, "dim": self.dim}),
+                                              encoding="utf-8")
+                with self.vectors_file.open("ab") as f:
+                    f.write(vecs.tobytes())
+                with self.keys_file.open("a", encoding="utf-8") as f:
+                    f.write("".join(update_key(u) + "\n" for u in batch))
+                for u, v in zip(batch, vecs):
+                    k = update_key(u)
+                    self.row_of[k] = len(self.keys)
+                    self.keys.append(k)
+                    self._tail.append(v)
+            return len(todo)
+
+    def similarities(self, query: str, updates: list) -> np.ndarray:
+        """Cosine similarity of `query` to each (already indexed) update, in one batch."""
+        q = self.embedder.embed([query]).astype(np.float32)[0]
+        q /= (np.linalg.norm(q) or 1.0)
+        with self._lock:
+            m = self._matrix([self.row_of[update_key(u)] for u in updates])
+        return m @ q
+
+    def top_k(self, query: str, updates: list, k: int = 6) -> list:
+        sims = self.similarities(query, updates)
+        order = np.argsort(-sims)[:k]
+        return [updates[i] for i in order]
+
+
+# =========================
+# Hybrid context selection
+# =========================
+def _age_days(u: dict, today: date) -> float:
+    try:
+        return max((today - date.fromisoformat(u.get("date", ""))).days, 0)
+    except ValueError:
+        return 365.0
+
+
+def hybrid_select(index: VectorIndex, question: str, candidates: list, n: int = 6,
+                  weight: float = SIMILARITY_WEIGHT, half_life: float = RECENCY_HALF_LIFE_DAYS,
+                  ranked: bool = False) -> list:
+    """
+    Score = weight * cosine(question, update) + (1 - weight) * recency,
+    recency = 0.5 ** (age_days / half_life). Returns the best n, newest first
+    (or best first with ranked=True, so a token packer can cut from the end).
+    """
+    if not candidates or (len(candidates) <= n and not ranked):
+        return candidates
+    index.add(candidates)
+    sims = index.similarities(question, candidates)
+    today = date.today()
+    recency = np.array([math.pow(0.5, _age_days(u, today) / half_life) for u in candidates], dtype=np.float32)
+    scores = weight * sims + (1 - weight) * recency
+    if ranked:
+        return [candidates[i] for i in np.argsort(-scores, kind="stable")[:n]]
+    best = np.argpartition(-scores, n)[:n]
+    # keep the original newest-first order of the candidates for the prompt
+    return [candidates[i] for i in sorted(best)]
+
+
+def choose_context(data: dict, goal_id: str, question: str, n: int = 6, budget: int = ASK_CONTEXT_BUDGET,
+                   index: VectorIndex | None = None):
+    """
+    Best-scoring updates that fit the token budget, newest first; returns (context, packing stats).
+    If the embedder fails the span records fallback="recency" and the newest updates are used.
+    """
+    with tracer.span("context.choose") as sp:
+        candidates = recent_updates(data, goal_id, CONTEXT_POOL)
+        sp["records"] = len(candidates)
+        ranked = candidates[:n]
+        if question.strip():
+            try:
+                if index is None:   # an empty VectorIndex is falsy, so no `index or ...`
+                    index = get_vector_index()
+                ranked = hybrid_select(index, question, candidates, n, ranked=True)
+            except Exception as e:
+                sp["error"] = type(e).__name__
+                sp["fallback"] = "recency"
+        context, stats = pack_updates(ranked, budget)
+    context.sort(key=order_key, reverse=True)
+    return context, stats
+
+
+_index: VectorIndex | None = None
+
+
+def get_vector_index() -> VectorIndex:
+    global _index
+    if _index is None:
+        _index = VectorIndex()
+    return _index
+
+
+def embed_async(updates: list) -> None:
+    """Embed freshly saved updates off the UI thread; anything missed is caught up in hybrid_select."""
+    def run():
+        try:
+            get_vector_index().add(updates)
+        except Exception:
+            pass   # embedder offline: context selection falls back to recency
+    threading.Thread(target=run, name="goalbot-embed", daemon=True).start()
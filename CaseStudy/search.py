@@ -0,0 +1,221 @@
+# search.py
+from __future__ import annotations
+
+import json
+import math
+import re
+import threading
+from bisect import bisect_left
+from pathlib import Path
+
+from storage import SEARCH_INDEX_FILE as INDEX_FILE, file_lock
+from tracing import traced
+
+PERSIST_EVERY = 50   # re-save after this many incremental adds
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> list:
+    return _TOKEN.findall((text or "").lower())
+
+
+def update_text(u: dict) -> str:
+    return u.get("text", "")
+
+
+def ai_text(a: dict) -> str:
+    return " ".join([a.get("user_text") or "", a.get("answer") or "", a.get("event_type") or ""])
+
+
+# doc ids pack (kind, position) into one int: updates even, ai_events odd
+def doc_id(kind: str, i: int) -> int:
+    return i * 2 + (1 if kind == "ai" else 0)
+
+
+def doc_ref(d: int) -> tuple:
+    return ("ai" if d & 1 else "update", d >> 1)
+
+
+def _fingerprint(records: list, n: int) -> str:
+    if n == 0:
+        return ""
+    r = records[n - 1]
+    return f"{r.get('created_at', '')}|{len(r.get('text') or r.get('answer') or '')}"
+
+
+class SearchIndex:
+    """
+    Token-level inverted index over update text and ai_event user_text/answer.
+
+    term -> {doc_id: term_frequency}. A sorted vocabulary gives prefix matches
+    by bisection, so partially typed words still hit. Queries AND their terms
+    and rank by tf-idf, newest first on ties.
+
+    Writers (apply_op) and readers (sessions searching) run on different
+    threads; _lock keeps a query from walking postings or sorting the
+    vocabulary while a document is being added.
+    """
+
+    def __init__(self):
+        self.postings: dict[str, dict[int, int]] = {}
+        self.vocab: list[str] = []
+        self._vocab_sorted = True
+        self.n_updates = 0
+        self.n_ai = 0
+        self._dirty = 0
+        self._lock = threading.Lock()
+
+    # ---- building ----
+    def _add_doc(self, d: int, text: str) -> None:
+        counts: dict[str, int] = {}
+        for tok in tokenize(text):
+            counts[tok] = counts.get(tok, 0) + 1
+        with self._lock:
+            for tok, tf in counts.items():
+                plist = self.postings.get(tok)
+                if plist is None:
+                    plist = self.postings[tok] = {}
+                    self.vocab.append(tok)
+                    self._vocab_sorted = False
+                plist[d] = tf
+            self._dirty += 1
+
+    def add_update(self, i: int, u: dict) -> None:
+        self._add_doc(doc_id("update", i), update_text(u))
+        self.n_updates = max(self.n_updates, i + 1)
+
+    def add_ai_event(self, i: int, a: dict) -> None:
+        self._add_doc(doc_id("ai", i), ai_text(a))
+        self.n_ai = max(self.n_ai, i + 1)
+
+    def catch_up(self, data: dict) -> None:
+        """Index records appended since this index was built or saved."""
+        for i in range(self.n_updates, len(data["updates"])):
+            self.add_update(i, data["updates"][i])
+        for i in range(self.n_ai, len(data["ai_events"])):
+            self.add_ai_event(i, data["ai_events"][i])
+
+    @classmethod
+    @traced("search.build")
+    def build(cls, data: dict) -> "SearchIndex":
+        idx = cls()
+        idx.catch_up(data)
+        return idx
+
+    # ---- querying ----
+    def _matching_terms(self, tok: str, prefix: bool) -> list:
+        """Vocabulary terms equal to (or starting with) tok. Caller holds _lock."""
+        if not prefix:
+            return [tok] if tok in self.postings else []
+        if not self._vocab_sorted:
+            self.vocab.sort()
+            self._vocab_sorted = True
+        out = []
+        i = bisect_left(self.vocab, tok)
+        while i < len(self.vocab) and self.vocab[i].startswith(tok):
+            out.append(self.vocab[i])
+            i += 1
+        return out
+
+    @traced("search.query")
+    def search(self, query: str, prefix: bool = True, limit: int | None = None) -> list:
+        """Ranked doc refs [(kind, position), ...] for docs containing every query term."""
+        toks = tokenize(query)
+        if not toks:
+            return []
+        with self._lock:
+            scores = self._scores(toks, prefix)
+        if not scores:
+            return []
+        ranked = sorted(scores.items(), key=lambda kv: (kv[1], kv[0] >> 1), reverse=True)
+        if limit is not None:
+            ranked = ranked[:limit]
+        return [doc_ref(d) for d, _ in ranked]
+
+    def _scores(self, toks: list, prefix: bool) -> dict:
+        """doc_id -> tf-idf for docs containing every token. Caller holds _lock."""
+        n_docs = max(self.n_updates + self.n_ai, 1)
+        scores: dict[int, float] | None = None
+        for tok in toks:
+            tok_scores: dict[int, float] = {}
+            for term in self._matching_terms(tok, prefix):
+                plist = self.postings[term]
+                idf = math.log(1 + n_docs / len(plist))
+                for d, tf in plist.items():
+                    tok_scores[d] = tok_scores.get(d, 0.0) + tf * idf
+            if scores is None:
+                scores = tok_scores
+            else:
+                scores = {d: s + tok_scores[d] for d, s in scores.items() if d in tok_scores}
+            if not scores:
+                return {}
+        return scores
+
+    # ---- persistence ----
+    def save(self, data: dict, path: Path | None = None) -> None:
+        path = path or INDEX_FILE
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            doc = {
+                "version": 1,
+                "n_updates": self.n_updates,
+                "n_ai": self.n_ai,
+                "fp_updates": _fingerprint(data["updates"], self.n_updates),
+                "fp_ai": _fingerprint(data["ai_events"], self.n_ai),
+                "postings": {t: [[d, tf] for d, tf in p.items()] for t, p in self.postings.items()},
+            }
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(doc, separators=(",", ":")), encoding="utf-8")
+        tmp.replace(path)
+        self._dirty = 0
+
+    @classmethod
+    def load(cls, data: dict, path: Path | None = None) -> "SearchIndex | None":
+        """Load a persisted index if it is a prefix of `data` (else None)."""
+        path = path or INDEX_FILE
+        if not path.exists():
+            return None
+        try:
+            doc = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return None
+        n_u, n_a = doc.get("n_updates", 0), doc.get("n_ai", 0)
+        if (doc.get("version") != 1
+                or n_u > len(data["updates"]) or n_a > len(data["ai_events"])
+                or doc.get("fp_updates") != _fingerprint(data["updates"], n_u)
+                or doc.get("fp_ai") != _fingerprint(data["ai_events"], n_a)):
+            return None
+        idx = cls()
+        idx.postings = {t: {d: tf for d, tf in p} for t, p in doc["postings"].items()}
+        idx.vocab = sorted(idx.postings)
+        idx.n_updates, idx.n_ai = n_u, n_a
+        return idx
+
+    def maybe_persist(self, data: dict) -> None:
+        if self._dirty >= PERSIST_EVERY:
+            self.save(data)
+
+
+def get_search_index(data) -> SearchIndex:
+    """
+    The search index attached to a loaded JournalData: loaded from disk
+    (and caught up with newer records) on first use, else built and saved.
+    The writer lock also guards the index file: two sessions opening the
+    journal at once don't both rebuild it and race on the save.
+    """
+    idx = getattr(data, "search_index", None)
+    if idx is None:
+        with file_lock:
+            idx = getattr(data, "search_index", None)
+            if idx is not None:
+                return idx
+            idx = SearchIndex.load(data)
+            if idx is None:
+                idx = SearchIndex.build(data)
+                idx.save(data)
+            else:
+                idx.catch_up(data)
+                idx.maybe_persist(data)
+            data.search_index = idx
+    return idx
@@ -1,77 +1,1537 @@
 # storage.py
 from __future__ import annotations
 
+import gc
+import gzip
+import hashlib
+import heapq
 import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import uuid
+from contextlib import contextmanager
 from pathlib import Path
-from datetime import datetime
+from datetime import date, datetime, timedelta
 
-# Folder + file where data lives
-DATA_DIR = Path(__file__).parent / "data"
+try:
+    import fcntl
+except ImportError:  # Windows: in-process locking only
+    fcntl = None
+
+from indexes import GoalRegistry, UpdateIndex, update_key
+from records import (JSON_COMPACT, created_seconds, dump_doc, dumps, dumps_bytes, load_doc, loads, to_day, to_seconds,
+                     typed_doc, typed_op)
+from tracing import span
+
+# Folder + file where data lives (GOALBOT_DATA_DIR points a run at another folder, e.g. benchmarks)
+DATA_DIR = Path(os.environ.get("GOALBOT_DATA_DIR") or Path(__file__).parent / "data")
 DATA_FILE = DATA_DIR / "goalbot.json"
 
+# Append-only journal of mutations since the last snapshot.
+# While a compaction runs, the active log is rotated to LOG_ROTATED_FILE
+# so new writes never wait on the snapshot rewrite.
+LOG_FILE = DATA_DIR / "goalbot.log.jsonl"
+LOG_ROTATED_FILE = DATA_DIR / "goalbot.log.1.jsonl"
+COMPACT_THRESHOLD_BYTES = 512 * 1024
+
+# Small sidecar written with every snapshot: goals + the newest updates per
+# goal, enough for the Goals page to render without parsing the whole journal
+HOT_FILE = DATA_DIR / "goalbot.hot.json"
+HOT_RECENT = 6
+
+# Time-partitioned JSON layout (GOALBOT_STORAGE=shards, see ShardedEngine): a
+# manifest + goals file and one shard file per month of appended records.
+# Shards of finished months are sealed (gzipped) and not rewritten after that.
+SHARD_DIR = DATA_DIR / "shards"
+SHARD_GZIP_LEVEL = 1   # ~3.5x smaller at ~1/4 the time of level 9 (~4.1x); purges rewrite sealed shards too
+
+# Cross-process lock files: one for log appends/rotation, one for snapshot rewrites
+LOCK_FILE = DATA_DIR / "goalbot.lock"
+SNAPSHOT_LOCK_FILE = DATA_DIR / "goalbot.snapshot.lock"
+
+# SQLite engine database
+DB_FILE = DATA_DIR / "goalbot.sqlite3"
+
+# Persisted History search index (see search.py)
+SEARCH_INDEX_FILE = DATA_DIR / "search_index.json"
+
+# Exported tracing spans (see tracing.py and the sidebar Performance panel)
+METRICS_FILE = DATA_DIR / "metrics.jsonl"
+
+# "json" (default), "shards" or "sqlite"; override with e.g. GOALBOT_STORAGE=sqlite
+STORAGE_ENGINE = os.environ.get("GOALBOT_STORAGE", "json")
+
+
+# entries may be dated ahead (plans) but not by a typo's worth of years; the
+# Statistics matrices span every day in this range that has an entry
+FIRST_DATE = date(1970, 1, 1)
+MAX_FUTURE_DAYS = 366
+
 
 def now_ts() -> str:
     return datetime.now().isoformat(timespec="seconds")
 
 
+def normalize_date(s: str) -> str:
+    s = (s or "").strip()
+    if re.match(r"^\d{4}/\d{2}/\d{2}$", s):
+        s = s.replace("/", "-")
+    if not re.match(r"^\d{4}-\d{2}-\d{2}$", s):
+        raise ValueError("Use YYYY-MM-DD (example: 2026-01-30)")
+    d = datetime.strptime(s, "%Y-%m-%d").date()
+    if not FIRST_DATE <= d <= date.today() + timedelta(days=MAX_FUTURE_DAYS):
+        raise ValueError(f"Date out of range: {s} (from {FIRST_DATE} to a year from today)")
+    return s
+
+
 def _default_data() -> dict:
+    names = ["Improve sleep routine", "Exercise consistently", "Reduce work stress", "Learn a new skill",
+             "Practice mindfulness"]
     return {
-        "goals": [
-            {"name": "Improve sleep routine", "status": "active"},
-            {"name": "Exercise consistently", "status": "active"},
-            {"name": "Reduce work stress", "status": "active"},
-            {"name": "Learn a new skill", "status": "active"},
-            {"name": "Practice mindfulness", "status": "active"},
-        ],
+        "goals": [{"id": legacy_goal_id(name), "name": name, "status": "active"} for name in names],
         "updates": [],
         "ai_events": []
     }
 
 
+# =========================
+# Goal IDs
+# =========================
+# Goals are {"id", "name", "status"} (+ "deleted": True once removed) and
+# records point at them by "goal_id", so a rename touches one goal and a
+# delete is a tombstone; tombstoned goals and their records are hidden at
+# read time and dropped for good by the next compaction (purge_deleted).
+ALL_GOALS = "ALL_GOALS"   # goal_id of cross-goal ai_events (progress summaries)
+
+
+def new_goal_id() -> str:
+    return "g" + uuid.uuid4().hex[:10]
+
+
+def legacy_goal_id(name: str) -> str:
+    """ID for a goal from before IDs existed: derived from the name, so every process upgrading agrees."""
+    return "g" + hashlib.blake2b(name.encode("utf-8"), digest_size=5).hexdigest()
+
+
+def live_goals(goals: list) -> list:
+    return [g for g in goals if not g.get("deleted")]
+
+
+def deleted_goal_ids(goals: list) -> set:
+    return {g["id"] for g in goals if g.get("deleted")}
+
+
+def goal_names(goals: list) -> dict:
+    """goal_id -> name; look up with .get(gid, gid) so ALL_GOALS names itself."""
+    return {g["id"]: g["name"] for g in goals}
+
+
+def find_goal(goals: list, goal_id: str) -> dict | None:
+    for g in goals:
+        if g["id"] == goal_id:
+            return g
+    return None
+
+
+def upgrade_goal_ids(data: dict) -> bool:
+    """
+    In-place upgrade of a document written before goal IDs: goals get an id,
+    records swap their "goal" name for a "goal_id". Returns True if anything changed.
+    """
+    changed = False
+    ids = {}
+    for g in data["goals"]:
+        if "id" not in g:
+            g["id"] = legacy_goal_id(g["name"])
+            changed = True
+        ids[g["name"]] = g["id"]
+    for records in (data["updates"], data["ai_events"]):
+        for r in records:
+            if "goal" in r:
+                name = r.pop("goal")
+                r["goal_id"] = ids.get(name, name)   # ALL_GOALS events keep the name as their id
+                changed = True
+    return changed
+
+
+def _upgrade_rec(goals: list, op: str, rec: dict) -> dict:
+    """Same upgrade for one logged op (old log entries name their goal instead of pointing at it)."""
+    if op == "add_goal" and "id" not in rec:
+        return dict(rec, id=legacy_goal_id(rec["name"]))
+    if op in ("set_goal_status", "remove_goal") and "id" not in rec:
+        ids = {g["name"]: g["id"] for g in live_goals(goals)}
+        return dict(rec, id=ids.get(rec["name"], legacy_goal_id(rec["name"])))
+    if op in ("add_update", "add_ai_event") and "goal" in rec:
+        ids = {g["name"]: g["id"] for g in live_goals(goals)}
+        out = {k: v for k, v in rec.items() if k != "goal"}
+        out["goal_id"] = ids.get(rec["goal"], rec["goal"])
+        return out
+    return rec
+
+
 def _ensure_file() -> None:
     DATA_DIR.mkdir(parents=True, exist_ok=True)
     if not DATA_FILE.exists():
-        DATA_FILE.write_text(json.dumps(_default_data(), indent=2), encoding="utf-8")
+        DATA_FILE.write_bytes(dump_doc(_default_data()))
 
 
-def load_data() -> dict:
+class _FileLock:
     """
-    Safe loader:
-    - Creates file if missing
-    - If file exists but is empty/corrupt, resets to defaults
+    Exclusive lock shared by threads (RLock) and processes (flock on a lock file).
+    Re-entrant within a thread, so engine methods can nest under Store.mutate().
     """
-    _ensure_file()
-    raw = DATA_FILE.read_text(encoding="utf-8").strip()
 
-    if not raw:
-        data = _default_data()
-        save_data(data)
-        return data
+    def __init__(self, path_fn):
+        self._path_fn = path_fn
+        self._rlock = threading.RLock()
+        self._depth = 0
+        self._fh = None
+
+    def __enter__(self):
+        self._rlock.acquire()
+        if self._depth == 0:
+            path = self._path_fn()
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._fh = open(path, "a+")
+            if fcntl is not None:
+                fcntl.flock(self._fh.fileno(), fcntl.LOCK_EX)
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self._depth -= 1
+        if self._depth == 0:
+            if fcntl is not None:
+                fcntl.flock(self._fh.fileno(), fcntl.LOCK_UN)
+            self._fh.close()
+            self._fh = None
+        self._rlock.release()
+
+
+# lock order: file_lock -> snapshot_file_lock -> engine-internal locks
+file_lock = _FileLock(lambda: LOCK_FILE)
+snapshot_file_lock = _FileLock(lambda: SNAPSHOT_LOCK_FILE)
+
+
+_gc_lock = threading.Lock()
+_gc_started = False
+
+
+@contextmanager
+def _startup_gc_pause():
+    """
+    Bulk loads allocate a few objects per record and no reference cycles, so
+    the cyclic collector's passes over them are pure overhead (about a third
+    of a 100k-record load). The collector is process-wide, so only the
+    process's first load pauses it, before any session is being served;
+    later loads and reloads run with it on.
+    """
+    global _gc_started
+    with _gc_lock:
+        pause = not _gc_started and gc.isenabled()
+        _gc_started = True
+        if pause:
+            gc.disable()
+    try:
+        yield
+    finally:
+        if pause:
+            gc.enable()
+
 
+def _stat(path: Path):
     try:
-        data = json.loads(raw)
-    except json.JSONDecodeError:
-        # backup corrupt file
-        backup = DATA_DIR / f"goalbot_corrupt_{now_ts().replace(':','-')}.json"
-        DATA_FILE.replace(backup)
-        data = _default_data()
-        save_data(data)
+        st = path.stat()
+        return (st.st_mtime_ns, st.st_size)
+    except FileNotFoundError:
+        return None
+
+
+class JournalData(dict):
+    """
+    The loaded document (as typed records, see records.py) plus in-memory indexes.
+    Only the dict contents are persisted; indexes are rebuilt once per load.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        with span("storage.typed", records=len(self.get("updates", [])) + len(self.get("ai_events", []))):
+            typed_doc(self)
+        self.update_index = UpdateIndex(self.get("updates", []))
+        self.goal_registry = GoalRegistry(self.get("goals", []), self.get("updates", []))
+        self.search_index = None   # attached lazily by search.get_search_index()
+        self.analytics = None      # attached lazily by analytics.get_analytics()
+
+    def reset(self, fresh: dict) -> None:
+        """Swap in a freshly loaded document in place (aliases to the lists stay valid)."""
+        typed_doc(fresh)
+        for key in ("goals", "updates", "ai_events"):
+            self.setdefault(key, [])[:] = fresh.get(key, [])
+        self.update_index.rebuild(self["updates"])
+        self.goal_registry.rebuild(self["goals"], self["updates"])
+        self.search_index = None
+        self.analytics = None
+
+
+# =========================
+# Mutations (replayable)
+# =========================
+def apply_op(data: dict, op: str, rec: dict, persist_index: bool = True) -> None:
+    """
+    Apply one mutation to the in-memory document.
+    Lists are edited in place so callers holding aliases stay current.
+    persist_index=False leaves the periodic search-index save to the caller (batches).
+    """
+    goals, updates, ai_events = data["goals"], data["updates"], data["ai_events"]
+    index = getattr(data, "update_index", None)
+    registry = getattr(data, "goal_registry", None)
+    search = getattr(data, "search_index", None)
+    stats = getattr(data, "analytics", None)
+    rec = typed_op(op, _upgrade_rec(goals, op, rec))
+    if op == "add_goal":
+        goals.append(rec)
+        if registry is not None:
+            registry.refresh(rec)
+    elif op in ("set_goal_status", "rename_goal", "remove_goal"):
+        g = registry.get(rec["id"]) if registry is not None else find_goal(goals, rec["id"])
+        if g is None:
+            return
+        if op == "set_goal_status":
+            g["status"] = rec["status"]
+        elif op == "rename_goal":
+            g["name"] = rec["name"]
+        else:
+            # tombstone: records stay where they are (positions, search index and
+            # feed cursors remain valid) until compaction purges them
+            g["deleted"] = True
+            if index is not None:
+                index.drop_goal(g["id"])
+        if registry is not None:
+            registry.refresh(g)
+    elif op == "add_update":
+        updates.append(rec)
+        if index is not None:
+            index.add(rec)
+        if registry is not None:
+            registry.add_update(rec)
+        if stats is not None:
+            stats.add_update(rec)
+        if search is not None:
+            search.add_update(len(updates) - 1, rec)
+            if persist_index:
+                search.maybe_persist(data)
+    elif op == "add_ai_event":
+        ai_events.append(rec)
+        if stats is not None:
+            stats.add_ai_event(rec)
+        if search is not None:
+            search.add_ai_event(len(ai_events) - 1, rec)
+            if persist_index:
+                search.maybe_persist(data)
+    else:
+        raise ValueError(f"Unknown op: {op}")
+
+
+def purge_deleted(data: dict) -> int:
+    """Physically drop tombstoned goals and their records; returns how many records went."""
+    gone = deleted_goal_ids(data["goals"])
+    if not gone:
+        return 0
+    before = len(data["updates"]) + len(data["ai_events"])
+    data["goals"][:] = [g for g in data["goals"] if g["id"] not in gone]
+    data["updates"][:] = [u for u in data["updates"] if u.get("goal_id") not in gone]
+    data["ai_events"][:] = [a for a in data["ai_events"] if a.get("goal_id") not in gone]
+    return before - len(data["updates"]) - len(data["ai_events"])
+
+
+def hot_view_of(data: dict, k: int = HOT_RECENT) -> dict:
+    """Live goals, newest k updates per goal (newest first), updates per goal and record counts."""
+    index = getattr(data, "update_index", None) or UpdateIndex(data.get("updates", []))
+    goals = live_goals(data.get("goals", []))
+    return {
+        "goals": [dict(g) for g in goals],
+        "recent": {g["id"]: index.recent(g["id"], k) for g in goals},
+        "entries": {g["id"]: index.count(g["id"]) for g in goals},
+        "counts": {"updates": len(data.get("updates", [])), "ai_events": len(data.get("ai_events", []))},
+    }
+
+
+def hot_registry(view: dict) -> GoalRegistry:
+    """A GoalRegistry for a hot view: its goals, with counters from its per-goal entries and recent updates."""
+    registry = GoalRegistry(view["goals"])
+    for gid, n in view["entries"].items():
+        recent = view["recent"].get(gid)
+        registry.set_counts(gid, n, recent[0].get("date") if recent else None)
+    return registry
+
+
+def apply_hot_op(view: dict, op: str, rec: dict) -> None:
+    """apply_op for a hot view (see hot_view_of)."""
+    goals, recent, entries, counts = view["goals"], view["recent"], view["entries"], view["counts"]
+    rec = _upgrade_rec(goals, op, rec)
+    if op == "add_goal":
+        goals.append(dict(rec))
+        recent.setdefault(rec["id"], [])
+        entries.setdefault(rec["id"], 0)
+    elif op in ("set_goal_status", "rename_goal"):
+        g = find_goal(goals, rec["id"])
+        if g is not None and op == "set_goal_status":
+            g["status"] = rec["status"]
+        elif g is not None:
+            g["name"] = rec["name"]
+    elif op == "remove_goal":
+        goals[:] = [g for g in goals if g["id"] != rec["id"]]
+        recent.pop(rec["id"], None)
+        entries.pop(rec["id"], None)
+    elif op == "add_update":
+        items = recent.setdefault(rec["goal_id"], [])
+        items.append(rec)
+        items.sort(key=update_key, reverse=True)
+        del items[HOT_RECENT:]
+        entries[rec["goal_id"]] = entries.get(rec["goal_id"], 0) + 1
+        counts["updates"] += 1
+    elif op == "add_ai_event":
+        counts["ai_events"] += 1
+
+
+# =========================
+# JSON engine (snapshot + append log)
+# =========================
+class JsonEngine:
+    name = "json"
+    partial_reads = False   # queries need the loaded document (see Store.recent / updates_between)
+
+    def __init__(self):
+        # read at construction so tests/benchmarks can point the module paths elsewhere first
+        self.snapshot_file = DATA_FILE
+        self.log_file = LOG_FILE
+        self.rotated_log_file = LOG_ROTATED_FILE
+        self.hot_file = HOT_FILE
+        self._log_lock = threading.Lock()        # guards log appends/rotation + _seq
+        self._snapshot_lock = threading.Lock()   # guards snapshot rewrites
+        self._seq = 0                            # last sequence number written to the log
+        self._compactor: threading.Thread | None = None
+        self._legacy_layout = False              # snapshot read was written before compact tables
+
+    def _ensure(self) -> None:
+        _ensure_file()
+
+    def _write_snapshot(self, data: dict, seq: int) -> None:
+        """Atomic snapshot write: temp file then replace. Caller holds _snapshot_lock."""
+        tmp = DATA_DIR / "goalbot.tmp.json"
+        with span("storage.snapshot_write", engine=self.name) as sp:
+            # log_seq goes first so other processes can read it without parsing the whole file
+            raw = dump_doc({"log_seq": seq, **data})
+            tmp.write_bytes(raw)
+            tmp.replace(self.snapshot_file)
+            sp["bytes"] = len(raw)
+            hot_tmp = self.hot_file.with_name(self.hot_file.stem + ".tmp.json")
+            hot_tmp.write_bytes(dumps_bytes({"log_seq": seq, **hot_view_of(data)}))
+            hot_tmp.replace(self.hot_file)
+
+    def _snapshot_seq(self) -> int:
+        try:
+            with self.snapshot_file.open("r", encoding="utf-8") as f:
+                head = f.read(128)
+        except FileNotFoundError:
+            return 0
+        m = re.search(r'"log_seq":\s*(\d+)', head)
+        return int(m.group(1)) if m else 0
+
+    @staticmethod
+    def _read_log(path: Path, torn: list | None = None):
+        """
+        Yield log entries. A line cut short by a crash mid-append is skipped
+        (and its path added to `torn`); appends always start on a fresh line,
+        so entries written after the tear still replay.
+        """
+        if not path.exists():
+            return
+        with path.open("r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield loads(line)
+                except json.JSONDecodeError:
+                    if torn is not None:
+                        torn.append(path)
+
+    def hot_view(self) -> dict | None:
+        """
+        Goals + recent updates from the hot sidecar with the append log replayed on
+        top, or None when the sidecar is missing or older than the snapshot.
+        """
+        with file_lock, snapshot_file_lock, span("storage.hot_view", engine=self.name) as sp:
+            try:
+                raw = self.hot_file.read_bytes()
+                hot = loads(raw)
+            except (FileNotFoundError, json.JSONDecodeError):
+                return None
+            seq = hot.pop("log_seq", 0)
+            if seq != self._snapshot_seq() or "entries" not in hot:   # stale, or from before per-goal counts
+                return None
+            for path in (self.rotated_log_file, self.log_file):
+                for entry in self._read_log(path):
+                    if entry["seq"] > seq:
+                        apply_hot_op(hot, entry["op"], entry["rec"])
+                        seq = entry["seq"]
+            sp["bytes"] = len(raw)
+            return hot
+
+    def load(self) -> dict:
+        """
+        Safe loader:
+        - Creates file if missing
+        - If file exists but is empty/corrupt, resets to defaults
+        - Replays the append log on top of the snapshot
+        """
+        with file_lock, snapshot_file_lock, span("storage.load", engine=self.name) as sp:
+            data = self._load()
+            sp["bytes"] = self.snapshot_file.stat().st_size
+            sp["records"] = len(data["updates"]) + len(data["ai_events"])
+            return data
+
+    def _read_snapshot(self) -> dict | None:
+        """The snapshot document (log_seq included), or None if it is empty or corrupt."""
+        raw = self.snapshot_file.read_bytes().strip()
+        if not raw:
+            return None
+        try:
+            doc = loads(raw)
+        except json.JSONDecodeError:
+            # backup corrupt file
+            backup = DATA_DIR / f"goalbot_corrupt_{now_ts().replace(':','-')}.json"
+            self.snapshot_file.replace(backup)
+            return None
+        self._legacy_layout = JSON_COMPACT and type(doc.get("updates")) is list
+        return typed_doc(doc)
+
+    def _load(self) -> dict:
+        self._ensure()
+        data = self._read_snapshot()
+        if data is None:
+            data = _default_data()
+            self.save(data)
+            return data
+
+        # Ensure required keys exist
+        data.setdefault("goals", [])
+        data.setdefault("updates", [])
+        data.setdefault("ai_events", [])
+        upgrade_goal_ids(data)
+
+        seq = data.pop("log_seq", 0)
+        torn = []
+        for path in (self.rotated_log_file, self.log_file):
+            for entry in self._read_log(path, torn):
+                if entry["seq"] > seq:
+                    apply_op(data, entry["op"], entry["rec"])
+                    seq = entry["seq"]
+        with self._log_lock:
+            self._seq = seq
+
+        # a compaction was interrupted, a log holds a torn line, or the snapshot
+        # predates compact tables: checkpoint now
+        if self.rotated_log_file.exists() or torn or self._legacy_layout:
+            self.save(data)
+        return data
+
+    def save(self, data: dict) -> None:
+        """
+        Safe writer (atomic):
+        Write to a temp file then replace the real file.
+        Prevents half-written JSON if app stops mid-write.
+        This is a full checkpoint: the append log is cleared afterwards.
+        """
+        self._ensure()
+        with file_lock, snapshot_file_lock, self._snapshot_lock, self._log_lock, \
+                span("storage.save", engine=self.name):
+            self._write_snapshot(data, self._seq)
+            self.log_file.unlink(missing_ok=True)
+            self.rotated_log_file.unlink(missing_ok=True)
+
+    def append(self, op: str, rec: dict) -> None:
+        """Persist one mutation as an appended log line (O(1) write)."""
+        self.append_many([(op, rec)])
+
+    def append_many(self, ops: list) -> None:
+        """Persist a batch of (op, rec) mutations with one write + flush."""
+        self._ensure()
+        with file_lock, self._log_lock, \
+                span("storage.append", engine=self.name, op=ops[0][0] if len(ops) == 1 else "batch") as sp:
+            lines = []
+            for op, rec in ops:
+                self._seq += 1
+                lines.append(dumps({"seq": self._seq, "op": op, "rec": rec}) + "\n")
+            chunk = "".join(lines)
+            with self.log_file.open("a+b") as f:
+                end = f.seek(0, os.SEEK_END)
+                if end:
+                    f.seek(end - 1)
+                    if f.read(1) != b"\n":
+                        chunk = "\n" + chunk   # a crash tore the last line: don't glue ours onto it
+                f.write(chunk.encode("utf-8"))
+                f.flush()
+            size = self.log_file.stat().st_size
+            sp["bytes"] = len(chunk)
+            sp["records"] = len(ops)
+        if size >= COMPACT_THRESHOLD_BYTES or any(op == "remove_goal" for op, _ in ops):
+            # a delete is only a tombstone: compaction drops the goal's records for good
+            self.compact(background=True)
+
+    def version(self):
+        """Cheap change token (stat only) for the snapshot and both logs."""
+        return (_stat(self.snapshot_file), _stat(self.rotated_log_file), _stat(self.log_file))
+
+    def catch_up(self, data: dict) -> dict | None:
+        """
+        Merge writes made by other processes into `data`: replay log entries
+        newer than the last one we know. Returns None when merged in place, or a
+        freshly loaded document if those entries were already compacted away.
+        """
+        with file_lock, snapshot_file_lock:
+            if self._snapshot_seq() > self._seq:
+                return self._load()
+            for path in (self.rotated_log_file, self.log_file):
+                for entry in self._read_log(path):
+                    if entry["seq"] > self._seq:
+                        apply_op(data, entry["op"], entry["rec"])
+                        self._seq = entry["seq"]
+        return None
+
+    def recent_updates(self, data: dict, goal: str | None = None, n: int = 5) -> list:
+        if goal is None:
+            gone = deleted_goal_ids(data["goals"])
+            return heapq.nlargest(n, (u for u in data["updates"] if u["goal_id"] not in gone), key=created_seconds)
+        index = getattr(data, "update_index", None)
+        if index is not None:
+            return index.recent(goal, n)
+        return heapq.nlargest(n, (u for u in data["updates"] if u["goal_id"] == goal), key=update_key)
+
+    def updates_between(self, data: dict, start: str, end: str, goal: str | None = None) -> list:
+        """Updates dated start..end (inclusive, YYYY-MM-DD) for a goal or all live goals, oldest first."""
+        index = getattr(data, "update_index", None)
+        if index is not None:
+            if goal is not None:
+                return list(index.between(goal, start, end))
+            gone = deleted_goal_ids(data["goals"])
+            return sorted((u for g in index.goals() if g not in gone for u in index.between(g, start, end)),
+                          key=update_key)
+        gone = deleted_goal_ids(data["goals"])
+        lo, hi = to_day(start), to_day(end)
+        return sorted((u for u in data["updates"] if lo <= update_key(u)[0] <= hi and u["goal_id"] not in gone
+                       and (goal is None or u["goal_id"] == goal)), key=update_key)
+
+    def _fold_rotated_log(self) -> None:
+        """Replay the rotated log onto the on-disk snapshot (purging deleted goals), then drop it."""
+        with snapshot_file_lock, self._snapshot_lock, span("storage.compact", engine=self.name) as sp:
+            if not self.rotated_log_file.exists():
+                return  # a full save() already checkpointed everything
+            snap = load_doc(self.snapshot_file.read_bytes())
+            seq = snap.pop("log_seq", 0)
+            for s in ("goals", "updates", "ai_events"):
+                snap.setdefault(s, [])
+            upgrade_goal_ids(snap)
+            for entry in self._read_log(self.rotated_log_file):
+                if entry["seq"] > seq:
+                    apply_op(snap, entry["op"], entry["rec"])
+                    seq = entry["seq"]
+            sp["purged"] = purge_deleted(snap)
+            if sp["purged"]:
+                # record positions shift on the next load: the persisted search index is stale
+                SEARCH_INDEX_FILE.unlink(missing_ok=True)
+            self._write_snapshot(snap, seq)
+            self.rotated_log_file.unlink()
+
+    def compact(self, background: bool = False) -> None:
+        """
+        Fold the append log into the snapshot.
+        The active log is renamed first, so appends continue into a fresh file
+        while the snapshot is rebuilt from disk (never from a live dict).
+        A foreground call waits for a background pass that is still running.
+        """
+        compactor = self._compactor
+        if compactor is not None and compactor.is_alive():
+            if background:
+                return
+            compactor.join()
+        with file_lock, self._log_lock:
+            if self._compactor is not None and self._compactor.is_alive():
+                return
+            if self.log_file.exists() and not self.rotated_log_file.exists():
+                self.log_file.replace(self.rotated_log_file)
+            if not self.rotated_log_file.exists():
+                return
+            if background:
+                self._compactor = threading.Thread(
+                    target=self._fold_rotated_log, name="goalbot-compact", daemon=True
+                )
+                self._compactor.start()
+                return
+        self._fold_rotated_log()
+
+
+# =========================
+# Sharded JSON engine (monthly shard files + manifest)
+# =========================
+_NO_MONTH = "0000-00"   # shard key for records without a usable created_at
+
+
+def _month(rec: dict) -> str:
+    m = (rec.get("created_at") or "")[:7]
+    return m if re.match(r"^\d{4}-\d{2}$", m) else _NO_MONTH
+
+
+def _open_month() -> str:
+    """Shards keyed before this month are sealed."""
+    return datetime.now().strftime("%Y-%m")
+
+
+class ShardedEngine(JsonEngine):
+    """
+    JsonEngine with the records split into one file per month:
+
+        manifest.json           log_seq, goals, and per shard: file name, record
+                                counts, min/max update date, newest update
+                                created_at, records per goal
+        2025-01.7.json.gz       sealed shard (a finished month), never rewritten
+                                except to purge a deleted goal (full checkpoints
+                                keep it too unless its records changed)
+        2025-02.9.json          open shard (this month)
+        log.jsonl, hot.json     append log + hot sidecar, exactly as in JsonEngine
+
+    A record's shard is the month of its created_at, but never earlier than the
+    newest shard or the current month, so shards concatenated in key order
+    give back the append order, and compaction only ever appends to the open
+    shard. Every rewrite goes to a new file name (the trailing number is the
+    manifest generation) and the manifest is replaced last, so a crash
+    mid-compaction leaves the previous generation intact.
+
+    Date-range and recent-N queries read only the shards whose manifest entry
+    can match, plus the log; they need no full load (partial_reads).
+    """
+    name = "shards"
+    partial_reads = True
+
+    def __init__(self, shard_dir: Path | None = None):
+        super().__init__()
+        self.dir = shard_dir or SHARD_DIR
+        self.snapshot_file = self.dir / "manifest.json"
+        self.log_file = self.dir / "log.jsonl"
+        self.rotated_log_file = self.dir / "log.1.jsonl"
+        self.hot_file = self.dir / "hot.json"
+
+    # ---- files ----
+    def _ensure(self) -> None:
+        """First open: move goalbot.json (+ its log) into shards; the JSON file is left as it was."""
+        if self.snapshot_file.exists():
+            return
+        with file_lock, snapshot_file_lock, self._snapshot_lock:
+            if self.snapshot_file.exists():
+                return
+            self.dir.mkdir(parents=True, exist_ok=True)
+            data = JsonEngine().load() if DATA_FILE.exists() else _default_data()
+            self._write_snapshot(data, 0)
+
+    def _read_manifest(self) -> dict:
+        return loads(self.snapshot_file.read_bytes())
+
+    def _read_shard(self, entry: dict | None) -> dict:
+        if entry is None:
+            return {"updates": [], "ai_events": []}
+        raw = (self.dir / entry["file"]).read_bytes()
+        return load_doc(gzip.decompress(raw) if entry["sealed"] else raw)
+
+    def _write_shard(self, key: str, shard: dict, gen: int, sealed: bool) -> dict:
+        """Write a shard under a fresh name; returns its manifest entry."""
+        name = f"{key}.{gen}.json" + (".gz" if sealed else "")
+        raw = dump_doc(shard)
+        tmp = self.dir / (name + ".tmp")
+        tmp.write_bytes(gzip.compress(raw, SHARD_GZIP_LEVEL) if sealed else raw)
+        tmp.replace(self.dir / name)
+        return {"file": name, "sealed": sealed, **self._shard_stats(shard)}
+
+    @staticmethod
+    def _shard_stats(shard: dict) -> dict:
+        """The manifest's summary of a shard's records (everything but file and sealed)."""
+        updates = shard["updates"]
+        goals = {}
+        for r in updates + shard["ai_events"]:
+            goals[r.get("goal_id")] = goals.get(r.get("goal_id"), 0) + 1
+        return {
+            "updates": len(updates),
+            "ai_events": len(shard["ai_events"]),
+            "min_date": min((u["date"] for u in updates), default=None),
+            "max_date": max((u["date"] for u in updates), default=None),
+            "max_created": max((u.get("created_at", "") for u in updates), default=None),
+            "goals": goals,
+        }
+
+    def _commit(self, manifest: dict, hot: dict, old: dict | None) -> int:
+        """Replace the manifest (the commit point) and hot sidecar, then drop superseded shard files."""
+        manifest["shards"] = dict(sorted(manifest["shards"].items()))
+        raw = dumps_bytes(manifest)
+        tmp = self.dir / "manifest.tmp.json"
+        tmp.write_bytes(raw)
+        tmp.replace(self.snapshot_file)
+        hot_tmp = self.hot_file.with_name(self.hot_file.stem + ".tmp.json")
+        hot_tmp.write_bytes(dumps_bytes({"log_seq": manifest["log_seq"], **hot}))
+        hot_tmp.replace(self.hot_file)
+        live = {e["file"] for e in manifest["shards"].values()}
+        for e in (old or {}).get("shards", {}).values():
+            if e["file"] not in live:
+                (self.dir / e["file"]).unlink(missing_ok=True)
+        return len(raw)
+
+    def _tail(self, manifest: dict) -> dict:
+        """Goals + records of the log entries not folded into shards yet."""
+        head = {"goals": [dict(g) for g in manifest["goals"]], "updates": [], "ai_events": []}
+        for path in (self.rotated_log_file, self.log_file):
+            for entry in self._read_log(path):
+                if entry["seq"] > manifest["log_seq"]:
+                    apply_op(head, entry["op"], entry["rec"])
+        return head
+
+    # ---- snapshot = manifest + shards ----
+    def _read_snapshot(self) -> dict | None:
+        try:
+            manifest = self._read_manifest()
+        except json.JSONDecodeError:
+            backup = self.dir / f"manifest_corrupt_{now_ts().replace(':', '-')}.json"
+            self.snapshot_file.replace(backup)
+            return None
+        return {"log_seq": manifest["log_seq"], **self._assemble(manifest)}
+
+    def _assemble(self, manifest: dict) -> dict:
+        data = {"goals": manifest["goals"], "updates": [], "ai_events": []}
+        for entry in dict(sorted(manifest["shards"].items())).values():   # key order = append order
+            shard = self._read_shard(entry)
+            data["updates"] += shard["updates"]
+            data["ai_events"] += shard["ai_events"]
         return data
 
-    # Ensure required keys exist
-    data.setdefault("goals", [])
-    data.setdefault("updates", [])
-    data.setdefault("ai_events", [])
-    return data
+    def _write_snapshot(self, data: dict, seq: int) -> None:
+        """
+        Full checkpoint: repartition every record in memory, but only write the
+        shards whose records changed (new ones, purged ones, a month to seal).
+        Records are append-only, so a shard whose manifest summary (counts per
+        goal, date range, newest created_at) still matches keeps its file.
+        Caller holds _snapshot_lock.
+        """
+        with span("storage.snapshot_write", engine=self.name) as sp:
+            try:
+                old = self._read_manifest()
+            except (FileNotFoundError, json.JSONDecodeError):
+                old = None
+            gen = (old or {}).get("gen", 0) + 1
+            old_shards = (old or {}).get("shards", {})
+            open_key = _open_month()
+            shards = {}
+            for kind in ("updates", "ai_events"):
+                key = _NO_MONTH
+                for rec in data[kind]:
+                    key = max(key, _month(rec))
+                    shards.setdefault(key, {"updates": [], "ai_events": []})[kind].append(rec)
+            entries = {}
+            for key, shard in shards.items():
+                sealed, prev = key < open_key, old_shards.get(key)
+                stats = self._shard_stats(shard)
+                if prev is not None and prev["sealed"] == sealed and all(prev[k] == v for k, v in stats.items()):
+                    entries[key] = prev
+                else:
+                    entries[key] = self._write_shard(key, shard, gen, sealed)
+            manifest = {"log_seq": seq, "gen": gen, "goals": data["goals"], "shards": entries}
+            sp["bytes"] = self._commit(manifest, hot_view_of(data), old)
+            sp["shards"] = len(shards)
+            sp["shards_written"] = sum(entries[k] is not old_shards.get(k) for k in entries)
+
+    def _load(self) -> dict:
+        if self.rotated_log_file.exists():
+            self._fold_rotated_log()   # finish an interrupted compaction (cheaper than a full save)
+        return super()._load()
+
+    def _fold_rotated_log(self) -> None:
+        """
+        Append the rotated log's records to the open shard, drop deleted goals'
+        records from the shards that hold any, and seal shards of finished months.
+        """
+        with snapshot_file_lock, self._snapshot_lock, span("storage.compact", engine=self.name) as sp:
+            if not self.rotated_log_file.exists():
+                return
+            old = self._read_manifest()
+            seq, gen = old["log_seq"], old.get("gen", 0) + 1
+            shards = dict(old["shards"])
+            head = {"goals": [dict(g) for g in old["goals"]], "updates": [], "ai_events": []}
+            try:
+                hot = loads(self.hot_file.read_bytes())
+            except (FileNotFoundError, json.JSONDecodeError):
+                hot = {}
+            hot = hot if hot.pop("log_seq", None) == seq and "entries" in hot else None
+            open_key = _open_month()
+            last_key = max([open_key, *shards])
+            dirty = {}   # key -> shard contents to rewrite
+            for entry in self._read_log(self.rotated_log_file):
+                if entry["seq"] <= seq:
+                    continue
+                seq = entry["seq"]
+                op, rec = entry["op"], _upgrade_rec(head["goals"], entry["op"], entry["rec"])
+                if hot is not None:
+                    apply_hot_op(hot, op, rec)
+                if op not in ("add_update", "add_ai_event"):
+                    apply_op(head, op, rec)
+                    continue
+                last_key = max(last_key, _month(rec))
+                if last_key not in dirty:
+                    dirty[last_key] = self._read_shard(shards.get(last_key))
+                dirty[last_key]["updates" if op == "add_update" else "ai_events"].append(rec)
+
+            gone = deleted_goal_ids(head["goals"])
+            purged = 0
+            for key, entry in shards.items():
+                # shards holding a deleted goal's records, and open shards whose month is over (to seal)
+                if key not in dirty and (gone & entry["goals"].keys() or key < open_key and not entry["sealed"]):
+                    dirty[key] = self._read_shard(entry)
+            if gone:
+                for shard in dirty.values():
+                    for kind in ("updates", "ai_events"):
+                        kept = [r for r in shard[kind] if r.get("goal_id") not in gone]
+                        purged += len(shard[kind]) - len(kept)
+                        shard[kind] = kept
+                head["goals"] = [g for g in head["goals"] if g["id"] not in gone]
+            for key, shard in dirty.items():
+                if shard["updates"] or shard["ai_events"]:
+                    shards[key] = self._write_shard(key, shard, gen, sealed=key < open_key)
+                else:
+                    shards.pop(key, None)
+            manifest = {"log_seq": seq, "gen": gen, "goals": head["goals"], "shards": shards}
+            if hot is None:   # sidecar missing or stale: rebuild it from the shards
+                hot = hot_view_of(self._assemble(manifest))
+            else:
+                hot["counts"] = {kind: sum(e[kind] for e in shards.values()) for kind in ("updates", "ai_events")}
+            if purged:
+                # record positions shift on the next load: the persisted search index is stale
+                SEARCH_INDEX_FILE.unlink(missing_ok=True)
+            sp["purged"] = purged
+            sp["shards_written"] = len(dirty)
+            self._commit(manifest, hot, old)
+            self.rotated_log_file.unlink()
+
+    # ---- pruned queries (no full load) ----
+    def updates_between(self, data: dict | None, start: str, end: str, goal: str | None = None) -> list:
+        if data is not None:
+            return super().updates_between(data, start, end, goal)
+        with file_lock, snapshot_file_lock, span("storage.range", engine=self.name) as sp:
+            self._ensure()
+            manifest = self._read_manifest()
+            tail = self._tail(manifest)
+            entries = [e for e in manifest["shards"].values()
+                       if e["updates"] and e["min_date"] <= end and e["max_date"] >= start
+                       and (goal is None or goal in e["goals"])]
+            found = [u for e in entries for u in self._read_shard(e)["updates"]] + tail["updates"]
+            sp["shards"] = len(entries)
+        gone = deleted_goal_ids(tail["goals"])
+        lo, hi = to_day(start), to_day(end)
+        return sorted((u for u in found if lo <= update_key(u)[0] <= hi and u["goal_id"] not in gone
+                       and (goal is None or u["goal_id"] == goal)), key=update_key)
+
+    def recent_updates(self, data: dict | None, goal: str | None = None, n: int = 5) -> list:
+        if data is not None:
+            return super().recent_updates(data, goal, n)
+        # newest shards first (by newest date for a goal, newest created_at across goals);
+        # stop once the next shard can't beat the n-th best so far. Within a goal, updates
+        # rank by (date, created_at) like the update index, so same-day entries keep their order
+        if goal is not None:
+            rank, key, bound, bound_key = update_key, (lambda u: update_key(u)[0]), "max_date", to_day
+        else:
+            rank, key, bound, bound_key = created_seconds, created_seconds, "max_created", to_seconds
+        with file_lock, snapshot_file_lock, span("storage.recent", engine=self.name) as sp:
+            self._ensure()
+            manifest = self._read_manifest()
+            tail = self._tail(manifest)
+            gone = deleted_goal_ids(tail["goals"])
+            if goal in gone:
+                return []
+
+            def keep(u):
+                return u["goal_id"] == goal if goal is not None else u["goal_id"] not in gone
+
+            best = heapq.nlargest(n, filter(keep, tail["updates"]), key=rank)
+            entries = sorted((e for e in manifest["shards"].values()
+                              if e["updates"] and (goal is None or goal in e["goals"])),
+                             key=lambda e: e[bound], reverse=True)
+            read = 0
+            for e in entries:
+                if len(best) >= n and bound_key(e[bound]) < key(best[-1]):
+                    break
+                best = heapq.nlargest(n, [*best, *filter(keep, self._read_shard(e)["updates"])], key=rank)
+                read += 1
+            sp["shards"] = read
+        return best
+
+
+# =========================
+# SQLite engine (indexed tables)
+# =========================
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS goals (
+    id INTEGER PRIMARY KEY,
+    gid TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'active',
+    deleted INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS updates (
+    id INTEGER PRIMARY KEY,
+    goal_id TEXT NOT NULL,
+    date TEXT NOT NULL,
+    text TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_updates_goal_id_date ON updates(goal_id, date, created_at);
+CREATE INDEX IF NOT EXISTS idx_updates_created ON updates(created_at);
+CREATE INDEX IF NOT EXISTS idx_updates_date ON updates(date);
+CREATE TABLE IF NOT EXISTS ai_events (
+    id INTEGER PRIMARY KEY,
+    event_type TEXT,
+    goal_id TEXT,
+    user_text TEXT,
+    prompt TEXT,
+    answer TEXT,
+    context TEXT,
+    created_at TEXT,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_ai_events_goal_id ON ai_events(goal_id);
+CREATE INDEX IF NOT EXISTS idx_ai_events_created ON ai_events(created_at);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+_UPDATE_COLS = ("goal_id", "date", "text", "created_at")
+_AI_COLS = ("event_type", "goal_id", "user_text", "prompt", "answer", "context", "created_at", "extra")
+_AI_LEGACY_COLS = ("prompt", "context")
+_DELETED = "goal_id IN (SELECT gid FROM goals WHERE deleted = 1)"
+
+
+class SqliteEngine:
+    name = "sqlite"
+    partial_reads = True
+
+    def __init__(self, db_path: Path | None = None):
+        self.db_path = db_path or DB_FILE
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self._purger: threading.Thread | None = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            fresh = not self.db_path.exists()
+            # Streamlit reruns the script on different threads; access is serialized by _lock
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn = conn
+            if not fresh:
+                self._upgrade_goal_ids()
+            conn.executescript(_SCHEMA)
+            if fresh:
+                self._migrate_from_json()
+        return self._conn
+
+    def _upgrade_goal_ids(self) -> None:
+        """Databases from before goal IDs: rebuild the tables (one transaction) via upgrade_goal_ids."""
+        conn = self._conn
+        if "goal" not in {r["name"] for r in conn.execute("PRAGMA table_info(updates)")}:
+            return
+        data = {
+            "goals": [dict(name=r["name"], status=r["status"])
+                      for r in conn.execute("SELECT name, status FROM goals ORDER BY id")],
+            "updates": [dict(r) for r in conn.execute("SELECT goal, date, text, created_at FROM updates ORDER BY id")],
+            "ai_events": [self._ai_dict(r, cols=("event_type", "goal") + _AI_COLS[2:])
+                          for r in conn.execute("SELECT * FROM ai_events ORDER BY id")],
+        }
+        upgrade_goal_ids(data)
+        conn.execute("BEGIN")
+        for table in ("goals", "updates", "ai_events"):
+            conn.execute(f"DROP TABLE {table}")
+        for stmt in _SCHEMA.split(";"):
+            if stmt.strip():
+                conn.execute(stmt)
+        self._write_all(data)   # commits
+
+    def _migrate_from_json(self) -> None:
+        """One-shot import of an existing goalbot.json (+ its append log)."""
+        if DATA_FILE.exists():
+            data = JsonEngine().load()
+        else:
+            data = _default_data()
+        self._write_all(data)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO meta(key, value) VALUES ('migrated_from_json', ?)", (now_ts(),)
+        )
+        self._conn.commit()
+
+    def _write_all(self, data: dict) -> None:
+        conn = self._conn
+        with conn:
+            conn.execute("DELETE FROM goals")
+            conn.execute("DELETE FROM updates")
+            conn.execute("DELETE FROM ai_events")
+            conn.executemany(
+                "INSERT INTO goals(gid, name, status, deleted) VALUES (?, ?, ?, ?)",
+                [(g["id"], g["name"], g.get("status", "active"), int(bool(g.get("deleted"))))
+                 for g in data.get("goals", [])],
+            )
+            conn.executemany(
+                "INSERT INTO updates(goal_id, date, text, created_at) VALUES (?, ?, ?, ?)",
+                [tuple(u.get(c, "") for c in _UPDATE_COLS) for u in data.get("updates", [])],
+            )
+            conn.executemany(
+                f"INSERT INTO ai_events({', '.join(_AI_COLS)}) VALUES ({', '.join('?' * len(_AI_COLS))})",
+                [self._ai_row(a) for a in data.get("ai_events", [])],
+            )
+
+    @staticmethod
+    def _ai_row(a: dict) -> tuple:
+        # keys without a column of their own (e.g. metrics) go to the JSON "extra" column
+        extra = {k: v for k, v in a.items() if k not in _AI_COLS}
+        context = json.dumps(a["context"]) if "context" in a else None   # packed events carry context_ref
+        row = dict(a, context=context, extra=json.dumps(extra) if extra else None)
+        return tuple(row.get(c) for c in _AI_COLS)
+
+    @staticmethod
+    def _goal_dict(row) -> dict:
+        g = dict(id=row["gid"], name=row["name"], status=row["status"])
+        if row["deleted"]:
+            g["deleted"] = True
+        return g
+
+    @staticmethod
+    def _ai_dict(row, cols=_AI_COLS) -> dict:
+        a = {c: row[c] for c in cols if c not in ("extra", *_AI_LEGACY_COLS)}
+        # inline prompt/context only exist on events from before blob packing; don't invent them
+        if row["prompt"]:
+            a["prompt"] = row["prompt"]
+        if row["context"] and row["context"] != "[]":
+            a["context"] = json.loads(row["context"])
+        if row["extra"]:
+            a.update(json.loads(row["extra"]))
+        return a
+
+    @staticmethod
+    def _update_dict(row) -> dict:
+        return {c: row[c] for c in _UPDATE_COLS}
+
+    def hot_view(self) -> dict | None:
+        """Goals + newest updates per goal, straight from the indexes."""
+        with self._lock, span("storage.hot_view", engine=self.name):
+            conn = self._connect()
+            goals = [self._goal_dict(r) for r in conn.execute("SELECT * FROM goals WHERE deleted = 0 ORDER BY id")]
+            recent = {
+                g["id"]: [self._update_dict(r) for r in conn.execute(
+                    "SELECT goal_id, date, text, created_at FROM updates WHERE goal_id = ? "
+                    "ORDER BY date DESC, created_at DESC LIMIT ?", (g["id"], HOT_RECENT))]
+                for g in goals
+            }
+            per_goal = dict(conn.execute("SELECT goal_id, COUNT(*) FROM updates GROUP BY goal_id"))
+            counts = {
+                "updates": conn.execute("SELECT COUNT(*) FROM updates").fetchone()[0],
+                "ai_events": conn.execute("SELECT COUNT(*) FROM ai_events").fetchone()[0],
+            }
+        entries = {g["id"]: per_goal.get(g["id"], 0) for g in goals}
+        return {"goals": goals, "recent": recent, "entries": entries, "counts": counts}
+
+    def load(self) -> dict:
+        with self._lock, span("storage.load", engine=self.name) as sp:
+            conn = self._connect()
+            goals = [self._goal_dict(r) for r in conn.execute("SELECT * FROM goals ORDER BY id")]
+            updates = [self._update_dict(r)
+                       for r in conn.execute("SELECT goal_id, date, text, created_at FROM updates ORDER BY id")]
+            ai_events = [self._ai_dict(r)
+                         for r in conn.execute(f"SELECT {', '.join(_AI_COLS)} FROM ai_events ORDER BY id")]
+            sp["records"] = len(updates) + len(ai_events)
+        return {"goals": goals, "updates": updates, "ai_events": ai_events}
+
+    def save(self, data: dict) -> None:
+        with self._lock, span("storage.save", engine=self.name):
+            self._connect()
+            self._write_all(data)
+
+    def append(self, op: str, rec: dict) -> None:
+        self.append_many([(op, rec)])
+
+    def append_many(self, ops: list) -> None:
+        """Persist a batch of (op, rec) mutations in one transaction."""
+        with self._lock, span("storage.append", engine=self.name,
+                              op=ops[0][0] if len(ops) == 1 else "batch", records=len(ops)):
+            conn = self._connect()
+            with conn:
+                for op, rec in ops:
+                    self._execute(conn, op, rec)
+        if any(op == "remove_goal" for op, _ in ops):
+            self.compact(background=True)
+
+    def _execute(self, conn, op: str, rec: dict) -> None:
+        if op == "add_goal":
+            conn.execute("INSERT INTO goals(gid, name, status) VALUES (?, ?, ?)",
+                         (rec["id"], rec["name"], rec["status"]))
+        elif op == "set_goal_status":
+            conn.execute("UPDATE goals SET status = ? WHERE gid = ?", (rec["status"], rec["id"]))
+        elif op == "rename_goal":
+            conn.execute("UPDATE goals SET name = ? WHERE gid = ?", (rec["name"], rec["id"]))
+        elif op == "remove_goal":
+            # tombstone; compact() deletes the goal's rows in the background
+            conn.execute("UPDATE goals SET deleted = 1 WHERE gid = ?", (rec["id"],))
+        elif op == "add_update":
+            conn.execute(
+                "INSERT INTO updates(goal_id, date, text, created_at) VALUES (?, ?, ?, ?)",
+                tuple(rec.get(c, "") for c in _UPDATE_COLS),
+            )
+        elif op == "add_ai_event":
+            conn.execute(
+                f"INSERT INTO ai_events({', '.join(_AI_COLS)}) VALUES ({', '.join('?' * len(_AI_COLS))})",
+                self._ai_row(rec),
+            )
+        else:
+            raise ValueError(f"Unknown op: {op}")
+
+    def version(self):
+        """PRAGMA data_version changes whenever another connection commits."""
+        with self._lock:
+            return self._connect().execute("PRAGMA data_version").fetchone()[0]
+
+    def catch_up(self, data: dict) -> dict | None:
+        # the tables are the source of truth: just reload the in-memory copy
+        return self.load()
+
+    def recent_updates(self, data: dict, goal: str | None = None, n: int = 5) -> list:
+        """Indexed top-N: (goal, date, created_at) per goal, created_at across goals."""
+        with self._lock:
+            conn = self._connect()
+            if goal is None:
+                rows = conn.execute(
+                    f"SELECT goal_id, date, text, created_at FROM updates WHERE NOT {_DELETED} "
+                    "ORDER BY created_at DESC LIMIT ?", (n,)
+                )
+            else:
+                rows = conn.execute(
+                    "SELECT goal_id, date, text, created_at FROM updates WHERE goal_id = ? "
+                    "ORDER BY date DESC, created_at DESC LIMIT ?",
+                    (goal, n),
+                )
+            return [self._update_dict(r) for r in rows]
+
+    def updates_between(self, data: dict | None, start: str, end: str, goal: str | None = None) -> list:
+        with self._lock:
+            conn = self._connect()
+            if goal is None:
+                rows = conn.execute(
+                    f"SELECT goal_id, date, text, created_at FROM updates WHERE date BETWEEN ? AND ? "
+                    f"AND NOT {_DELETED} ORDER BY date, created_at", (start, end)
+                )
+            else:
+                rows = conn.execute(
+                    f"SELECT goal_id, date, text, created_at FROM updates WHERE goal_id = ? "
+                    f"AND date BETWEEN ? AND ? AND NOT {_DELETED} ORDER BY date, created_at", (goal, start, end)
+                )
+            return [self._update_dict(r) for r in rows]
+
+    def _purge(self) -> None:
+        with self._lock, span("storage.compact", engine=self.name) as sp:
+            conn = self._connect()
+            with conn:
+                sp["purged"] = (conn.execute(f"DELETE FROM updates WHERE {_DELETED}").rowcount
+                                + conn.execute(f"DELETE FROM ai_events WHERE {_DELETED}").rowcount)
+                conn.execute("DELETE FROM goals WHERE deleted = 1")
+            if sp["purged"]:
+                # record positions shift on the next load: the persisted search index is stale
+                SEARCH_INDEX_FILE.unlink(missing_ok=True)
+
+    def compact(self, background: bool = False) -> None:
+        """Delete tombstoned goals and their rows (the tables need no other compaction)."""
+        if not background:
+            self._purge()
+            return
+        if self._purger is None or not self._purger.is_alive():
+            self._purger = threading.Thread(target=self._purge, name="goalbot-purge", daemon=True)
+            self._purger.start()
+
+
+# =========================
+# Engine selection + public API
+# =========================
+ENGINES = {"json": JsonEngine, "shards": ShardedEngine, "sqlite": SqliteEngine}
+_engine = None
+
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        _engine = ENGINES[STORAGE_ENGINE]()
+    return _engine
+
+
+def set_engine(name: str):
+    """Switch engines at runtime (used to benchmark json vs sqlite)."""
+    global _engine, STORAGE_ENGINE
+    if name not in ENGINES:
+        raise ValueError(f"Unknown storage engine: {name} (choose from {', '.join(ENGINES)})")
+    STORAGE_ENGINE = name
+    _engine = ENGINES[name]()
+    return _engine
+
+
+# =========================
+# Shared store (one per process)
+# =========================
+_COLLECTIONS = ("goals", "updates", "ai_events")
+_OP_COLLECTIONS = {
+    "add_goal": ("goals",),
+    "set_goal_status": ("goals",),
+    "rename_goal": ("goals",),
+    "remove_goal": ("goals", "updates"),   # tombstone + drop from the update index
+    "add_update": ("updates",),
+    "add_ai_event": ("ai_events",),
+}
+
+
+class Store:
+    """
+    One in-memory copy of the journal shared by every session in the process
+    (main.py keeps it in st.cache_resource), so new sessions skip the parse.
+
+    - Reads use `store.data` directly: lists only grow by append or are swapped
+      with a single slice assignment, so readers never see a half-applied op.
+      The derived indexes (update index, goal registry, search index,
+      analytics) guard their own state with a small lock, so a reader never
+      walks one while a write is changing it.
+    - There is a single writer lock, file_lock (an RLock in this process plus
+      flock across processes): writes, merges and attaching a derived index
+      all take it, so they run one at a time.
+    - A cheap version token (file stats / SQLite data_version) detects writes by
+      other processes; a stale store merges them (or reloads) before writing
+      instead of clobbering them.
+    - lazy=True opens only the hot view (goals + newest updates per goal);
+      the full document loads on first use of `data` or via prefetch().
+    - revision(*collections) is a counter bumped by every write (ours or a
+      merged one) to those collections, so derived views can be cached on it.
+    - reloads counts full reloads: record positions may have shifted (e.g. a
+      purge), so anything holding list positions must start over.
+    """
+
+    def __init__(self, engine=None, lazy: bool = False):
+        self.engine = engine or get_engine()
+        self._load_lock = threading.Lock()
+        self._data: JournalData | None = None
+        self._hot: dict | None = None
+        self._hot_registry: GoalRegistry | None = None
+        self._prefetcher: threading.Thread | None = None
+        self._revisions = dict.fromkeys(_COLLECTIONS, 0)
+        self.merges = 0
+        self.reloads = 0
+        if lazy:
+            with file_lock:
+                self._hot = self.engine.hot_view()
+                self._version = self.engine.version()
+        if self._hot is not None:
+            self._hot_registry = hot_registry(self._hot)
+        else:
+            self._ensure_loaded()
+
+    def _ensure_loaded(self) -> None:
+        with self._load_lock:
+            if self._data is not None:
+                return
+            with file_lock, _startup_gc_pause():
+                data = JournalData(self.engine.load())
+                version = self.engine.version()
+            stale = self._hot is not None and version != self._version
+            self._data, self._version = data, version
+            self._hot = self._hot_registry = None
+            if stale:
+                self._bump(_COLLECTIONS)   # written to since the hot view was read
+
+    @property
+    def data(self) -> JournalData:
+        if self._data is None:
+            self._ensure_loaded()
+        return self._data
+
+    @property
+    def loaded(self) -> bool:
+        return self._data is not None
+
+    def revision(self, *names: str) -> int:
+        """Write counter for the named collections (all of them when none are named)."""
+        return sum(self._revisions[name] for name in names or _COLLECTIONS)
+
+    def _bump(self, names) -> None:
+        for name in names:
+            self._revisions[name] += 1
+
+    def prefetch(self) -> None:
+        """Load the full document in the background (no-op once loaded)."""
+        if self._data is not None or (self._prefetcher is not None and self._prefetcher.is_alive()):
+            return
+        self._prefetcher = threading.Thread(target=self._ensure_loaded, name="goalbot-load", daemon=True)
+        self._prefetcher.start()
+
+    @property
+    def registry(self) -> GoalRegistry:
+        """Goal lookups and per-goal counters, from the full document or the hot view."""
+        hot = self._hot_registry   # read first: the loader sets _data before clearing it
+        data = self._data
+        return data.goal_registry if data is not None else hot
+
+    @property
+    def goals(self) -> list:
+        """Live goals in list order (tombstoned ones are hidden; do not mutate)."""
+        return self.registry.live()
+
+    def recent(self, goal_id: str, n: int = 5) -> list:
+        """Newest n updates for a goal; served from the hot view while it suffices."""
+        hot = self._hot if self._data is None else None
+        if hot is not None and n <= HOT_RECENT:
+            return hot["recent"].get(goal_id, [])[:n]
+        if self._data is None and self.engine.partial_reads:
+            return self.engine.recent_updates(None, goal_id, n)
+        return recent_updates(self.data, goal_id, n)
+
+    def updates_between(self, start: str, end: str, goal_id: str | None = None) -> list:
+        """Updates dated start..end (inclusive); read straight from disk before the full load where the engine can."""
+        if self._data is None and self.engine.partial_reads:
+            return self.engine.updates_between(None, start, end, goal_id)
+        return self.engine.updates_between(self.data, start, end, goal_id)
+
+    def sync(self) -> None:
+        """Pick up other processes' writes (a stat when nothing changed)."""
+        if self.engine.version() == self._version:
+            return
+        if self._data is None:
+            with file_lock:
+                hot = self.engine.hot_view()
+                version = self.engine.version()
+            if hot is None:
+                self._ensure_loaded()
+            elif self._data is None:
+                self._hot, self._hot_registry, self._version = hot, hot_registry(hot), version
+                self._bump(_COLLECTIONS)
+            return
+        with file_lock, span("store.sync") as sp:
+            if self.engine.version() == self._version:
+                return
+            fresh = self.engine.catch_up(self.data)
+            if fresh is None:
+                self.merges += 1
+                sp["mode"] = "merge"
+            else:
+                self.data.reset(fresh)
+                self.reloads += 1
+                sp["mode"] = "reload"
+            self._version = self.engine.version()
+            self._bump(_COLLECTIONS)
+
+    def mutate(self, op: str, rec: dict) -> None:
+        """Apply + persist one op; retries after a merge if another process wrote first."""
+        self._ensure_loaded()   # before taking locks: the loader takes file_lock itself
+        rec = _upgrade_rec(self.data["goals"], op, rec)
+        while True:
+            self.sync()
+            with file_lock:
+                if self.engine.version() != self._version:
+                    continue
+                with span("store.apply", op=op):
+                    apply_op(self.data, op, rec)
+                self.engine.append(op, rec)
+                self._version = self.engine.version()
+                self._bump(_OP_COLLECTIONS[op])
+                return
+
+    def mutate_many(self, ops: list) -> None:
+        """
+        Apply + persist a batch of (op, rec) pairs as one write (one log
+        append / one transaction), e.g. a chunk of a bulk import.
+        """
+        if not ops:
+            return
+        self._ensure_loaded()
+        ops = [(op, _upgrade_rec(self.data["goals"], op, rec)) for op, rec in ops]
+        names = {name for op, _ in ops for name in _OP_COLLECTIONS[op]}
+        while True:
+            self.sync()
+            with file_lock:
+                if self.engine.version() != self._version:
+                    continue
+                with span("store.apply", op="batch", records=len(ops)):
+                    for op, rec in ops:
+                        apply_op(self.data, op, rec, persist_index=False)
+                    if self.data.search_index is not None:
+                        self.data.search_index.maybe_persist(self.data)
+                self.engine.append_many(ops)
+                self._version = self.engine.version()
+                self._bump(names)
+                return
+
+
+def load_data() -> JournalData:
+    with _startup_gc_pause():
+        return JournalData(get_engine().load())
 
 
 def save_data(data: dict) -> None:
+    get_engine().save(data)
+
+
+def append_op(data: dict, op: str, rec: dict) -> None:
+    """Apply a mutation to `data` and persist just that mutation."""
+    apply_op(data, op, rec)
+    get_engine().append(op, rec)
+
+
+def recent_updates(data: dict, goal_id: str | None = None, n: int = 5) -> list:
     """
-    Safe writer (atomic):
-    Write to a temp file then replace the real file.
-    Prevents half-written JSON if app stops mid-write.
+    Latest n updates for a goal by (date, created_at),
+    or across all live goals by created_at when goal_id is None.
     """
-    _ensure_file()
-    tmp = DATA_DIR / "goalbot.tmp.json"
-    tmp.write_text(json.dumps(data, indent=2), encoding="utf-8")
-    tmp.replace(DATA_FILE)
+    return get_engine().recent_updates(data, goal_id, n)
+
+
+def updates_between(data: dict, start: str, end: str, goal_id: str | None = None) -> list:
+    """Updates dated start..end (inclusive, YYYY-MM-DD) for a goal or all live goals, oldest first."""
+    return get_engine().updates_between(data, start, end, goal_id)
+
+
+def compact() -> None:
+    engine = get_engine()
+    if hasattr(engine, "compact"):
+        engine.compact()
+
+
+def migrate_json_to_sqlite(db_path: Path | None = None) -> Path:
+    """Explicit one-shot migration: copy goalbot.json (+ log) into a fresh SQLite file."""
+    db_path = db_path or DB_FILE
+    if db_path.exists():
+        raise FileExistsError(f"{db_path} already exists; remove it to re-run the migration")
+    SqliteEngine(db_path)._connect().close()
+    return db_path
+
+
+if __name__ == "__main__":
+    # python storage.py migrate | compact
+    cmd = sys.argv[1] if len(sys.argv) > 1 else ""
+    if cmd == "migrate":
+        print(f"Migrated to {migrate_json_to_sqlite()}")
+    elif cmd == "compact":
+        compact()
+        print("Compacted.")
+    else:
+        print("usage: python storage.py [migrate|compact]")
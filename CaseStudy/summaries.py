@@ -0,0 +1,158 @@
+# summaries.py
+from __future__ import annotations
+
+from datetime import date
+
+from prompts import SUMMARY_FOLD_BUDGET, estimate_tokens
+from storage import now_ts
+
+SUMMARY_EVENT = "rolling_summary"
+SUMMARY_WORDS = 120
+RECENT_RAW = 5   # newest raw entries still shown verbatim in the progress report
+
+
+def week_of(date_str: str) -> str:
+    """ISO week label (e.g. 2026-W05) naming the span of entries a fold covers."""
+    try:
+        y, w, _ = date.fromisoformat(date_str).isocalendar()
+        return f"{y}-W{w:02d}"
+    except ValueError:
+        return "undated"
+
+
+def latest_summaries(ai_events: list, goal_ids: list) -> dict:
+    """goal_id -> newest rolling_summary event, scanning backwards until every goal is found."""
+    wanted = set(goal_ids)
+    found = {}
+    for a in reversed(ai_events):
+        if a.get("event_type") == SUMMARY_EVENT and a.get("goal_id") in wanted and a["goal_id"] not in found:
+            found[a["goal_id"]] = a
+            if len(found) == len(wanted):
+                break
+    return found
+
+
+def _entry_key(u: dict) -> list:
+    return [u.get("date", ""), u.get("text", "")]
+
+
+def pending_updates(goal_updates: list, previous: dict | None) -> list:
+    """
+    Updates not folded into `previous` (a rolling_summary event, or None) yet.
+    created_at has one-second resolution, so the checkpoint is the newest
+    created_at folded plus the (date, text) keys of the entries folded at
+    exactly that second; summaries from before those keys compare strictly.
+    """
+    checkpoint = (previous or {}).get("checkpoint", "")
+    keys = (previous or {}).get("checkpoint_keys")
+    if keys is None:
+        return [u for u in goal_updates if u.get("created_at", "") > checkpoint]
+    folded = {tuple(k) for k in keys}
+    return [u for u in goal_updates if u.get("created_at", "") > checkpoint
+            or (u.get("created_at", "") == checkpoint and tuple(_entry_key(u)) not in folded)]
+
+
+def _entry_line(u: dict) -> str:
+    return f"- {u['date']}: {u['text']}"
+
+
+def _next_fold(new: list) -> list:
+    """The oldest pending entries (by created_at) that fit SUMMARY_FOLD_BUDGET; always at least one."""
+    batch, used = [], 0
+    for u in new:
+        cost = estimate_tokens(_entry_line(u)) + 1
+        if batch and used + cost > SUMMARY_FOLD_BUDGET:
+            break
+        batch.append(u)
+        used += cost
+    return batch
+
+
+def fold_prompt(goal: str, current: str, week: str, entries: list) -> str:
+    entries_text = "\n".join([_entry_line(u) for u in entries])
+    return f"""
+You are Goalbot, maintaining a running summary of the user's journal for one goal.
+
+GOAL:
+{goal}
+
+CURRENT SUMMARY (covers everything before the new entries):
+{current or "(none yet)"}
+
+NEW ENTRIES ({week}):
+{entries_text}
+
+Rewrite the summary so it also covers the new entries. Keep it under {SUMMARY_WORDS} words:
+main progress so far, recurring patterns or blockers, and what changed recently.
+Plain text, no headings. No medical advice.
+""".strip()
+
+
+def refresh_goal_summary(goal: dict, goal_updates: list, previous: dict | None, generate, log_event) -> dict | None:
+    """
+    Fold this goal's ({id, name}) new updates into its rolling summary, oldest first and as
+    many entries per call to `generate(prompt) -> str` as fit SUMMARY_FOLD_BUDGET. Each fold
+    is stored via `log_event(event_dict)` as a rolling_summary ai_event checkpointed at the
+    newest entry it covers (see pending_updates).
+    Returns the newest summary event (or `previous` if nothing changed / generation failed).
+    """
+    checkpoint = (previous or {}).get("checkpoint", "")
+    keys = (previous or {}).get("checkpoint_keys", [])
+    current = (previous or {}).get("answer", "")
+    new = sorted(pending_updates(goal_updates, previous), key=lambda u: u.get("created_at", ""))
+    latest = previous
+    while new:
+        batch = _next_fold(new)
+        new = new[len(batch):]
+        weeks = sorted({week_of(u.get("date", "")) for u in batch})
+        week = weeks[0] if len(weeks) == 1 else f"{weeks[0]} to {weeks[-1]}"
+        prompt = fold_prompt(goal["name"], current, week, batch)
+        answer = generate(prompt)
+        if not answer or answer.startswith("⚠️"):
+            break   # keep the old checkpoint; these entries are retried next time
+        newest = batch[-1].get("created_at", "")
+        keys = (keys if newest == checkpoint else []) + [
+            _entry_key(u) for u in batch if u.get("created_at", "") == newest]
+        latest = {
+            "event_type": SUMMARY_EVENT,
+            "goal_id": goal["id"],
+            "user_text": "",
+            "prompt": prompt,
+            "answer": answer,
+            "context": [{"date": u.get("date"), "text": u.get("text")} for u in batch],
+            "created_at": now_ts(),
+            "week": week,
+            "checkpoint": newest,
+            "checkpoint_keys": keys,
+            "covers": (previous or {}).get("covers", 0) + len(batch),
+        }
+        log_event(latest)
+        checkpoint, current, previous = newest, answer, latest
+    return latest
+
+
+def progress_prompt(summaries: dict, recent: list, names: dict, stats: str = "") -> str:
+    """Progress report built from per-goal rolling summaries, activity stats and a few raw recent entries."""
+    summary_text = "\n\n".join([f"[{names.get(gid, gid)}] (covers {ev.get('covers', 0)} entries)\n{ev['answer']}"
+                                for gid, ev in summaries.items()])
+    recent_text = "\n".join([f"- [{names.get(u['goal_id'], u['goal_id'])}] {u['date']}: {u['text']}" for u in recent])
+    return f"""
+You are Goalbot, a private and encouraging journaling companion.
+
+Here is a running summary of the user's whole history for each goal:
+{summary_text or "(no summaries yet)"}
+
+Activity stats per goal (computed from the journal, trust these numbers over your own counting):
+{stats or "(no stats)"}
+
+And their most recent updates across ALL goals:
+{recent_text}
+
+Write a short progress report with:
+1) Overall check-in (2–4 sentences)
+2) Wins you notice (bulleted, max 4)
+3) Patterns / blockers (bulleted, max 4)
+4) One tiny next step for the next day (1 sentence)
+
+Keep it kind, practical, and non-judgmental. No medical advice.
+""".strip()
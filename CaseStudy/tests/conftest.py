@@ -0,0 +1,41 @@
+# tests/conftest.py
+"""
+Shared fixtures. The app is flat modules next to main.py, and storage reads
+GOALBOT_DATA_DIR at import, so both are set up here before any test module
+imports it: every test runs in a scratch data folder, never in data/.
+"""
+from __future__ import annotations
+
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ["GOALBOT_DATA_DIR"] = tempfile.mkdtemp(prefix="goalbot-tests-")
+os.environ["GOALBOT_EMBEDDER"] = "hash"   # no Ollama needed
+
+import pytest  # noqa: E402
+
+import storage  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def data_dir():
+    """An empty data folder for each test."""
+    storage.DATA_DIR.mkdir(parents=True, exist_ok=True)
+    for p in storage.DATA_DIR.iterdir():
+        shutil.rmtree(p) if p.is_dir() else p.unlink()
+    yield storage.DATA_DIR
+
+
+@pytest.fixture
+def json_engine():
+    return storage.set_engine("json")
+
+
+@pytest.fixture(params=tuple(storage.ENGINES))
+def engine(request):
+    """A fresh engine of each kind (json, shards, sqlite)."""
+    return storage.set_engine(request.param)
@@ -0,0 +1,49 @@
+# tests/journals.py
+"""Synthetic journals and helpers shared by the storage tests."""
+from __future__ import annotations
+
+import random
+from datetime import datetime, timedelta
+
+from storage import Store
+
+
+def plain(records) -> list:
+    return [dict(r) for r in records]
+
+
+def make_ops(goals: int = 3, updates: int = 120, seed: int = 7) -> tuple:
+    """
+    (goal records, update records) written over five months. Entries are
+    often backdated, so date order and created_at order disagree.
+    """
+    rng = random.Random(seed)
+    goal_recs = [{"id": f"g{i:010d}", "name": f"Goal {i}", "status": "active"} for i in range(goals)]
+    start = datetime(2026, 1, 3, 8, 0, 0)
+    update_recs = []
+    for i in range(updates):
+        created = start + timedelta(hours=29 * i, seconds=i)
+        day = created.date() - timedelta(days=rng.choice((0, 0, 1, 3, 12)))
+        update_recs.append({
+            "goal_id": rng.choice(goal_recs)["id"],
+            "date": day.isoformat(),
+            "text": f"entry {i}",
+            "created_at": created.isoformat(timespec="seconds"),
+        })
+    return goal_recs, update_recs
+
+
+def write(store: Store, goal_recs: list, update_recs: list) -> None:
+    store.mutate_many([("add_goal", g) for g in goal_recs])
+    for chunk in range(0, len(update_recs), 25):
+        store.mutate_many([("add_update", u) for u in update_recs[chunk:chunk + 25]])
+
+
+def ours(goals, goal_recs) -> list:
+    """Our goals, in list order (a new journal starts with a few default goals)."""
+    ids = {g["id"] for g in goal_recs}
+    return [dict(g) for g in goals if g["id"] in ids]
+
+
+def by_date(u: dict) -> tuple:
+    return u["date"], u["created_at"]
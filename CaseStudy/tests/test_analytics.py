@@ -0,0 +1,61 @@
+# tests/test_analytics.py
+from __future__ import annotations
+
+import subprocess
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+
+import pytest
+
+import storage
+from analytics import Analytics
+
+
+def update(goal_id: str, day: str, text: str = "x") -> dict:
+    return {"goal_id": goal_id, "date": day, "text": text, "created_at": day + "T09:00:00"}
+
+
+def test_normalize_date_bounds():
+    assert storage.normalize_date(" 2026/01/05 ") == "2026-01-05"
+    assert storage.normalize_date(str(date.today())) == str(date.today())
+    with pytest.raises(ValueError, match="out of range"):
+        storage.normalize_date("2206-01-05")
+    with pytest.raises(ValueError, match="out of range"):
+        storage.normalize_date("1969-12-31")
+
+
+def test_streaks_and_counts():
+    today = date(2026, 3, 10)
+    days = [today - timedelta(days=d) for d in (0, 1, 2, 5, 6)]
+    data = {"goals": [{"id": "g1", "name": "G", "status": "active"}],
+            "updates": [update("g1", d.isoformat(), "abcd") for d in days], "ai_events": []}
+    stats = Analytics.build(data).goal_stats("g1", today=today)
+    assert (stats["entries"], stats["active_days"], stats["current_streak"], stats["longest_streak"]) == (5, 5, 3, 3)
+    assert (stats["longest_gap"], stats["days_since_last"], stats["avg_chars"]) == (2, 0, 4)
+
+
+def test_typo_dates_do_not_widen_the_day_axis():
+    data = {"goals": [{"id": "g1", "name": "G", "status": "active"}],
+            "updates": [update("g1", "2026-01-05"), update("g1", "9999-01-05"), update("g1", "0001-01-05")],
+            "ai_events": []}
+    stats = Analytics.build(data)
+    assert stats.counts.shape[1] < 800   # a few hundred days of headroom, not 8000 years
+    stats.add_update(update("g1", "9000-01-01"))
+    assert stats.counts.shape[1] < 800
+    assert stats.goal_stats("g1", today=date(2026, 1, 5))["entries"] == 1
+
+
+def test_app_imports_leave_numpy_for_the_statistics_page():
+    """main.py's module-level imports must not pull in numpy (cold start)."""
+    script = (
+        "import ast, sys\n"
+        "tree = ast.parse(open('main.py', encoding='utf-8').read())\n"
+        "for node in tree.body:\n"
+        "    if isinstance(node, (ast.Import, ast.ImportFrom)):\n"
+        "        exec(compile(ast.Module([node], []), 'main.py', 'exec'))\n"
+        "print('numpy' in sys.modules)\n"
+    )
+    out = subprocess.run([sys.executable, "-c", script], cwd=Path(storage.__file__).parent,
+                         capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "False"
@@ -0,0 +1,159 @@
+# tests/test_archive.py
+from __future__ import annotations
+
+import io
+import shutil
+
+import pytest
+
+import archive
+import storage
+from archive import export, import_entries, parse_entry, read_entries
+from blobs import event_context, event_prompt
+from storage import ALL_GOALS, Store
+
+
+# =========================
+# parse_entry
+# =========================
+def test_update_entry():
+    op, rec = parse_entry({"goal": " Sleep ", "date": "2026/01/05", "text": " slept 8h "})
+    assert op == "add_update"
+    assert (rec["goal"], rec["date"], rec["text"]) == ("Sleep", "2026-01-05", "slept 8h")
+    assert rec["created_at"]
+
+
+def test_default_goal_and_goal_entry():
+    assert parse_entry({"date": "2026-01-05", "text": "x"}, default_goal="Sleep")[1]["goal"] == "Sleep"
+    assert parse_entry({"type": "goal", "name": "Run", "status": "inactive"}) == \
+        ("add_goal", {"name": "Run", "status": "inactive"})
+    assert parse_entry({"type": "goal", "name": "Run", "status": "paused"})[1]["status"] == "active"
+
+
+def test_ai_entry_drops_blob_refs_and_restamps():
+    raw = {"type": "ai", "goal": "Sleep", "event_type": "ask_answer", "user_text": "q", "answer": "a",
+           "prompt": "p", "context": [{"date": "2026-01-05", "text": "t"}],
+           "created_at": "2020-01-01T00:00:00", "prompt_ref": ["abc"], "context_ref": ["def"]}
+    op, rec = parse_entry(raw)
+    assert op == "add_ai_event"
+    assert "prompt_ref" not in rec and "context_ref" not in rec and "type" not in rec
+    assert rec["created_at"] != "2020-01-01T00:00:00"
+
+
+@pytest.mark.parametrize("raw, message", [
+    ({"_error": "not valid JSON"}, "not valid JSON"),
+    ({"type": "goal"}, "goal without a name"),
+    ({"type": "goal", "name": 3}, "name must be text"),
+    ({"date": "2026-01-05", "text": "x"}, "no goal"),
+    ({"goal": ["Sleep"], "date": "2026-01-05", "text": "x"}, "goal must be text"),
+    ({"goal": "Sleep", "date": "2026-01-05", "text": ""}, "empty text"),
+    ({"goal": "Sleep", "date": "2026-01-05", "text": {"a": 1}}, "text must be text"),
+    ({"goal": "Sleep", "date": 20260105, "text": "x"}, "date must be text"),
+    ({"goal": "Sleep", "date": "05.01.2026", "text": "x"}, "YYYY-MM-DD"),
+    ({"goal": "Sleep", "date": "9999-01-05", "text": "x"}, "out of range"),
+    ({"type": "ai", "goal": "Sleep", "answer": 42}, "answer must be text"),
+    ({"type": "ai", "goal": "Sleep", "context": "t"}, "context must be a list"),
+    ({"type": "note", "goal": "Sleep"}, "unknown record type"),
+])
+def test_bad_entries_raise_value_error(raw, message):
+    with pytest.raises(ValueError, match=message):
+        parse_entry(raw)
+
+
+def test_import_reports_bad_lines_and_keeps_going(engine):
+    lines = ['{"goal": "Sleep", "date": "2026-01-05", "text": "ok"}', "not json", "[1, 2]",
+             '{"goal": "Sleep", "date": "2026-01-06", "text": 7}',
+             '{"goal": "Sleep", "date": "2026-01-07", "text": "ok"}']
+    store = Store(engine)
+    report = import_entries(store, read_entries(io.StringIO("\n".join(lines)), "jsonl"))
+    assert (report["updates"], report["skipped"], report["goals_created"]) == (2, 3, 1)
+    assert [e.split(":")[0] for e in report["errors"]] == ["line 2", "line 3", "line 4"]
+
+
+# =========================
+# Round trips
+# =========================
+def seed(store: Store) -> None:
+    archive.import_entries(store, enumerate([
+        {"type": "goal", "name": "Sleep"},
+        {"type": "goal", "name": "Spanish", "status": "inactive"},
+        {"goal": "Sleep", "date": "2026-01-05", "text": "in bed by 11"},
+        {"goal": "Spanish", "date": "2026-01-04", "text": "# chapter 2\nverbs"},
+        {"goal": "Sleep", "date": "2026-01-06", "text": "woke up rested"},
+        {"type": "ai", "goal": "Sleep", "event_type": "ask_answer", "user_text": "why tired?",
+         "answer": "late screens", "prompt": "You are Goalbot.",
+         "context": [{"date": "2026-01-05", "text": "in bed by 11"}], "metrics": {"ttft_s": 0.2}},
+        {"type": "ai", "goal": ALL_GOALS, "event_type": "progress_summary", "user_text": "", "answer": "steady"},
+    ], 1))
+
+
+def journal_view(data) -> dict:
+    """What an archive carries: our goals, entries and AI events by goal name (not ids or times)."""
+    names = {g["id"]: g["name"] for g in data["goals"]}
+    names[ALL_GOALS] = ALL_GOALS
+    return {
+        "goals": sorted((g["name"], g.get("status", "active")) for g in data["goals"]
+                        if g["name"] in ("Sleep", "Spanish") and not g.get("deleted")),
+        "updates": [(names[u["goal_id"]], u["date"], u["text"]) for u in data["updates"]],
+        "ai_events": [(names[a["goal_id"]], a["event_type"], a.get("user_text"), a.get("answer"),
+                       event_prompt(a), event_context(a), a.get("metrics")) for a in data["ai_events"]],
+    }
+
+
+def round_trip(engine, fmt: str) -> tuple:
+    """Export a seeded journal, import the archive into an empty one; returns both views."""
+    source = Store(engine)
+    seed(source)
+    buf = io.StringIO()
+    export(source.data, fmt, buf)
+    source_view = journal_view(source.data)
+    shutil.rmtree(storage.DATA_DIR)   # a second, empty journal
+    target = Store(storage.set_engine(engine.name))
+    report = import_entries(target, read_entries(io.StringIO(buf.getvalue()), fmt))
+    assert report["skipped"] == 0, report["errors"]
+    return source_view, journal_view(target.data)
+
+
+def test_jsonl_round_trip(engine):
+    source, target = round_trip(engine, "jsonl")
+    assert target == source
+    assert len(target["ai_events"]) == 2
+
+
+def test_csv_round_trip_keeps_updates(engine):
+    source, target = round_trip(engine, "csv")
+    assert target["updates"] == source["updates"]
+    assert target["ai_events"] == []
+
+
+def test_markdown_round_trip_keeps_updates(engine):
+    source, target = round_trip(engine, "md")
+    assert sorted(target["updates"]) == sorted(source["updates"])   # md groups entries by goal
+    assert ("Spanish", "2026-01-04", "# chapter 2\nverbs") in target["updates"]
+
+
+def test_detect_format():
+    assert [archive.detect_format(n) for n in ("a.md", "b.NDJSON", "c.csv", "d.txt", "e.json")] == \
+        ["md", "jsonl", "csv", "md", "json"]
+    with pytest.raises(ValueError):
+        archive.detect_format("backup.xlsx")
+
+
+def test_json_array_import(engine):
+    store = Store(engine)
+    text = '[{"type": "goal", "name": "Sleep"}, {"goal": "Sleep", "date": "2026-01-05", "text": "ok"}, 3]'
+    report = import_entries(store, read_entries(io.StringIO(text), archive.detect_format("old.json")))
+    assert (report["updates"], report["skipped"]) == (1, 1)
+    assert report["errors"] == ["line 3: expected a JSON object"]
+
+
+def test_json_file_holding_json_lines_still_imports(engine):
+    text = ('{"goal": "Sleep", "date": "2026-01-05", "text": "a"}\n'
+            '{"goal": "Sleep", "date": "2026-01-06", "text": "b"}\n')
+    report = import_entries(Store(engine), read_entries(io.StringIO(text), "json"))
+    assert (report["updates"], report["skipped"]) == (2, 0)
+
+
+def test_broken_json_array_is_a_value_error():
+    with pytest.raises(ValueError, match="not a valid JSON array"):
+        list(read_entries(io.StringIO('[{"goal": "Sleep",'), "json"))
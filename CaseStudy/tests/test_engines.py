@@ -0,0 +1,136 @@
+# tests/test_engines.py
+from __future__ import annotations
+
+import pytest
+
+import storage
+from blobs import pack_ai_event
+from journals import by_date, make_ops, ours, plain, write
+from storage import Store
+
+
+@pytest.fixture
+def journal(engine):
+    goal_recs, update_recs = make_ops()
+    write(Store(engine), goal_recs, update_recs)
+    return goal_recs, update_recs
+
+
+def fresh_engine():
+    return storage.ENGINES[storage.STORAGE_ENGINE]()
+
+
+def ranked_reads(eng, data, goal, n):
+    return plain(eng.recent_updates(None if eng.partial_reads else data, goal, n))
+
+
+# =========================
+# Engine parity: every engine answers like a plain sort
+# =========================
+@pytest.mark.parametrize("n", [1, 5, 40, 500])
+def test_recent_updates_parity(journal, n):
+    goal_recs, update_recs = journal
+    eng = fresh_engine()
+    data = storage.JournalData(eng.load())
+    for g in goal_recs:
+        mine = [u for u in update_recs if u["goal_id"] == g["id"]]
+        expected = sorted(mine, key=by_date, reverse=True)[:n]
+        assert ranked_reads(eng, data, g["id"], n) == expected
+        assert plain(storage.recent_updates(data, g["id"], n)) == expected
+    expected = sorted(update_recs, key=lambda u: u["created_at"], reverse=True)[:n]
+    assert ranked_reads(eng, data, None, n) == expected
+
+
+@pytest.mark.parametrize("start, end", [("2026-01-01", "2026-12-31"), ("2026-02-10", "2026-03-05"),
+                                        ("2026-03-01", "2026-03-01"), ("2030-01-01", "2030-02-01")])
+def test_updates_between_parity(journal, start, end):
+    goal_recs, update_recs = journal
+    eng = fresh_engine()
+    data = None if eng.partial_reads else storage.JournalData(eng.load())
+    in_range = sorted((u for u in update_recs if start <= u["date"] <= end), key=by_date)
+    assert plain(eng.updates_between(data, start, end)) == in_range
+    for g in goal_recs:
+        expected = [u for u in in_range if u["goal_id"] == g["id"]]
+        assert plain(eng.updates_between(data, start, end, g["id"])) == expected
+
+
+def test_ai_events_read_back_as_written(engine):
+    packed = pack_ai_event({"event_type": "ask_answer", "goal_id": "g1", "user_text": "q", "prompt": "p",
+                            "answer": "a", "context": [{"date": "2026-01-01", "text": "t"}],
+                            "created_at": "2026-01-01T00:00:00", "metrics": {"ttft_s": 0.2}})
+    legacy = {"event_type": "ask_answer", "goal_id": "g1", "user_text": "q", "prompt": "old", "answer": "a",
+              "context": [{"date": "2026-01-01", "text": "t"}], "created_at": "2026-01-01T00:00:01"}
+    engine.save({"goals": [{"id": "g1", "name": "G", "status": "active"}], "updates": [],
+                 "ai_events": [packed, legacy]})
+    assert plain(fresh_engine().load()["ai_events"]) == [packed, legacy]
+
+
+def test_lazy_store_reads_match_loaded_store(journal):
+    goal_recs, update_recs = journal
+    lazy, loaded = Store(fresh_engine(), lazy=True), Store(fresh_engine())
+    assert plain(lazy.goals) == plain(loaded.goals)
+    assert ours(lazy.goals, goal_recs) == goal_recs
+    for g in goal_recs:
+        for n in (3, 30):
+            assert plain(lazy.recent(g["id"], n)) == plain(loaded.recent(g["id"], n))
+        assert plain(lazy.updates_between("2026-02-01", "2026-02-28", g["id"])) == \
+            plain(loaded.updates_between("2026-02-01", "2026-02-28", g["id"]))
+
+
+def test_removed_goal_drops_out_of_every_engine(journal):
+    goal_recs, update_recs = journal
+    gone = goal_recs[1]["id"]
+    Store(fresh_engine()).mutate("remove_goal", {"id": gone})
+    eng = fresh_engine()
+    data = storage.JournalData(eng.load())
+
+    assert ranked_reads(eng, data, gone, 10) == []
+    assert all(u["goal_id"] != gone for u in ranked_reads(eng, data, None, 500))
+    between = plain(eng.updates_between(None if eng.partial_reads else data, "2025-01-01", "2026-12-31"))
+    assert between == sorted((u for u in update_recs if u["goal_id"] != gone), key=by_date)
+
+
+def test_same_day_entries_keep_their_order(engine):
+    goal = {"id": "g0000000001", "name": "G", "status": "active"}
+    older = {"goal_id": goal["id"], "date": "2026-02-01", "text": "first", "created_at": "2026-02-01T08:00:00"}
+    newer = {"goal_id": goal["id"], "date": "2026-02-01", "text": "second", "created_at": "2026-02-01T21:00:00"}
+    backdated = {"goal_id": goal["id"], "date": "2026-01-20", "text": "late", "created_at": "2026-02-02T07:00:00"}
+    write(Store(engine), [goal], [older, newer, backdated])
+    eng = fresh_engine()
+    data = storage.JournalData(eng.load())
+
+    assert ranked_reads(eng, data, goal["id"], 2) == [newer, older]
+    assert ranked_reads(eng, data, None, 1) == [backdated]
+
+
+def test_purge_drops_the_persisted_search_index(journal):
+    from search import get_search_index
+    goal_recs, update_recs = journal
+    store = Store(fresh_engine())
+    get_search_index(store.data).save(store.data)
+    assert storage.SEARCH_INDEX_FILE.exists()
+
+    store.mutate("remove_goal", {"id": goal_recs[0]["id"]})
+    store.engine.compact()
+    assert not storage.SEARCH_INDEX_FILE.exists()
+
+
+# =========================
+# Sharded checkpoints
+# =========================
+def test_full_checkpoint_keeps_unchanged_shards():
+    eng = storage.set_engine("shards")
+    goal_recs, update_recs = make_ops()
+    store = Store(eng)
+    write(store, goal_recs, update_recs)
+    eng.save(eng.load())   # the backdated months become sealed shards
+    before = eng._read_manifest()["shards"]
+    assert len(before) > 1 and all(e["sealed"] for e in before.values())
+
+    store.mutate("add_update", {"goal_id": goal_recs[0]["id"], "date": "2026-10-01", "text": "new",
+                                "created_at": "2026-10-01T09:00:00"})
+    eng.save(eng.load())
+    after = eng._read_manifest()["shards"]
+    assert {k: after[k] for k in before} == before   # same files, not rewritten
+    assert sorted(p.name for p in eng.dir.glob("*.json.gz")) == sorted(e["file"] for e in before.values())
+    assert plain(Store(fresh_engine()).data["updates"])[:-1] == update_recs
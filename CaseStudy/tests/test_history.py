@@ -0,0 +1,46 @@
+# tests/test_history.py
+from __future__ import annotations
+
+import storage
+from history import PAGE_SIZE, feed_page
+from journals import make_ops, write
+from storage import Store
+
+
+def test_pages_walk_the_feed_newest_first(json_engine):
+    goal_recs, update_recs = make_ops(updates=45)
+    store = Store(json_engine)
+    write(store, goal_recs, update_recs)
+    seen, cursor = [], None
+    while True:
+        items, cursor = feed_page(store.data, cursor)
+        seen += [i["text"] for i in items]
+        if cursor is None:
+            break
+    newest_first = sorted(update_recs, key=lambda u: u["created_at"], reverse=True)
+    assert seen == [u["text"] for u in newest_first]
+
+
+def test_cursor_from_before_a_shrinking_reload_stays_in_range(json_engine):
+    goal_recs, update_recs = make_ops(updates=60)
+    store = Store(json_engine)
+    write(store, goal_recs, update_recs)
+    _, cursor = feed_page(store.data, None)
+    store.data["updates"][:] = store.data["updates"][:10]   # e.g. a purge, picked up by a reload
+
+    items, _ = feed_page(store.data, cursor)
+    assert len(items) == min(PAGE_SIZE, 10)
+
+
+def test_reload_by_another_process_is_counted(engine):
+    goal_recs, update_recs = make_ops(updates=10)
+    here = Store(engine)
+    write(here, goal_recs, update_recs[:5])
+    there = Store(storage.ENGINES[engine.name]())
+    write(there, [], update_recs[5:])
+    there.mutate("remove_goal", {"id": goal_recs[0]["id"]})
+    there.engine.compact()   # purge: positions in `here` no longer line up
+
+    here.sync()
+    assert here.reloads == 1
+    assert len(here.data["updates"]) == sum(u["goal_id"] != goal_recs[0]["id"] for u in update_recs)
@@ -0,0 +1,146 @@
+# tests/test_storage.py
+from __future__ import annotations
+
+import gc
+
+import storage
+from journals import make_ops, ours, plain, write
+from storage import JsonEngine, Store
+
+
+# =========================
+# Log replay + compaction (JSON engine)
+# =========================
+def test_log_replays_on_load(json_engine):
+    goal_recs, update_recs = make_ops(updates=30)
+    store = Store(json_engine)
+    write(store, goal_recs, update_recs)
+    store.mutate("set_goal_status", {"id": goal_recs[1]["id"], "status": "inactive"})
+    assert json_engine.log_file.exists()
+
+    data = JsonEngine().load()
+    assert plain(data["updates"]) == update_recs
+    assert [(g["name"], g["status"]) for g in ours(data["goals"], goal_recs)] == [
+        ("Goal 0", "active"), ("Goal 1", "inactive"), ("Goal 2", "active")]
+
+
+def test_torn_last_log_line_is_ignored(json_engine):
+    goal_recs, update_recs = make_ops(updates=5)
+    write(Store(json_engine), goal_recs, update_recs)
+    tear(json_engine)
+
+    assert plain(JsonEngine().load()["updates"]) == update_recs
+
+
+def tear(engine) -> None:
+    with engine.log_file.open("a", encoding="utf-8") as f:
+        f.write('{"seq": 99, "op": "add_update", "rec": {"goal_id"')   # crash mid-append
+
+
+def test_appends_after_a_torn_line_survive_reload_and_compaction(json_engine):
+    goal_recs, update_recs = make_ops(updates=9)
+    store = Store(json_engine)
+    write(store, goal_recs, update_recs[:3])
+    tear(json_engine)
+    write(store, [], update_recs[3:6])   # this process never reloaded: it appends after the tear
+
+    assert plain(JsonEngine().load()["updates"]) == update_recs[:6]
+    write(store, [], update_recs[6:])
+    json_engine.compact()
+    assert plain(JsonEngine().load()["updates"]) == update_recs
+
+
+def test_load_checkpoints_a_torn_log(json_engine):
+    goal_recs, update_recs = make_ops(updates=6)
+    write(Store(json_engine), goal_recs, update_recs[:3])
+    tear(json_engine)
+
+    restarted = Store(JsonEngine())
+    assert not json_engine.log_file.exists()   # folded into the snapshot, tear and all
+    write(restarted, [], update_recs[3:])
+    assert plain(JsonEngine().load()["updates"]) == update_recs
+
+
+def test_compaction_folds_log_into_snapshot(json_engine):
+    goal_recs, update_recs = make_ops(updates=40)
+    write(Store(json_engine), goal_recs, update_recs)
+    before = JsonEngine().load()
+
+    json_engine.compact()
+    assert not json_engine.log_file.exists()
+    assert not json_engine.rotated_log_file.exists()
+    after = JsonEngine().load()
+    assert plain(after["updates"]) == plain(before["updates"])
+    assert plain(after["goals"]) == plain(before["goals"])
+
+
+def test_appends_after_compaction_replay_on_top(json_engine):
+    goal_recs, update_recs = make_ops(updates=20)
+    store = Store(json_engine)
+    write(store, goal_recs, update_recs[:10])
+    json_engine.compact()
+    write(store, [], update_recs[10:])
+
+    assert plain(JsonEngine().load()["updates"]) == update_recs
+
+
+def test_rotated_log_left_by_a_crash_is_recovered(json_engine):
+    goal_recs, update_recs = make_ops(updates=12)
+    write(Store(json_engine), goal_recs, update_recs[:8])
+    json_engine.log_file.replace(json_engine.rotated_log_file)   # compaction died before folding
+    write(Store(JsonEngine()), [], update_recs[8:])
+
+    assert plain(JsonEngine().load()["updates"]) == update_recs
+
+
+# =========================
+# Shared store
+# =========================
+def test_second_process_write_is_merged(json_engine):
+    goal_recs, update_recs = make_ops(updates=10)
+    here = Store(json_engine)
+    write(here, goal_recs, update_recs[:5])
+    there = Store(JsonEngine())
+    write(there, [], update_recs[5:])
+
+    here.sync()
+    assert plain(here.data["updates"]) == update_recs
+
+
+# =========================
+# Tombstones + renames
+# =========================
+def test_rename_replays_from_the_log(json_engine):
+    goal_recs, update_recs = make_ops(updates=5)
+    store = Store(json_engine)
+    write(store, goal_recs, update_recs)
+    store.mutate("rename_goal", {"id": goal_recs[0]["id"], "name": "Renamed"})
+
+    assert [g["name"] for g in ours(JsonEngine().load()["goals"], goal_recs)] == ["Renamed", "Goal 1", "Goal 2"]
+
+
+def test_compaction_purges_removed_goal(json_engine):
+    goal_recs, update_recs = make_ops(updates=30)
+    store = Store(json_engine)
+    write(store, goal_recs, update_recs)
+    gone = goal_recs[0]["id"]
+    store.mutate("remove_goal", {"id": gone})
+    assert gone not in {g["id"] for g in store.goals}
+
+    json_engine.compact()   # waits for the background pass the delete started
+    data = JsonEngine().load()
+    assert gone not in {g["id"] for g in data["goals"]}
+    assert plain(data["updates"]) == [u for u in update_recs if u["goal_id"] != gone]
+
+
+# =========================
+# Garbage collector
+# =========================
+def test_only_the_first_load_pauses_gc(monkeypatch, json_engine):
+    monkeypatch.setattr(storage, "_gc_started", False)
+    seen = []
+    monkeypatch.setattr(JsonEngine, "load", lambda self: seen.append(gc.isenabled()) or storage._default_data())
+    Store(json_engine)
+    storage.load_data()   # another session loading while the first is serving
+    assert seen == [False, True]
+    assert gc.isenabled()
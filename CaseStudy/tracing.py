@@ -0,0 +1,138 @@
+# tracing.py
+from __future__ import annotations
+
+import cProfile
+import functools
+import io
+import json
+import pstats
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+
+RING_SIZE = 5000          # most recent spans kept in memory (process-wide)
+PROFILE_TOP = 30          # functions listed in a cProfile capture
+
+
+def _pct(sorted_vals: list, q: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    return sorted_vals[min(len(sorted_vals) - 1, int(round(q * (len(sorted_vals) - 1))))]
+
+
+class Tracer:
+    """
+    Lightweight spans for hot paths. Each finished span is one record
+    {"name", "ts", "ms", "error", **attrs} in a bounded ring buffer, where
+    attrs carry whatever the code fills in (bytes, records, tokens_per_s, ...).
+    """
+
+    def __init__(self, size: int = RING_SIZE):
+        self._lock = threading.Lock()
+        self.records: deque = deque(maxlen=size)
+        self._seq = 0             # spans recorded so far (also counts ones evicted from the ring)
+        self._exported = 0        # seq up to which records were written by export_jsonl
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        """
+        with tracer.span("storage.save") as sp: ...; sp["bytes"] = n
+        An exception, or sp["error"] set by the code, counts as an error.
+        """
+        attrs = dict(attrs)
+        start = time.perf_counter()
+        try:
+            yield attrs
+        except BaseException as e:
+            attrs["error"] = attrs.get("error") or type(e).__name__
+            raise
+        finally:
+            self.record(name, (time.perf_counter() - start) * 1000, **attrs)
+
+    def record(self, name: str, ms: float, **attrs) -> None:
+        """Add an already-timed span (e.g. a whole script rerun)."""
+        rec = {"name": name, "ts": round(time.time(), 3), "ms": round(ms, 3), **attrs}
+        rec["error"] = rec.get("error") or False
+        with self._lock:
+            self._seq += 1
+            rec["seq"] = self._seq
+            self.records.append(rec)
+
+    def traced(self, name: str | None = None):
+        """Decorator form of span(); the span is named after the function by default."""
+        def wrap(fn):
+            span_name = name or f"{fn.__module__}.{fn.__qualname__}"
+
+            @functools.wraps(fn)
+            def inner(*args, **kwargs):
+                with self.span(span_name):
+                    return fn(*args, **kwargs)
+            return inner
+        return wrap
+
+    def summary(self) -> list:
+        """Per span name: count, errors, p50/p95/max ms (plus median tokens/s where recorded)."""
+        with self._lock:
+            recs = list(self.records)
+        by_name: dict[str, list] = {}
+        for r in recs:
+            by_name.setdefault(r["name"], []).append(r)
+        rows = []
+        for name, rs in sorted(by_name.items()):
+            ms = sorted(r["ms"] for r in rs)
+            row = {
+                "span": name,
+                "count": len(rs),
+                "errors": sum(1 for r in rs if r["error"]),
+                "p50_ms": round(_pct(ms, 0.5), 2),
+                "p95_ms": round(_pct(ms, 0.95), 2),
+                "max_ms": round(ms[-1], 2),
+            }
+            sizes = sorted(r["bytes"] for r in rs if r.get("bytes") is not None)
+            if sizes:
+                row["p50_bytes"] = int(_pct(sizes, 0.5))
+            tps = sorted(r["tokens_per_s"] for r in rs if r.get("tokens_per_s"))
+            if tps:
+                row["p50_tok_s"] = round(_pct(tps, 0.5), 1)
+            rows.append(row)
+        return rows
+
+    def export_jsonl(self, path: Path) -> int:
+        """Append spans not exported yet to a JSONL file; returns how many were written."""
+        with self._lock:
+            fresh = [r for r in self.records if r["seq"] > self._exported]
+            self._exported = self._seq
+        if fresh:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with path.open("a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in fresh))
+        return len(fresh)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.records.clear()
+            self._exported = self._seq
+
+
+tracer = Tracer()
+span = tracer.span
+traced = tracer.traced
+
+
+class RerunProfiler:
+    """Optional cProfile capture of one script run; stop() returns the top functions by cumulative time."""
+
+    def __init__(self):
+        self._prof = cProfile.Profile()
+
+    def start(self) -> "RerunProfiler":
+        self._prof.enable()
+        return self
+
+    def stop(self) -> str:
+        self._prof.disable()
+        out = io.StringIO()
+        pstats.Stats(self._prof, stream=out).sort_stats("cumulative").print_stats(PROFILE_TOP)
+        return out.getvalue()